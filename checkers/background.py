@@ -0,0 +1,126 @@
+import copy
+import math
+import threading
+
+
+class BackgroundSearch:
+    """Runs an engine's searches on a worker thread, so the window keeps responding.
+
+    Only one search runs at a time. The board is copied before the thread
+    starts, so the game may go on changing its own board meanwhile.
+    """
+
+    def __init__(self, engine):
+        """Initialize a background searcher.
+
+        Args:
+            engine (Engine): The engine to search with; its transposition table
+                carries over from one search to the next, pondering included.
+        """
+        self.engine = engine
+        self.thread = None
+        self.pondering = False
+        # The latest completed iteration of the running search, for progress reports
+        self.progress = None
+        self.outcome = None
+
+    def start(self, board, color, time_limit=None, ponder=False):
+        """Start searching a position, stopping any search already running.
+
+        Args:
+            board (Board): The position to search; it is copied, not shared.
+            color (tuple): The side to move.
+            time_limit (float, optional): Overrides the engine's budget per move.
+            ponder (bool, optional): Search without a time limit until cancelled,
+                to fill the transposition table while the opponent thinks.
+                Defaults to False.
+        """
+        self.cancel()
+        self.pondering = ponder
+        self.progress = None
+        self.outcome = None
+        board = copy.deepcopy(board)
+        limit = math.inf if ponder else time_limit
+        self.thread = threading.Thread(target=self.run, args=(board, color, limit), daemon=True)
+        self.thread.start()
+
+    def ponder(self, board, color):
+        """Think on the opponent's time.
+
+        Searching the position with the opponent to move stores the replies to
+        all of their moves in the table, so the search after their move starts
+        from a warm table.
+
+        Args:
+            board (Board): The position, with the opponent to move.
+            color (tuple): The opponent's color.
+        """
+        self.start(board, color, ponder=True)
+
+    def run(self, board, color, time_limit):
+        """Search on the worker thread and keep the result.
+
+        Args:
+            board (Board): The worker's own copy of the position.
+            color (tuple): The side to move.
+            time_limit (float): The budget for the search, or None for the engine's own.
+        """
+        self.outcome = self.engine.search(board, color, time_limit, on_iteration=self.report)
+
+    def report(self, result):
+        """Keep the latest completed iteration; called on the worker thread.
+
+        Args:
+            result (SearchResult): The best move and line found so far.
+        """
+        self.progress = result
+
+    def running(self):
+        """Check whether a search is under way.
+
+        Returns:
+            bool: True until the worker thread finishes.
+        """
+        return self.thread is not None and self.thread.is_alive()
+
+    def idle(self):
+        """Check whether nothing was started since the last result was collected or cancelled.
+
+        Returns:
+            bool: True if a new search can be started without losing anything.
+        """
+        return self.thread is None
+
+    def done(self):
+        """Check whether a move search has finished and its result can be collected.
+
+        Pondering never counts as done, since its result is not meant to be played.
+
+        Returns:
+            bool: True once result() will not block.
+        """
+        return self.thread is not None and not self.pondering and not self.thread.is_alive()
+
+    def result(self):
+        """Collect the result of the finished search, waiting for it if needed.
+
+        Returns:
+            SearchResult: The best move found, or None if the side had no moves.
+        """
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        return self.outcome
+
+    def cancel(self):
+        """Stop the running search, if any, and throw its result away.
+        """
+        if self.running():
+            self.engine.stop()
+            self.thread.join()
+            # The search may have ended by itself before it saw the request
+            self.engine.stopped = False
+        self.thread = None
+        self.pondering = False
+        self.progress = None
+        self.outcome = None
@@ -0,0 +1,137 @@
+import numpy as np
+from checkers.constants import Constants
+from checkers.geometry import Geometry
+
+
+class BatchEvaluator:
+    """Scores whole batches of positions at once with NumPy.
+
+    A batch is an array of shape ``(positions, 3, squares)``: for every
+    position, one row of 0/1 flags per playable square (in the order of
+    Geometry.squares) for the grey pieces, the white pieces and the kings.
+    That is exactly the bit layout of ``Board.pack()``, so packed positions
+    from either board engine can be scored without building boards.
+
+    Every feature is counted as grey's value minus white's.
+    """
+
+    # Feature names, in the order of the weights
+    FEATURES = ('men', 'kings', 'advancement', 'back_rank', 'mobility')
+
+    def __init__(self, rows=None, cols=None, man=100, king=160, advance=3, back_rank=0, mobility=0):
+        """Initialize an evaluator for one board size.
+
+        The default weights score positions the same way as Engine.evaluate;
+        back_rank and mobility are off unless given a weight.
+
+        Args:
+            rows (int, optional): The number of rows. Defaults to Constants.ROWS.
+            cols (int, optional): The number of columns. Defaults to Constants.COLS.
+            man (int, optional): The value of a man. Defaults to 100.
+            king (int, optional): The value of a king. Defaults to 160.
+            advance (int, optional): The bonus per row a man has advanced. Defaults to 3.
+            back_rank (int, optional): The bonus per man still guarding its own back row.
+            mobility (int, optional): The bonus per empty square a piece could step to.
+        """
+        self.c = Constants()
+        self.rows = rows or self.c.ROWS
+        self.cols = cols or self.c.COLS
+        self.geometry = Geometry.for_size(self.rows, self.cols)
+        self.weights = np.array([man, king, advance, back_rank, mobility], dtype=np.int64)
+        squares = self.geometry.squares
+        size = len(squares)
+        row = np.array([r for r, _ in squares])
+        # Rows each square is ahead of its side's starting edge
+        self.grey_advance = self.rows - 1 - row
+        self.white_advance = row
+        self.grey_back = row == self.rows - 1
+        self.white_back = row == 0
+        # up[i, j] is 1 when square j is a diagonal step towards row 0 from square i
+        self.up = np.zeros((size, size), dtype=np.float32)
+        for i, square in enumerate(squares):
+            for step, _ in self.geometry.up[square]:
+                self.up[i, self.geometry.index[step]] = 1
+        self.down = self.up.T.copy()
+        self.both = self.up + self.down
+        # Per-square weights for the features that are sums over men, one column per feature
+        self.grey_squares = np.stack([np.ones(size), self.grey_advance, self.grey_back], axis=1).astype(np.float32)
+        self.white_squares = np.stack([np.ones(size), self.white_advance, self.white_back], axis=1).astype(np.float32)
+
+    def encode(self, boards):
+        """Turn boards into a batch.
+
+        Args:
+            boards (iterable): Boards of this evaluator's size; any board engine works.
+
+        Returns:
+            ndarray: The batch, of shape ``(len(boards), 3, squares)``.
+        """
+        return self.unpack([board.pack() for board in boards])
+
+    def unpack(self, packed):
+        """Turn positions made by ``Board.pack()`` into a batch.
+
+        Args:
+            packed (list): The packed positions, as bytes.
+
+        Returns:
+            ndarray: The batch, of shape ``(len(packed), 3, squares)``, as uint8 flags.
+        """
+        size = len(self.geometry.squares)
+        data = np.frombuffer(b''.join(packed), dtype=np.uint8).reshape(len(packed), 3, self.geometry.mask_bytes)
+        return np.unpackbits(data, axis=2, count=size, bitorder='little')
+
+    def features(self, batch):
+        """Count the features of every position in a batch.
+
+        Args:
+            batch (ndarray): The batch, as described in the class docstring.
+
+        Returns:
+            ndarray: Shape ``(positions, len(FEATURES))``, grey's count minus white's.
+        """
+        # Small whole numbers are exact in float32, which lets the sums below use fast matrix products
+        batch = np.asarray(batch, dtype=np.float32)
+        grey, white, kings = batch[:, 0], batch[:, 1], batch[:, 2]
+        grey_men, white_men = grey - grey * kings, white - white * kings
+        grey_kings, white_kings = grey * kings, white * kings
+        empty = 1 - grey - white
+        # A piece's mobility is the number of empty squares next to it in the directions it moves
+        grey_steps = (grey_men @ self.up + grey_kings @ self.both) * empty
+        white_steps = (white_men @ self.down + white_kings @ self.both) * empty
+        # Men, advancement and back rank in one product per side
+        men = grey_men @ self.grey_squares - white_men @ self.white_squares
+        counts = np.stack([
+            men[:, 0],
+            grey_kings.sum(1) - white_kings.sum(1),
+            men[:, 1],
+            men[:, 2],
+            grey_steps.sum(1) - white_steps.sum(1),
+        ], axis=1)
+        return counts.astype(np.int64)
+
+    def evaluate(self, batch, grey_to_move=True):
+        """Score every position in a batch.
+
+        Args:
+            batch (ndarray): The batch, as described in the class docstring.
+            grey_to_move (bool or ndarray, optional): Which side each score is for, one
+                flag for the whole batch or one per position. Defaults to True.
+
+        Returns:
+            ndarray: The scores, positive when the side they are for is ahead.
+        """
+        scores = self.features(batch) @ self.weights
+        return np.where(grey_to_move, scores, -scores)
+
+    def evaluate_board(self, board, color):
+        """Score a single board, so the engine can use this evaluator at its leaves.
+
+        Args:
+            board (Board): The position to score.
+            color (tuple): The side to score it for.
+
+        Returns:
+            int: The score, positive when ``color`` is ahead.
+        """
+        return int(self.evaluate(self.unpack([board.pack()]), color == self.c.GREY)[0])
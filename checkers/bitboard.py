@@ -0,0 +1,576 @@
+import copy
+from checkers.constants import Constants
+from checkers.angry_piece import AngryPiece
+from checkers.geometry import Geometry
+from checkers.zobrist import Zobrist
+
+
+class BitBoard:
+    """A game board that stores the position as integer bitmasks.
+
+    Only the dark squares can hold a piece, so every playable square gets one
+    bit. Rows are packed in pairs with one unused "ghost" bit after each pair,
+    which makes every diagonal step the same shift everywhere on the board:
+    ``+half`` / ``+half + 1`` moving down and ``-half - 1`` / ``-half`` moving
+    up, where ``half`` is the number of playable squares in a row. A step that
+    would leave the board lands on a ghost bit or outside the mask and is
+    discarded by the ``& empty`` test, so no bounds checks are needed.
+    """
+
+    # Layout tables shared by every board of the same size
+    layouts = {}
+
+    def __init__(self, rows=None, cols=None):
+        """Initialize a new bitboard with the pieces in their starting squares.
+
+        Args:
+            rows (int, optional): The number of rows. Defaults to Constants.ROWS.
+            cols (int, optional): The number of columns. Defaults to Constants.COLS.
+        """
+        self.c = Constants()
+        self.rows = rows or self.c.ROWS
+        self.cols = cols or self.c.COLS
+        self.geometry = Geometry.for_size(self.rows, self.cols)
+        self.load_layout()
+        self.grey = self.white = self.kings = 0
+        self.grey_left = self.white_left = 0
+        self.grey_kings = self.white_kings = 0
+        # Zobrist hash of the position; the same position hashes the same on a Board
+        self.zobrist = Zobrist.for_size(self.rows, self.cols)
+        self.hash = 0
+        # Legal moves per side, along with the hash of the position they were generated for
+        self.move_cache = {}
+        self.build_board()
+
+    def __eq__(self, other):
+        """Check whether two bitboards hold the same position.
+
+        Args:
+            other (BitBoard): The board to compare with.
+
+        Returns:
+            bool: True if both boards have the same pieces on the same squares.
+        """
+        if not isinstance(other, BitBoard):
+            return NotImplemented
+        return (self.grey, self.white, self.kings) == (other.grey, other.white, other.kings)
+
+    def __hash__(self):
+        """Hash the board by its position, so it changes as the board changes.
+        """
+        return self.hash
+
+    def __deepcopy__(self, memo):
+        """Copy the board for search.
+
+        The position is held in immutable ints and the layout tables are shared
+        read-only, so a shallow copy plus its own move cache is a full,
+        independent copy.
+        """
+        board = copy.copy(self)
+        board.move_cache = dict(self.move_cache)
+        return board
+
+    def load_layout(self):
+        """Load (building it the first time) the bit layout for the board's size.
+        """
+        key = (self.rows, self.cols)
+        if key not in BitBoard.layouts:
+            half = self.cols // 2
+            bit_of = {}
+            # Bit index of the dark square (r, c): each pair of rows takes
+            # 2 * half + 1 bits, the last one being the ghost bit
+            for r, c in self.geometry.squares:
+                bit_of[(r, c)] = 1 << ((r // 2) * (2 * half + 1) + (r % 2) * half + c // 2)
+            square_of = {bit: square for square, bit in bit_of.items()}
+            valid = top = bottom = 0
+            for (r, c), bit in bit_of.items():
+                valid |= bit
+                # Grey men are crowned on the top row, white men on the bottom one
+                if r == 0:
+                    top |= bit
+                elif r == self.rows - 1:
+                    bottom |= bit
+            # The Zobrist keys of every square, by bit, so moves are hashed without going through squares
+            keys = Zobrist.for_size(self.rows, self.cols).keys
+            keys_of = {bit: keys[square] for square, bit in bit_of.items()}
+            # Quiet moves and single jumps as square tuples, by their bit form, filled in as they are met
+            short_moves = {}
+            BitBoard.layouts[key] = (half, bit_of, square_of, valid, top, bottom, keys_of, short_moves)
+
+        (self.half, self.bit_of, self.square_of, self.valid, self.top, self.bottom, self.keys_of,
+         self.short_moves) = BitBoard.layouts[key]
+        # Shift amounts for moving up (towards row 0) and down (towards the last row)
+        self.up = (-self.half - 1, -self.half)
+        self.down = (self.half, self.half + 1)
+
+    def build_board(self):
+        """Create the initial state of the game board.
+        """
+        filled = self.geometry.start_rows()
+        for (r, c), bit in self.bit_of.items():
+            # White fills the top rows and grey the bottom ones
+            if r < filled:
+                self.white |= bit
+                self.hash ^= self.zobrist.key(r, c, self.c.WHITE, False)
+                self.white_left += 1
+            elif r >= self.rows - filled:
+                self.grey |= bit
+                self.hash ^= self.zobrist.key(r, c, self.c.GREY, False)
+                self.grey_left += 1
+
+    def clear(self):
+        """Take every piece off the game board.
+        """
+        self.grey = self.white = self.kings = 0
+        self.grey_left = self.white_left = 0
+        self.grey_kings = self.white_kings = 0
+        self.hash = 0
+
+    def add_piece(self, piece):
+        """Put a piece on the game board at its own row and column.
+
+        Args:
+            piece (Piece): The piece to add; its square must be empty.
+        """
+        bit = self.bit_of[(piece.row, piece.col)]
+        self.hash ^= self.zobrist.key(piece.row, piece.col, piece.color, piece.king)
+        if piece.king:
+            self.kings |= bit
+        if piece.color == self.c.GREY:
+            self.grey |= bit
+            self.grey_left += 1
+            self.grey_kings += piece.king
+        else:
+            self.white |= bit
+            self.white_left += 1
+            self.white_kings += piece.king
+
+    def pack(self):
+        """Pack the position into a few bytes, in the same format as Board.pack.
+
+        Returns:
+            bytes: The grey, white and king bitmasks over Geometry.squares.
+        """
+        masks = [0, 0, 0]
+        for i, square in enumerate(self.geometry.squares):
+            bit = self.bit_of[square]
+            for m, bits in enumerate((self.grey, self.white, self.kings)):
+                if bits & bit:
+                    masks[m] |= 1 << i
+        return b''.join(mask.to_bytes(self.geometry.mask_bytes, 'little') for mask in masks)
+
+    @classmethod
+    def unpack(cls, data, rows=None, cols=None):
+        """Build a bitboard from a position made by pack.
+
+        Args:
+            data (bytes): The packed position.
+            rows (int, optional): The number of rows. Defaults to Constants.ROWS.
+            cols (int, optional): The number of columns. Defaults to Constants.COLS.
+
+        Returns:
+            BitBoard: A new board holding the position.
+        """
+        board = cls(rows, cols)
+        board.clear()
+        size = board.geometry.mask_bytes
+        grey, white, kings = (int.from_bytes(data[i:i + size], 'little') for i in range(0, 3 * size, size))
+        for i, (r, c) in enumerate(board.geometry.squares):
+            if (grey | white) >> i & 1:
+                piece = AngryPiece(r, c, board.c.GREY if grey >> i & 1 else board.c.WHITE)
+                piece.king = bool(kings >> i & 1)
+                board.add_piece(piece)
+        return board
+
+    @staticmethod
+    def shift(bits, amount):
+        """Shift a bitmask by a signed amount.
+
+        Args:
+            bits (int): The bitmask to shift.
+            amount (int): Positive to shift towards higher bits, negative for lower.
+
+        Returns:
+            int: The shifted bitmask.
+        """
+        return bits << amount if amount > 0 else bits >> -amount
+
+    def sides(self, color):
+        """Get the bitmasks of a side's pieces and of its opponent's pieces.
+
+        Args:
+            color (tuple): The color of the side to move.
+
+        Returns:
+            tuple: ``(own, opponent)`` bitmasks.
+        """
+        if color == self.c.GREY:
+            return self.grey, self.white
+        return self.white, self.grey
+
+    def directions(self, color, king):
+        """Get the shift amounts a piece is allowed to move in.
+
+        Args:
+            color (tuple): The color of the piece.
+            king (bool): Whether the piece is a king.
+
+        Returns:
+            tuple: The shift amounts for each diagonal the piece can use.
+        """
+        if king:
+            return self.up + self.down
+        if color == self.c.GREY:
+            return self.up
+        return self.down
+
+    def find_piece(self, r, c):
+        """Get the piece at the given position on the game board.
+
+        Args:
+            r (int): The row of the piece to get.
+            c (int): The column of the piece to get.
+
+        Returns:
+            Piece: A piece describing the occupant of the square, or 0 if it is empty.
+        """
+        bit = self.bit_of.get((r, c), 0)
+        if self.grey & bit:
+            piece = AngryPiece(r, c, self.c.GREY)
+        elif self.white & bit:
+            piece = AngryPiece(r, c, self.c.WHITE)
+        else:
+            return 0
+        if self.kings & bit:
+            piece.promote_king()
+        return piece
+
+    def get_all_pieces(self, color=None):
+        """Get every piece on the game board.
+
+        Args:
+            color (tuple, optional): Only return pieces of this color. Defaults to None,
+                which returns the pieces of both colors.
+
+        Returns:
+            list: The pieces on the board, row by row.
+        """
+        if color is None:
+            occupied = self.grey | self.white
+        else:
+            occupied = self.sides(color)[0]
+        return [self.find_piece(*square) for square in sorted(self.bit_of) if self.bit_of[square] & occupied]
+
+    def move(self, piece, r, c):
+        """Move a piece on the game board.
+
+        Args:
+            piece (Piece): The piece to move.
+            r (int): The row to move the piece to.
+            c (int): The column to move the piece to.
+        """
+        start = self.bit_of[(piece.row, piece.col)]
+        end = self.bit_of[(r, c)]
+        color = self.c.GREY if self.grey & start else self.c.WHITE
+        king = bool(self.kings & start)
+        # Flip the start and end bits of the mover's side (and of the kings if it is one)
+        if color == self.c.GREY:
+            self.grey ^= start | end
+        else:
+            self.white ^= start | end
+        if king:
+            self.kings ^= start | end
+        self.hash ^= self.zobrist.key(piece.row, piece.col, color, king) ^ self.zobrist.key(r, c, color, king)
+        piece.move_piece(r, c)
+        self.make_king(piece, r)
+
+    def make_king(self, piece, r):
+        """Make a piece a king if it reaches the opposite end of the board.
+
+        Args:
+            piece (Piece): The piece to potentially promote.
+            r (int): The row that the piece moved to.
+        """
+        if r == self.rows - 1 or r == 0:
+            piece.promote_king()
+            bit = self.bit_of[(r, piece.col)]
+            # Only a man becoming a king adds one; a king coming back to the edge does not
+            if not self.kings & bit:
+                self.hash ^= self.zobrist.key(r, piece.col, piece.color, False)
+                self.hash ^= self.zobrist.key(r, piece.col, piece.color, True)
+                self.kings |= bit
+                if piece.color == self.c.WHITE:
+                    self.white_kings += 1
+                else:
+                    self.grey_kings += 1
+
+    def remove_piece(self, pieces):
+        """Remove a list of pieces from the game board.
+
+        Args:
+            pieces (list): A list of pieces to remove.
+        """
+        for piece in pieces:
+            if piece != 0:
+                bit = self.bit_of[(piece.row, piece.col)]
+                king = bool(self.kings & bit)
+                if (self.grey | self.white) & bit:
+                    color = self.c.GREY if self.grey & bit else self.c.WHITE
+                    self.hash ^= self.zobrist.key(piece.row, piece.col, color, king)
+                keep = ~bit
+                self.grey &= keep
+                self.white &= keep
+                self.kings &= keep
+                if piece.color == self.c.GREY:
+                    self.grey_left -= 1
+                    self.grey_kings -= king
+                else:
+                    self.white_left -= 1
+                    self.white_kings -= king
+
+    def make_move(self, move):
+        """Play a move in place, without creating or moving piece objects.
+
+        Args:
+            move (tuple): The ``(start, end, captured)`` move, where ``start`` and
+                ``end`` are (row, col) squares and ``captured`` is a tuple of the
+                squares jumped over.
+
+        Returns:
+            tuple: An undo token to pass to unmake_move.
+        """
+        start, end, captured = move
+        # The whole position is a handful of ints, so the token is simply a snapshot
+        token = (self.grey, self.white, self.kings, self.grey_left, self.white_left,
+                 self.grey_kings, self.white_kings, self.hash)
+
+        bit_of, keys_of = self.bit_of, self.keys_of
+        start_bit = bit_of[start]
+        end_bit = bit_of[end]
+        grey = bool(self.grey & start_bit)
+        king = bool(self.kings & start_bit)
+        if grey:
+            self.grey ^= start_bit | end_bit
+        else:
+            self.white ^= start_bit | end_bit
+        if king:
+            self.kings ^= start_bit | end_bit
+        # Keys are ordered grey man, grey king, white man, white king, as in Zobrist.key
+        index = (0 if grey else 2) + king
+        self.hash ^= keys_of[start_bit][index] ^ keys_of[end_bit][index]
+
+        if not king and end_bit & (self.top | self.bottom):
+            self.kings |= end_bit
+            self.hash ^= keys_of[end_bit][index] ^ keys_of[end_bit][index + 1]
+            if grey:
+                self.grey_kings += 1
+            else:
+                self.white_kings += 1
+
+        for square in captured:
+            bit = bit_of[square]
+            captive_king = bool(self.kings & bit)
+            self.hash ^= keys_of[bit][(2 if grey else 0) + captive_king]
+            if grey:
+                self.white &= ~bit
+                self.white_left -= 1
+                self.white_kings -= captive_king
+            else:
+                self.grey &= ~bit
+                self.grey_left -= 1
+                self.grey_kings -= captive_king
+            self.kings &= ~bit
+        return token
+
+    def unmake_move(self, token):
+        """Take back a move played with make_move.
+
+        Args:
+            token (tuple): The undo token returned by make_move.
+        """
+        (self.grey, self.white, self.kings, self.grey_left, self.white_left,
+         self.grey_kings, self.white_kings, self.hash) = token
+
+    def winner(self, turn=None):
+        """Determine the winner of the game.
+
+        Args:
+            turn (tuple, optional): The side to move. When given, a side that has
+                no legal move loses.
+
+        Returns:
+            tuple: The color of the winning player, or None if the game is not over.
+        """
+        if self.grey_left <= 0:
+            return self.c.WHITE
+        elif self.white_left <= 0:
+            return self.c.GREY
+        elif turn is not None and not self.legal_moves(turn):
+            return self.c.WHITE if turn == self.c.GREY else self.c.GREY
+        return None
+
+    def possible_moves(self, piece):
+        """Get a dictionary of valid moves for a given piece.
+
+        The moves are the piece's share of legal_moves, so the compulsory
+        capture rule applies.
+
+        Args:
+            piece (Piece): The piece to get valid moves for.
+
+        Returns:
+            dict: A dictionary of valid moves, where the keys are tuples representing
+                positions on the game board, and the values are the pieces that will
+                be skipped if the move is made.
+        """
+        moves = {}
+        for start, end, captured in self.legal_moves(piece.color):
+            # When two sequences end on the same square, keep the one that takes more pieces
+            if start == (piece.row, piece.col) and len(captured) >= len(moves.get(end, ())):
+                moves[end] = [self.find_piece(*square) for square in captured]
+        return moves
+
+    def legal_moves(self, color):
+        """Get every legal move for one side, as squares.
+
+        This follows the same rules as Board.legal_moves (compulsory captures,
+        complete multi-jump sequences, a man's move ends when it is crowned)
+        and is cached the same way until the position changes. The returned
+        list is shared and must not be modified.
+
+        Args:
+            color (tuple): The side to move.
+
+        Returns:
+            list: ``(start, end, captured)`` moves, where ``start`` and ``end``
+                are (row, col) squares and ``captured`` is a tuple of the
+                squares jumped over, in order.
+        """
+        cached = self.move_cache.get(color)
+        if cached is not None and cached[0] == self.hash:
+            return cached[1]
+        short_moves = self.short_moves
+        moves = [short_moves.get(move) or self.square_move(move) for move in self.generate_moves(color)]
+        self.move_cache[color] = (self.hash, moves)
+        return moves
+
+    def square_move(self, move):
+        """Turn a move from bit form into squares.
+
+        Quiet moves and single jumps are few enough to keep, so each is made
+        once and shared by every board of the same size; longer jump sequences
+        are made afresh.
+
+        Args:
+            move (tuple): A ``(start, end, captured)`` move as made by generate_moves.
+
+        Returns:
+            tuple: The same move with (row, col) squares.
+        """
+        square_of = self.square_of
+        start, end, captured = move
+        found = (square_of[start], square_of[end], tuple(square_of[bit] for bit in captured))
+        if len(captured) < 2:
+            self.short_moves[move] = found
+        return found
+
+    def generate_moves(self, color):
+        """Generate every legal move for one side with whole-board shifts.
+
+        This is the fast path for analysis code: first jumps and quiet moves
+        for all pieces of a side are found in a handful of integer operations
+        per direction, and no piece objects are created.
+
+        Args:
+            color (tuple): The color of the side to move.
+
+        Returns:
+            list: ``(start, end, captured)`` moves, where ``start`` and ``end``
+                are single-bit masks and ``captured`` is a tuple of the
+                single-bit masks jumped over, in order (empty for a quiet move).
+        """
+        moves = []
+        own, opponent = self.sides(color)
+        empty = self.valid & ~(own | opponent)
+        kings = own & self.kings
+        # Men only move forwards; kings move both ways
+        if color == self.c.GREY:
+            up, down, crown = own, kings, self.top
+        else:
+            up, down, crown = kings, own, self.bottom
+
+        # Captures: an enemy one step away and a free square two steps away
+        for amount in self.down:
+            if not down:
+                break
+            ends = (((down << amount) & opponent) << amount) & empty
+            while ends:
+                end = ends & -ends
+                ends ^= end
+                start = end >> (2 * amount)
+                self.add_jumps(start, end, (end >> amount,), bool(kings & start), color,
+                               opponent, empty | start, crown, moves)
+        for amount in self.up:
+            if not up:
+                break
+            amount = -amount
+            ends = (((up >> amount) & opponent) >> amount) & empty
+            while ends:
+                end = ends & -ends
+                ends ^= end
+                start = end << (2 * amount)
+                self.add_jumps(start, end, (end << amount,), bool(kings & start), color,
+                               opponent, empty | start, crown, moves)
+        if moves:
+            return moves
+
+        # Quiet moves: shift every mover and keep the free landing squares
+        for amount in self.down:
+            if not down:
+                break
+            ends = (down << amount) & empty
+            while ends:
+                end = ends & -ends
+                ends ^= end
+                moves.append((end >> amount, end, ()))
+        for amount in self.up:
+            if not up:
+                break
+            amount = -amount
+            ends = (up >> amount) & empty
+            while ends:
+                end = ends & -ends
+                ends ^= end
+                moves.append((end << amount, end, ()))
+        return moves
+
+    def add_jumps(self, start, square, captured, king, color, opponent, empty, crown, moves):
+        """Extend a jump sequence for as long as the piece can keep jumping.
+
+        Args:
+            start (int): The bit of the square the piece started from.
+            square (int): The bit of the square it has reached.
+            captured (tuple): The bits jumped over so far, in order.
+            king (bool): Whether the jumping piece is a king.
+            color (tuple): The color of the jumping piece.
+            opponent (int): The bits of the opponent's pieces; jumped ones stay until the move ends.
+            empty (int): The bits of the empty squares, including the start square.
+            crown (int): The bits of the row where this side's men are crowned.
+            moves (list): The list to add finished sequences to.
+        """
+        # A man that reaches the far row is crowned, which ends its move
+        if not king and square & crown:
+            moves.append((start, square, captured))
+            return
+
+        extended = False
+        for amount in self.directions(color, king):
+            step = self.shift(square, amount)
+            if step & opponent and step not in captured:
+                land = self.shift(step, amount)
+                if land & empty:
+                    self.add_jumps(start, land, captured + (step,), king, color, opponent, empty, crown, moves)
+                    extended = True
+        if not extended:
+            moves.append((start, square, captured))
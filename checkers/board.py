@@ -1,58 +1,98 @@
-import pygame
+import copy
 from checkers.constants import Constants
-from checkers.piece import Piece
 from checkers.angry_piece import AngryPiece
+from checkers.geometry import Geometry
+from checkers.zobrist import Zobrist
 
 class Board:
-    def __init__(self):
+    def __init__(self, rows=None, cols=None):
         """Initialize a new game board.
-        """
+
+    Args:
+        rows (int, optional): The number of rows. Defaults to Constants.ROWS.
+        cols (int, optional): The number of columns. Defaults to Constants.COLS.
+    """
         self.c = Constants()
+        self.rows = rows or self.c.ROWS
+        self.cols = cols or self.c.COLS
+        # Neighbour tables shared by every board of this size
+        self.geometry = Geometry.for_size(self.rows, self.cols)
         self.board = []
-        self.grey_left = self.white_left = 12
+        self.grey_left = self.white_left = 0
         self.grey_kings = self.white_kings = 0
+        # Zobrist hash of the position, kept up to date by every change to the board
+        self.zobrist = Zobrist.for_size(self.rows, self.cols)
+        self.hash = 0
+        # Legal moves per side, along with the hash of the position they were generated for
+        self.move_cache = {}
         self.build_board()
 
-    def make_squares(self, window):
-        """Draw the squares on the game board.
+    def __deepcopy__(self, memo):
+        """Copy the board and its pieces, sharing the read-only hash keys.
 
-        Args:
-            window (Surface): The Pygame surface on which to draw the game board.
-        """
-         # Fill the window with the color BLACK
-        window.fill(self.c.BLACK)
+    Args:
+        memo (dict): The deepcopy memo.
 
-        # Loop through all rows and columns of the game board
-        for r in range(self.c.ROWS):
-            for c in range(r % 2, self.c.COLS, 2):
-                # Draw a square at the current row and column
-                self.square(window, r, c)
-    def square(self, window, r, c):
-        """Draw a single square on the game board.
+    Returns:
+        Board: An independent copy of the board.
+    """
+        memo[id(self.zobrist)] = self.zobrist
+        memo[id(self.geometry)] = self.geometry
+        board = Board.__new__(Board)
+        memo[id(self)] = board
+        board.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        return board
+
+    def __eq__(self, other):
+        """Check whether two boards hold the same position.
 
     Args:
-        window (Surface): The Pygame surface on which to draw the game board.
-        r (int): The row of the square to draw.
-        c (int): The column of the square to draw.
+        other (Board): The board to compare with.
+
+    Returns:
+        bool: True if every square holds the same kind of piece.
+    """
+        if not isinstance(other, Board):
+            return NotImplemented
+        # Different hashes always mean different positions, so only compare squares on a match
+        if self.hash != other.hash:
+            return False
+        return self.geometry is other.geometry and all(
+            self.square_key(r, c) == other.square_key(r, c) for r, c in self.geometry.squares)
+
+    def __hash__(self):
+        """Hash the board by its position, so it changes as the board changes.
     """
-        #draws square
-        pygame.draw.rect(window, self.c.GREY, (r * self.c.SQUARE, c * self.c.SQUARE,
-                                                   self.c.SQUARE, self.c.SQUARE))
+        return self.hash
 
-    def move(self, piece, r, c, window=None):
+    def square_key(self, r, c):
+        """Describe the contents of a square.
+
+    Args:
+        r (int): The row of the square.
+        c (int): The column of the square.
+
+    Returns:
+        tuple: The (color, king) of the piece on the square, or None if it is empty.
+    """
+        piece = self.board[r][c]
+        return None if piece == 0 else (piece.color, piece.king)
+
+    def move(self, piece, r, c):
         """Move a piece on the game board.
 
     Args:
         piece (Piece): The piece to move.
         r (int): The row to move the piece to.
         c (int): The column to move the piece to.
-        window (Surface, optional): The Pygame surface on which to draw the move.
-            Defaults to None.
     """
+        # Take the piece off its old square in the hash and put it on the new one
+        self.hash ^= self.zobrist.key(piece.row, piece.col, piece.color, piece.king)
+        self.hash ^= self.zobrist.key(r, c, piece.color, piece.king)
         # Swap the piece at the current position with the piece at the new position
         self.board[piece.row][piece.col], self.board[r][c] = self.board[r][c], self.board[piece.row][piece.col]
         # Move the piece to the new position on the game board
-        piece.move_piece(r, c, window)
+        piece.move_piece(r, c)
         # If the moved piece reaches the opposite side of the board, make it a king
         self.make_king(piece, r)
 
@@ -64,16 +104,19 @@ class Board:
         row (int): The row that the piece moved to.
     """
         # Check if the piece reached the top or bottom row of the board
-        if r == self.c.ROWS - 1 or r == 0:
+        if r == self.rows - 1 or r == 0:
+            # A man that becomes a king changes its key in the hash and adds a king;
+            # a king coming back to the edge stays what it was
+            if not piece.king:
+                self.hash ^= self.zobrist.key(piece.row, piece.col, piece.color, False)
+                self.hash ^= self.zobrist.key(piece.row, piece.col, piece.color, True)
+                if piece.color == self.c.WHITE:
+                    self.white_kings += 1
+                else:
+                    self.grey_kings += 1
             # Promote the piece to a king
             piece.promote_king()
 
-            # Increment the number of kings for the piece's color
-            if piece.color == self.c.WHITE:
-                self.white_kings += 1
-            else:
-                self.grey_kings += 1
-
     def find_piece(self, r, c):
         """Get the piece at the given position on the game board.
 
@@ -91,12 +134,12 @@ class Board:
         """Create the initial state of the game board.
     """
         # Loop through all rows and columns of the game board
-        for r in range(self.c.ROWS):
+        for r in range(self.rows):
             # Append an empty list to represent the current row of the board
             self.board.append([])
 
             # Loop through all columns of the current row
-            for c in range(self.c.COLS):
+            for c in range(self.cols):
                 # Create a piece at the current position on the board
                 self.create_piece(r,c)
 
@@ -110,11 +153,15 @@ class Board:
          # Check if the current position should contain a piece
         if c % 2 == ((r + 1) % 2):
             # If the row is in the top three rows, create a white piece
-            if r < 3:
+            if r < self.geometry.start_rows():
                 self.board[r].append(AngryPiece(r, c, self.c.WHITE))
+                self.hash ^= self.zobrist.key(r, c, self.c.WHITE, False)
+                self.white_left += 1
             # If the row is in the bottom three rows, create a grey piece
-            elif r > 4:
+            elif r >= self.rows - self.geometry.start_rows():
                 self.board[r].append(AngryPiece(r, c, self.c.GREY))
+                self.hash ^= self.zobrist.key(r, c, self.c.GREY, False)
+                self.grey_left += 1
             # Otherwise, append 0 to represent an empty position
             else:
                 self.board[r].append(0)
@@ -123,24 +170,90 @@ class Board:
             self.board[r].append(0)
         
 
-    def draw_board(self, window):
-        """Draw the game board and all of the pieces on it.
+    def clear(self):
+        """Take every piece off the game board.
+    """
+        self.board = [[0] * self.cols for _ in range(self.rows)]
+        self.grey_left = self.white_left = 0
+        self.grey_kings = self.white_kings = 0
+        self.hash = 0
+
+    def add_piece(self, piece):
+        """Put a piece on the game board at its own row and column.
 
     Args:
-        window (Surface): The Pygame surface on which to draw the game board.
+        piece (Piece): The piece to add; its square must be empty.
     """
-         # Draw the squares on the game board
-        self.make_squares(window)
+        self.board[piece.row][piece.col] = piece
+        self.hash ^= self.zobrist.key(piece.row, piece.col, piece.color, piece.king)
+        # Count the piece, and its crown if it has one
+        if piece.color == self.c.GREY:
+            self.grey_left += 1
+            self.grey_kings += piece.king
+        else:
+            self.white_left += 1
+            self.white_kings += piece.king
 
-        # Loop through all rows and columns of the game board
-        for r in range(self.c.ROWS):
-            for c in range(self.c.COLS):
-                # Get the piece at the current position on the board
-                piece = self.board[r][c]
+    def pack(self):
+        """Pack the position into a few bytes, for keeping many positions in memory.
+
+    The position is stored as three bitmasks over the playable squares, in
+    the order of Geometry.squares: grey pieces, white pieces and kings.
+
+    Returns:
+        bytes: The packed position; 12 bytes on an 8x8 board.
+    """
+        grey = white = kings = 0
+        for piece in self.get_all_pieces():
+            bit = 1 << self.geometry.index[(piece.row, piece.col)]
+            if piece.color == self.c.GREY:
+                grey |= bit
+            else:
+                white |= bit
+            if piece.king:
+                kings |= bit
+        size = self.geometry.mask_bytes
+        return grey.to_bytes(size, 'little') + white.to_bytes(size, 'little') + kings.to_bytes(size, 'little')
+
+    @classmethod
+    def unpack(cls, data, rows=None, cols=None):
+        """Build a board from a position made by pack.
 
-                # If there is a piece at the current position, draw it on the window
-                if piece != 0:
-                    piece.draw_piece(window)
+    Args:
+        data (bytes): The packed position.
+        rows (int, optional): The number of rows. Defaults to Constants.ROWS.
+        cols (int, optional): The number of columns. Defaults to Constants.COLS.
+
+    Returns:
+        Board: A new board holding the position.
+    """
+        board = cls(rows, cols)
+        board.clear()
+        size = board.geometry.mask_bytes
+        grey, white, kings = (int.from_bytes(data[i:i + size], 'little') for i in range(0, 3 * size, size))
+        for i, (r, c) in enumerate(board.geometry.squares):
+            if (grey | white) >> i & 1:
+                piece = AngryPiece(r, c, board.c.GREY if grey >> i & 1 else board.c.WHITE)
+                piece.king = bool(kings >> i & 1)
+                board.add_piece(piece)
+        return board
+
+    def get_all_pieces(self, color=None):
+        """Get every piece on the game board.
+
+    Args:
+        color (tuple, optional): Only return pieces of this color. Defaults to None,
+            which returns the pieces of both colors.
+
+    Returns:
+        list: The pieces on the board, row by row.
+    """
+        pieces = []
+        for row in self.board:
+            for piece in row:
+                if piece != 0 and (color is None or piece.color == color):
+                    pieces.append(piece)
+        return pieces
 
     def remove_piece(self, pieces):
         """Remove a list of pieces from the game board.
@@ -155,15 +268,73 @@ class Board:
 
             # If the piece is not 0 (i.e. it is a valid piece)
             if piece != 0:
-                # Decrement the number of pieces for the piece's color
+                # Take the piece out of the hash
+                self.hash ^= self.zobrist.key(piece.row, piece.col, piece.color, piece.king)
+                # Decrement the number of pieces, and of kings, for the piece's color
                 if piece.color == self.c.GREY:
                     self.grey_left -= 1
+                    self.grey_kings -= piece.king
                 else:
                     self.white_left -= 1
+                    self.white_kings -= piece.king
+
+    def make_move(self, move):
+        """Play a move in place, without going through the pieces' own move logic.
 
-    def winner(self):
+    This is the fast path for search: it skips the trash talk and records
+    everything needed to take the move back with unmake_move.
+
+    Args:
+        move (tuple): The ``(start, end, captured)`` move, where ``start`` and
+            ``end`` are (row, col) squares and ``captured`` is a tuple of the
+            squares jumped over.
+
+    Returns:
+        tuple: An undo token to pass to unmake_move.
+    """
+        (sr, sc), (er, ec), captured = move
+        piece = self.board[sr][sc]
+        # Remember the moving piece's rank, the captured pieces, the counters and the hash
+        token = (move, piece, piece.king, [self.board[r][c] for r, c in captured],
+                 self.grey_left, self.white_left, self.grey_kings, self.white_kings, self.hash)
+
+        self.hash ^= self.zobrist.key(sr, sc, piece.color, piece.king) ^ self.zobrist.key(er, ec, piece.color, piece.king)
+        self.board[sr][sc] = 0
+        self.board[er][ec] = piece
+        piece.row, piece.col = er, ec
+        self.make_king(piece, er)
+        if captured:
+            self.remove_piece(token[3])
+        return token
+
+    def unmake_move(self, token):
+        """Take back a move played with make_move.
+
+    Moves must be taken back in the reverse order they were made.
+
+    Args:
+        token (tuple): The undo token returned by make_move.
+    """
+        move, piece, was_king, captured, grey_left, white_left, grey_kings, white_kings, old_hash = token
+        (sr, sc), (er, ec), _ = move
+        self.board[er][ec] = 0
+        self.board[sr][sc] = piece
+        piece.row, piece.col = sr, sc
+        piece.king = was_king
+        # Captured pieces still know where they stood
+        for captive in captured:
+            self.board[captive.row][captive.col] = captive
+        self.grey_left, self.white_left = grey_left, white_left
+        self.grey_kings, self.white_kings = grey_kings, white_kings
+        self.hash = old_hash
+
+    def winner(self, turn=None):
         """Determine the winner of the game.
 
+    Args:
+        turn (tuple, optional): The side to move. When given, a side that has
+            no legal move loses.
+
     Returns:
         str: The color of the winning player, or None if the game is not over.
     """
@@ -173,190 +344,121 @@ class Board:
         # If there are no more white pieces, grey wins
         elif self.white_left <= 0:
             return self.c.GREY
+        # If the side to move is stuck, the other side wins
+        elif turn is not None and not self.legal_moves(turn):
+            return self.c.WHITE if turn == self.c.GREY else self.c.GREY
 
         # If there are still pieces of both colors, the game is not over
         return None
 
-    def possible_moves(self, piece):
-        """Get a dictionary of valid moves for a given piece.
+    def steps(self, piece, square):
+        """Get the neighbour tables for the directions a piece may move in.
 
     Args:
-        piece (Piece): The piece to get valid moves for.
+        piece (Piece): The piece that moves.
+        square (tuple): The (row, col) square it moves from.
 
     Returns:
-        dict: A dictionary of valid moves, where the keys are tuples representing
-            positions on the game board, and the values are the pieces that will
-            be skipped if the move is made.
+        tuple: ``(step, land)`` pairs, one per direction.
     """
-        # Initialize an empty dictionary to store valid moves
-        posible_moves = {}
+        # Kings move both ways, grey men move up and white men move down
+        if piece.king:
+            return self.geometry.both[square]
+        elif piece.color == self.c.GREY:
+            return self.geometry.up[square]
+        return self.geometry.down[square]
 
-        # Get the left and right columns relative to the current piece's position
-        left_col = piece.col - 1
-        right = piece.col + 1
-
-        # Get the current piece's row
-        r = piece.row
-
-        # If the current piece is a grey piece or a king,
-        # check for possible moves in the upward direction
-        if piece.color == self.c.GREY or piece.king:
-            # Update the dictionary of valid moves with the moves that are found
-            posible_moves.update(self.move_left(r - 1, max(r - 3, -1), -1, piece.color, left_col))
-            posible_moves.update(self.move_right(r - 1, max(r - 3, -1), -1, piece.color, right))
-
-        # If the current piece is a white piece or a king,
-        # check for possible moves in the downward direction
-        if piece.color == self.c.WHITE or piece.king:
-            # Update the dictionary of valid moves with the moves that are found
-            posible_moves.update(self.move_left(r + 1, min(r + 3, self.c.ROWS), 1, piece.color, left_col))
-            posible_moves.update(self.move_right(r + 1, min(r + 3, self.c.ROWS), 1, piece.color, right))
-        # Return the dictionary of valid moves
-        return posible_moves
+    def legal_moves(self, color):
+        """Get every legal move for one side.
 
-    def move_left(self, start, stop, step, color, left, passed=[]):
-        """Recursively traverse the game board in the left direction.
+    Captures are compulsory: if any piece can jump, only jumps are returned.
+    A jump carries on for as long as the piece can keep jumping, and each
+    complete sequence is one move. A man that reaches the far row is crowned
+    and its move ends there.
 
-    This method is used to find all of the valid moves for a given piece.
+    The result is cached until the position changes, so the user interface,
+    the engine and win detection can all ask for it without rescanning the
+    board. The returned list is shared and must not be modified.
 
     Args:
-        row (int): The row to start traversing from.
-        end (int): The row to end traversing at.
-        direction (int): The direction in which to traverse (-1 for up, 1 for down).
-        color (str): The color of the piece for which to find valid moves.
-        col (int): The column to traverse from.
+        color (tuple): The side to move.
 
     Returns:
-        dict: A dictionary of valid moves that were found during traversal, where the keys
-            are tuples representing positions on the game board, and the values are the pieces
-            that will be skipped if the move is made.
+        list: ``(start, end, captured)`` moves, where ``start`` and ``end``
+            are (row, col) squares and ``captured`` is a tuple of the squares
+            jumped over, in order.
     """
-         # Initialize an empty dictionary to store valid moves
-        posible_moves = {}
-
-        # Initialize a list to store pieces that have been skipped
-        removed = []
-
-        # Loop through the rows starting at the start position and moving in the direction specified by step
-        for r in range(start, stop, step):
-            # If the left column is out of bounds, break out of the loop
-            if left < 0:
-                break
-
-            # Get the piece at the current position on the board
-            # Get the piece at the current position on the board
-            current = self.board[r][left]
-
-            # If the current position is empty,
-            if current == 0:
-                # If there are pieces that have been skipped and there are no previous pieces that were skipped, break out of the loop
-                if passed and not removed:
-                    break
-                # If there are pieces that have been skipped, add the previous pieces that were skipped to the current move
-                elif passed:
-                    posible_moves[(r, left)] = removed + passed
-                # If there are no pieces that have been skipped, add the previous pieces that were skipped to the current move
-                else:
-                    posible_moves[(r, left)] = removed
-
-                # If there are previous pieces that were skipped,
-                if removed:
-                    # If the direction is upward, set the new starting row to the maximum of the current row minus 3, or 0
-                    if step == -1:
-                        r = max(r - 3, 0)
-                    # If the direction is downward, set the new starting row to the minimum of the current row plus 3, or the number of rows on the board
-                    else:
-                        r = min(r + 3, self.c.ROWS)
-                    # Recursively check for valid moves in the left direction starting at the new starting row and moving in the same direction as before
-                    posible_moves.update(self.move_left(r + step, r, step, color, left - 1, passed=removed))
-                    # Recursively check for valid moves in the right direction starting at the new starting row and moving in the same direction as before
-                    posible_moves.update(self.move_right(r + step, r, step, color, left + 1, passed=removed))
-                break
-            # If the current position is occupied by a piece of the same color as the current piece, break out of the loop
-            elif current.color == color:
-                break
-            # If the current position is occupied by a piece of the opposite color, add the piece to the list of pieces that have been skipped
-            else:
-                removed = [current]
-
-            # Decrement the left column to move to the next position in the left direction
-            left -= 1
-
-            # Return the dictionary of valid moves
-        return posible_moves
+        cached = self.move_cache.get(color)
+        if cached is not None and cached[0] == self.hash:
+            return cached[1]
+
+        captures = []
+        quiet = []
+        for square in self.geometry.squares:
+            piece = self.board[square[0]][square[1]]
+            if piece == 0 or piece.color != color:
+                continue
+            for step, land in self.steps(piece, square):
+                # An empty neighbour is a simple move; only worth keeping while no capture is known
+                if self.board[step[0]][step[1]] == 0:
+                    if not captures:
+                        quiet.append((square, step, ()))
+            self.add_jumps(piece, square, square, (), captures)
+
+        moves = captures or quiet
+        self.move_cache[color] = (self.hash, moves)
+        return moves
+
+    def add_jumps(self, piece, start, square, captured, moves):
+        """Collect every complete jump sequence that continues from a square.
+
+    Jumped pieces stay on the board until the move is over, so they block
+    landing squares but cannot be jumped twice. The square the piece started
+    from counts as empty.
 
+    Args:
+        piece (Piece): The jumping piece.
+        start (tuple): The square the piece started the move from.
+        square (tuple): The square it has reached so far.
+        captured (tuple): The squares jumped over so far, in order.
+        moves (list): The list to add finished sequences to.
+    """
+        # A man that reaches the far row is crowned, which ends its move
+        if captured and not piece.king and square[0] == (0 if piece.color == self.c.GREY else self.rows - 1):
+            moves.append((start, square, captured))
+            return
+
+        extended = False
+        for step, land in self.steps(piece, square):
+            if land is None or step in captured:
+                continue
+            target = self.board[step[0]][step[1]]
+            if target != 0 and target.color != piece.color \
+                    and (self.board[land[0]][land[1]] == 0 or land == start):
+                self.add_jumps(piece, start, land, captured + (step,), moves)
+                extended = True
+
+        # The sequence ends where no further jump is possible
+        if captured and not extended:
+            moves.append((start, square, captured))
 
-    #same as move_left function but in right direction
-    def move_right(self, start, stop, step, color, right, passed=[]):
-        """Recursively traverse the game board in the right direction.
+    def possible_moves(self, piece):
+        """Get a dictionary of valid moves for a given piece.
 
-    This method is used to find all of the valid moves for a given piece.
+    The moves are the piece's share of legal_moves, so the compulsory
+    capture rule applies.
 
     Args:
-        r (int): The row to start traversing from.
-        end (int): The row to end traversing at.
-        direction (int): The direction in which to traverse (-1 for up, 1 for down).
-        color (str): The color of the piece for which to find valid moves.
-        c (int): The column to traverse from.
+        piece (Piece): The piece to get valid moves for.
 
     Returns:
-        dict: A dictionary of valid moves that were found during traversal, where the keys
-            are tuples representing positions on the game board, and the values are the pieces
-            that will be skipped if the move is made.
+        dict: A dictionary of valid moves, where the keys are tuples representing
+            positions on the game board, and the values are the pieces that will
+            be skipped if the move is made.
     """
-        # Initialize the dictionary of valid moves
         posible_moves = {}
-        # Initialize the list of pieces that have been skipped
-        removed = []
-
-        # For each row in the given direction starting at the starting row and ending at the ending row,
-        for r in range(start, stop, step):
-            # If the current column is equal to or greater than the number of columns on the board, break out of the loop
-            if right >= self.c.COLS:
-                break
-
-            # Get the piece at the current position on the board
-            current = self.board[r][right]
-
-            # If the current position is empty,
-            if current == 0:
-                # If there are pieces that have been skipped and there are no previous pieces that were skipped, break out of the loop
-                if passed and not removed:
-                    break
-                # If there are pieces that have been skipped, add the previous pieces that were skipped to the current move
-                elif passed:
-                    posible_moves[(r, right)] = removed + passed
-                # If there are no pieces that have been skipped, add the previous pieces that were skipped to the current move
-                else:
-                    posible_moves[(r, right)] = removed
-
-                # If there are previous pieces that were skipped,
-                if removed:
-                    # If the direction is upward, set the new starting row to the maximum of the current row minus 3, or 0
-                    if step == -1:
-                        r = max(r - 3, 0)
-                    # If the direction is downward, set the new starting row to the minimum of the current row plus 3, or the number of rows on the board
-                    else:
-                        r = min(r + 3, self.c.ROWS)
-                    # Recursively check for valid moves in the left direction starting at the new starting row and moving in the same direction as before
-                    posible_moves.update(self.move_left(r + step, r, step, color, right - 1, passed=removed))
-                    # Recursively check for valid moves in the right direction starting at the new starting row and moving in the same direction as before
-                    posible_moves.update(self.move_right(r + step, r, step, color, right + 1, passed=removed))
-                # If there are no previous pieces that were skipped, break out of the loop
-                break
-            # If the current position is occupied by a piece of the same color as the current piece, break out of the loop
-            elif current.color == color:
-                break
-            # If the current position is occupied by a piece of the opposite color, add the piece to the list of pieces that have been skipped
-            else:
-                removed = [current]
-
-            # Decrement the left column to move to the next position in the left direction
-            right += 1
-
-            # Return the dictionary of valid moves
+        for start, end, captured in self.legal_moves(piece.color):
+            # When two sequences end on the same square, keep the one that takes more pieces
+            if start == (piece.row, piece.col) and len(captured) >= len(posible_moves.get(end, ())):
+                posible_moves[end] = [self.board[r][c] for r, c in captured]
         return posible_moves
-
-
-        
-        
@@ -0,0 +1,324 @@
+import argparse
+import mmap
+import struct
+from checkers.constants import Constants
+from checkers.bitboard import BitBoard
+from checkers.geometry import Geometry
+
+
+def encode_move(geometry, move, moves):
+    """Turn a move into the two numbers a book record stores.
+
+    Args:
+        geometry (Geometry): The board's geometry.
+        move (tuple): The ``(start, end, captured)`` move.
+        moves (list): Every legal move in the position, to tell apart jumps that
+            start and end on the same squares.
+
+    Returns:
+        tuple: The start and end square indices packed into one number, and the
+            move's place among the legal moves between the same two squares.
+    """
+    start, end, captured = move
+    same = sorted(m[2] for m in moves if m[0] == start and m[1] == end)
+    return geometry.index[start] << 8 | geometry.index[end], same.index(captured)
+
+
+def decode_move(geometry, squares, alternative, moves):
+    """Find the legal move a book record stands for.
+
+    Args:
+        geometry (Geometry): The board's geometry.
+        squares (int): The start and end square indices, as made by encode_move.
+        alternative (int): The move's place among the moves between those squares.
+        moves (list): Every legal move in the position.
+
+    Returns:
+        tuple: The move, or None if it is not legal here.
+    """
+    start, end = geometry.squares[squares >> 8], geometry.squares[squares & 0xFF]
+    same = sorted((m for m in moves if m[0] == start and m[1] == end), key=lambda m: m[2])
+    return same[alternative] if alternative < len(same) else None
+
+
+class BookBuilder:
+    """Collects the moves played in the opening of many games.
+
+    For every position reached in the first few plies it counts how often
+    each move was played and how many points the side that played it went
+    on to score, keyed by the position's Zobrist hash.
+    """
+
+    def __init__(self, plies=16, rows=None, cols=None):
+        """Initialize an empty builder.
+
+        Args:
+            plies (int, optional): How many plies of each game to record. Defaults to 16.
+            rows (int, optional): The number of rows. Defaults to Constants.ROWS.
+            cols (int, optional): The number of columns. Defaults to Constants.COLS.
+        """
+        self.c = Constants()
+        self.plies = plies
+        self.rows = rows or self.c.ROWS
+        self.cols = cols or self.c.COLS
+        self.geometry = Geometry.for_size(self.rows, self.cols)
+        # {position key: {(squares, alternative): [games, half points]}}
+        self.positions = {}
+        self.games = 0
+
+    def add_game(self, moves, winner):
+        """Record the opening of one game.
+
+        Args:
+            moves (list): The game's moves from the starting position, as
+                ``(start, end, captured)`` tuples, grey moving first.
+            winner (tuple): The color of the winner, or None for a draw.
+
+        Raises:
+            ValueError: If a move is not legal where it was played.
+        """
+        board = BitBoard(self.rows, self.cols)
+        turn = self.c.GREY
+        for ply, move in enumerate(moves[:self.plies]):
+            legal = board.legal_moves(turn)
+            if move not in legal:
+                raise ValueError(f"illegal move {move} at ply {ply + 1}")
+            key = board.zobrist.position_key(board, turn)
+            stats = self.positions.setdefault(key, {}).setdefault(encode_move(self.geometry, move, legal), [0, 0])
+            stats[0] += 1
+            # Two half points for a win, one for a draw, for the side that played the move
+            stats[1] += 1 if winner is None else 2 if winner == turn else 0
+            board.make_move(move)
+            turn = self.c.WHITE if turn == self.c.GREY else self.c.GREY
+        self.games += 1
+
+    def self_play(self, games, engine=None, workers=None, seed=0, **rules):
+        """Play games between two copies of an engine and record them.
+
+        Args:
+            games (int): How many games to play.
+            engine (dict, optional): The player's configuration, as taken by make_player.
+            workers (int, optional): The number of processes. Defaults to the number of cores.
+            seed (int, optional): Seeds the random openings. Defaults to 0.
+            **rules: Passed on to play_game; opening_plies sets how many random plies
+                start each game, which is what makes the games differ.
+
+        Yields:
+            dict: The result of every game as it finishes, as returned by play_game.
+        """
+        # The engine itself can read books, so the tournament is only imported when needed
+        from checkers.tournament import Tournament
+        c = self.c
+        tournament = Tournament(engine or {}, engine or {}, games, workers, seed, **rules)
+        for result in tournament.run():
+            a_color = c.GREY if result['a_is_grey'] else c.WHITE
+            b_color = c.WHITE if result['a_is_grey'] else c.GREY
+            winner = {1.0: a_color, 0.5: None, 0.0: b_color}[result['score']]
+            self.add_game(result['moves'], winner)
+            yield result
+
+    def records(self, min_games=1):
+        """List the book's records in file order.
+
+        Args:
+            min_games (int, optional): Leave out moves played fewer times than this.
+
+        Returns:
+            list: ``(key, squares, alternative, games, half points)`` tuples, sorted by
+                key and, within a position, most played first.
+        """
+        found = []
+        for key, moves in self.positions.items():
+            for (squares, alternative), (games, points) in moves.items():
+                if games >= min_games:
+                    found.append((key, squares, alternative, games, points))
+        found.sort(key=lambda record: (record[0], -record[3], record[1], record[2]))
+        return found
+
+    def write(self, path, min_games=1):
+        """Write the book to a file.
+
+        Args:
+            path (str): Where to write it.
+            min_games (int, optional): Leave out moves played fewer times than this.
+
+        Returns:
+            int: The number of records written.
+        """
+        records = self.records(min_games)
+        with open(path, 'wb') as f:
+            f.write(OpeningBook.HEADER.pack(OpeningBook.MAGIC, OpeningBook.VERSION, self.rows, self.cols,
+                                            len(records)))
+            for record in records:
+                f.write(OpeningBook.RECORD.pack(*record))
+        return len(records)
+
+
+class OpeningBook:
+    """Reads an opening book written by BookBuilder.
+
+    The file is a short header followed by fixed-size records sorted by
+    position key, so a position's moves are found by binary search straight
+    in the memory-mapped file, without loading or parsing it first.
+    """
+
+    MAGIC = b'CKBK'
+    VERSION = 1
+    # Magic, version, rows, columns, a spare byte and the number of records
+    HEADER = struct.Struct('<4sBBBxI')
+    # Position key, start and end squares, alternative, games and half points
+    RECORD = struct.Struct('<QHHII')
+
+    def __init__(self, path, min_games=1, rng=None):
+        """Open a book.
+
+        Args:
+            path (str): The book file.
+            min_games (int, optional): Only play moves seen at least this many times. Defaults to 1.
+            rng (random.Random, optional): Picks among the book moves in proportion to how
+                often they were played. Defaults to always playing the most played one.
+
+        Raises:
+            ValueError: If the file is not an opening book.
+        """
+        self.c = Constants()
+        self.min_games = min_games
+        self.rng = rng
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.rows, self.cols, self.count = self.HEADER.unpack_from(self.data)
+        if magic != self.MAGIC or version != self.VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not an opening book")
+        self.geometry = Geometry.for_size(self.rows, self.cols)
+
+    def __len__(self):
+        """
+        Return the number of records in the book.
+        """
+        return self.count
+
+    def close(self):
+        """Unmap the file.
+        """
+        self.data.close()
+
+    def key_at(self, i):
+        """Read the position key of a record.
+
+        Args:
+            i (int): The record's place in the file.
+
+        Returns:
+            int: The key.
+        """
+        return struct.unpack_from('<Q', self.data, self.HEADER.size + i * self.RECORD.size)[0]
+
+    def lookup(self, key):
+        """Find the records of a position.
+
+        Args:
+            key (int): The position's Zobrist key, side to move included.
+
+        Returns:
+            list: ``(squares, alternative, games, half points)`` tuples, most played first.
+        """
+        low, high = 0, self.count
+        # Binary search for the first record with this key
+        while low < high:
+            middle = (low + high) // 2
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < self.count:
+            record = self.RECORD.unpack_from(self.data, self.HEADER.size + low * self.RECORD.size)
+            if record[0] != key:
+                break
+            found.append(record[1:])
+            low += 1
+        return found
+
+    def probe(self, board, color):
+        """List the book moves for a position.
+
+        Args:
+            board (Board): The position; any board engine of the book's size works.
+            color (tuple): The side to move.
+
+        Returns:
+            list: ``(move, games, score)`` tuples, most played first, where score is
+                the share of points the side to move went on to score.
+        """
+        if (board.rows, board.cols) != (self.rows, self.cols):
+            return []
+        records = self.lookup(board.zobrist.position_key(board, color))
+        if not records:
+            return []
+        moves = board.legal_moves(color)
+        found = []
+        for squares, alternative, games, points in records:
+            move = decode_move(self.geometry, squares, alternative, moves)
+            # A hash collision can point at moves that do not exist here
+            if move is not None and games >= self.min_games:
+                found.append((move, games, points / (2 * games)))
+        return found
+
+    def choose(self, board, color):
+        """Pick a book move for a position.
+
+        Args:
+            board (Board): The position.
+            color (tuple): The side to move.
+
+        Returns:
+            tuple: The move, or None if the position is not in the book.
+        """
+        found = self.probe(board, color)
+        if not found:
+            return None
+        if self.rng is None:
+            return found[0][0]
+        return self.rng.choices([move for move, _, _ in found], [games for _, games, _ in found])[0]
+
+
+def main(argv=None):
+    """Build an opening book by self-play or from PDN files, from the command line.
+
+    Args:
+        argv (list, optional): The arguments; defaults to sys.argv.
+    """
+    from checkers.tournament import parse_engine
+    from checkers.records import read_pdn
+    parser = argparse.ArgumentParser(description="Build an opening book from self-play games or PDN files.")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--pdn', action='append', help="read games from this PDN file instead of playing them; "
+                                                      "repeat for several")
+    parser.add_argument('--engine', type=parse_engine, default={}, help="e.g. time_limit=0.05,max_depth=6")
+    parser.add_argument('--plies', type=int, default=16, help="plies of each game to record (default: 16)")
+    parser.add_argument('--random-plies', type=int, default=4, help="random plies opening each game (default: 4)")
+    parser.add_argument('--min-games', type=int, default=2, help="leave out rarer moves (default: 2)")
+    parser.add_argument('--workers', type=int, help="processes to use (default: one per core)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='book.bin')
+    args = parser.parse_args(argv)
+
+    builder = BookBuilder(args.plies)
+    if args.pdn:
+        for path in args.pdn:
+            with open(path) as f:
+                for game in read_pdn(f):
+                    if not game.fen:
+                        builder.add_game(game.moves, game.winner())
+        print(f"read {builder.games} games, {len(builder.positions)} positions")
+    else:
+        for result in builder.self_play(args.games, args.engine, args.workers, args.seed,
+                                        opening_plies=args.random_plies, backend='bitboard'):
+            print(f"game {result['game'] + 1:>4}: {result['plies']:>3} plies, {len(builder.positions)} positions",
+                  flush=True)
+    print(f"wrote {builder.write(args.output, args.min_games)} moves to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
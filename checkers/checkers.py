@@ -1,22 +1,160 @@
-import pygame
 from checkers.game import Game
 from checkers.board import Board
+from checkers.engine import Engine
+from checkers.background import BackgroundSearch
+from checkers.book import OpeningBook
+from checkers.protocol import EngineClient
 
 
 class Checkers(Game):
-    def __init__(self, window):
+    def __init__(self, window, board_class=Board, computer=None, engine=None, ponder=False, book=None):
         """Initialize a new Checkers game.
 
         Args:
             window (Surface): The Pygame surface on which to draw the game.
+            board_class (type, optional): The board engine to play on, Board or
+                BitBoard. Defaults to Board.
+            computer (tuple, optional): The color the computer plays, or None for
+                two human players. Defaults to None.
+            engine (Engine or EngineClient, optional): The computer's engine, or a client
+                of one running in its own process. Defaults to a new Engine.
+            ponder (bool, optional): Let the computer think on its opponent's time.
+                Defaults to False.
+            book (OpeningBook or str, optional): An opening book, or its file, for the
+                computer to play from. Defaults to the engine's own book, if any.
         """
-        super().__init__(window)
+        super().__init__(window, board_class)
         self.selected = None
+        self.computer = computer
+        self.ponder = ponder
+        # The computer searches on a worker thread, so the window never stops responding;
+        # a game without one skips the engine and its table altogether. An engine in its
+        # own process already searches in the background, so it is driven directly
+        if computer is None:
+            self.thinker = None
+        elif isinstance(engine, EngineClient):
+            self.thinker = engine
+        else:
+            self.thinker = BackgroundSearch(engine or Engine())
+        self.book = OpeningBook(book) if isinstance(book, str) else book or getattr(engine, 'book', None)
+        self.shown_progress = None
 
     def reset(self):
         """Reset the game state. This is called at the start of a new game.
         """
+        # Throw away whatever the computer was thinking about
+        self.stop_thinking()
         self.initialize()
+        # Repaint the whole window on the next frame
+        if self.renderer is not None:
+            self.renderer.invalidate()
+
+    def close(self):
+        """Stop the computer's search before the window closes.
+        """
+        self.stop_thinking()
+
+    def stop_thinking(self):
+        """Cancel the computer's search, if any, and take its progress off the title bar.
+        """
+        if self.thinker is not None:
+            self.thinker.cancel()
+        if self.shown_progress is not None:
+            self.shown_progress = None
+            self.set_caption('Checkers')
+
+    def busy(self):
+        """Check whether the computer is thinking about its move.
+
+        Returns:
+            bool: True while the computer's search runs, so the result is picked up promptly.
+        """
+        return self.thinker is not None and self.turn == self.computer and not self.over()
+
+    def update(self):
+        """Let the computer play if it is its turn, then draw the game.
+        """
+        if self.thinker is not None and not self.over():
+            self.play_computer()
+        super().update()
+
+    def play_computer(self):
+        """Start, follow or finish the computer's search, without ever waiting for it.
+        """
+        if self.turn != self.computer:
+            # Think on the opponent's time; their move cancels it
+            if self.ponder and self.thinker.idle():
+                self.thinker.ponder(self.board, self.turn)
+            return
+        if self.thinker.pondering or self.thinker.idle():
+            # A book move takes microseconds, so it is played without starting a search
+            move = self.book.choose(self.board, self.turn) if self.book is not None else None
+            if move is not None:
+                self.stop_thinking()
+                self.computer_move(move)
+                return
+            self.stop_thinking()
+            self.thinker.start(self.board, self.turn)
+        elif self.thinker.done():
+            result = self.thinker.result()
+            self.set_caption('Checkers')
+            self.shown_progress = None
+            if result is not None:
+                self.computer_move(result.move)
+        elif self.thinker.progress is not None and self.thinker.progress is not self.shown_progress:
+            # Show the search's progress in the title bar
+            self.shown_progress = progress = self.thinker.progress
+            start, end = progress.move[0], progress.move[1]
+            self.set_caption(f'Checkers - thinking: depth {progress.depth}, best {start} -> {end}')
+
+    def undo(self):
+        """Take back the last move, and the computer's reply to it.
+
+        Returns:
+            bool: False if there was no move to take back.
+        """
+        self.stop_thinking()
+        if not super().undo():
+            return False
+        # Against the computer, go back to the player's own turn
+        if self.turn == self.computer:
+            super().undo()
+        return True
+
+    def redo(self):
+        """Play the last move taken back again, and the computer's reply to it.
+
+        Returns:
+            bool: False if there was no move to play again.
+        """
+        self.stop_thinking()
+        if not super().redo():
+            return False
+        if self.turn == self.computer:
+            super().redo()
+        return True
+
+    def set_caption(self, text):
+        """Show a line of text in the window's title bar, if there is a window.
+
+        Args:
+            text (str): The title.
+        """
+        if self.window is not None:
+            import pygame
+            pygame.display.set_caption(text)
+
+    def computer_move(self, move):
+        """Play the computer's move the same way a player's move is played.
+
+        Args:
+            move (tuple): The ``(start, end, captured)`` move to play.
+        """
+        start, end, captured = move
+        self.selected = self.board.find_piece(*start)
+        self.valid_moves = {end: [self.board.find_piece(*square) for square in captured]}
+        self.choice_action(*end)
+        self.selected = None
 
     def choose(self, r, c):
         """Select the piece at the given position.
@@ -28,6 +166,9 @@ class Checkers(Game):
         Returns:
             bool: True if the selection was successful, False otherwise.
         """
+        # The computer's pieces are not the player's to move
+        if self.turn == self.computer:
+            return
         if self.selected:
         # If a piece is already selected, try to make a move with it
             result = self.checkers_move(r, c)
@@ -88,16 +229,26 @@ class Checkers(Game):
             r (int): The row to move the piece to.
             c (int): The column to move the piece to.
         """
+        # Keep the move in the timeline, before the piece leaves its square
+        skipped = self.valid_moves[(r, c)]
+        move = ((self.selected.row, self.selected.col), (r, c), tuple((piece.row, piece.col) for piece in skipped))
+        irreversible = self.state.irreversible(move)
+        self.timeline.record(self.board, move, irreversible)
         # Move the selected piece to the specified position
-        self.board.move(self.selected, r, c, self.window)
+        self.board.move(self.selected, r, c)
+
+        # Let the piece shout its trash talk, in the console and on the board
+        if self.renderer is not None:
+            print(self.selected.trash_talk)
+            self.renderer.draw_trash_talk(self.selected)
 
         # If there are any pieces to be skipped, remove them from the board
-        skipped = self.valid_moves[(r, c)]
         if skipped:
             self.board.remove_piece(skipped)
 
         # Switch the turn to the other player
         self.switch_turn()
+        self.state.record(irreversible)
 
 
 
@@ -1,6 +1,3 @@
-import pygame
-
-
 class Constants:
     def __init__(self):
         """
@@ -13,4 +10,3 @@ class Constants:
         self.W, self.H = 600, 600
         self.ROWS, self.COLS = 8, 8
         self.SQUARE = self.W // self.COLS
-        self.PROMOTE = pygame.transform.scale(pygame.image.load('crown_image.png'), (44, 25))
@@ -0,0 +1,469 @@
+import copy
+import time
+from checkers.constants import Constants
+from checkers.book import OpeningBook
+from checkers.tablebase import Tablebase
+from checkers.transposition import TranspositionTable
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget for a move runs out."""
+
+
+class SearchResult:
+    def __init__(self, move, score, depth, pv, nodes, elapsed):
+        """Initialize the outcome of a search.
+
+        Args:
+            move (tuple): The best move found, as ``(start, end, captured)``.
+            score (int): The score of the best move for the side to move.
+            depth (int): The deepest fully completed iteration.
+            pv (list): The principal variation, starting with the best move.
+            nodes (int): The number of positions visited.
+            elapsed (float): The wall-clock time spent searching, in seconds.
+        """
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.pv = pv
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    @property
+    def nps(self):
+        """Get the search speed.
+
+        Returns:
+            float: Nodes searched per second.
+        """
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        """
+        Return a short summary of the search.
+        """
+        return (f"SearchResult(move={self.move}, score={self.score}, depth={self.depth}, "
+                f"nodes={self.nodes}, nps={self.nps:.0f})")
+
+
+class Engine:
+    # Scores are in hundredths of a man; a won position is worth WIN minus the plies to reach it
+    MAN = 100
+    KING = 160
+    ADVANCE = 3
+    WIN = 100000
+    MAX_PLY = 64
+    # A position the tablebase says is won scores this, less the plies left to win it
+    TABLEBASE_WIN = WIN // 2
+
+    def __init__(self, time_limit=0.1, max_depth=MAX_PLY - 1, tt_megabytes=16, tt_policy='depth', table=None,
+                 evaluator=None, tablebase=None, book=None):
+        """Initialize a computer opponent.
+
+        Moves are ``(start, end, captured)`` tuples: the square the piece leaves,
+        the square it lands on and a tuple of the squares it jumps over, each
+        square being a ``(row, col)`` tuple.
+
+        Args:
+            time_limit (float, optional): The wall-clock budget per move, in seconds.
+                Defaults to 0.1.
+            max_depth (int, optional): The deepest iteration to search.
+            tt_megabytes (float, optional): The memory cap of the transposition table.
+                Defaults to 16.
+            tt_policy (str, optional): The table's replacement policy, ``'depth'`` or
+                ``'always'``. Defaults to ``'depth'``.
+            table (TranspositionTable, optional): A table to use instead of creating one,
+                for example to share it between engines.
+            evaluator (BatchEvaluator, optional): Scores the leaves instead of the
+                built-in evaluation, for example with extra features switched on.
+            tablebase (Tablebase or str, optional): Endgame tables, or the folder holding
+                them, to look positions with few pieces up in instead of searching them.
+            book (OpeningBook or str, optional): An opening book, or its file, to play
+                from before searching.
+        """
+        self.c = Constants()
+        self.tt = table if table is not None else TranspositionTable(tt_megabytes, tt_policy)
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.evaluator = evaluator
+        self.tablebase = Tablebase(tablebase) if isinstance(tablebase, str) else tablebase
+        self.book = OpeningBook(book) if isinstance(book, str) else book
+        self.nodes = 0
+        self.deadline = 0.0
+        self.killers = []
+        self.history = {}
+        self.pv_table = []
+        self.pv_length = []
+        self.previous_pv = []
+        # Set from another thread to end the running search early
+        self.stopped = False
+
+    def stop(self):
+        """Ask the running search to finish as soon as possible.
+
+        It returns the result of its last completed iteration, as if its time
+        had run out. When no search is running, the next one stops at once.
+        """
+        self.stopped = True
+
+    def opponent(self, color):
+        """Get the color of the other side.
+
+        Args:
+            color (tuple): A side's color.
+
+        Returns:
+            tuple: The color of its opponent.
+        """
+        return self.c.WHITE if color == self.c.GREY else self.c.GREY
+
+    def find_moves(self, board, color):
+        """List every move a side can make.
+
+        Args:
+            board (Board): The position to look at; any board engine works.
+            color (tuple): The side to move.
+
+        Returns:
+            list: The side's legal moves as ``(start, end, captured)`` tuples.
+        """
+        return board.legal_moves(color)
+
+    def evaluate(self, board, color):
+        """Score a position statically.
+
+        Material counts most; men also earn a little for every row they have
+        advanced towards promotion.
+
+        Args:
+            board (Board): The position to score.
+            color (tuple): The side to score it for.
+
+        Returns:
+            int: The score, positive when ``color`` is ahead.
+        """
+        if self.evaluator is not None:
+            return self.evaluator.evaluate_board(board, color)
+        score = 0
+        for piece in board.get_all_pieces():
+            if piece.king:
+                value = self.KING
+            elif piece.color == self.c.GREY:
+                value = self.MAN + self.ADVANCE * (board.rows - 1 - piece.row)
+            else:
+                value = self.MAN + self.ADVANCE * piece.row
+            score += value if piece.color == color else -value
+        return score
+
+    def probe(self, board, color):
+        """Look a position up in the endgame tables.
+
+        Args:
+            board (Board): The position.
+            color (tuple): The side to move.
+
+        Returns:
+            int: The exact score for the side to move, or None if the position is not
+                in the tables.
+        """
+        if self.tablebase is None or board.grey_left + board.white_left > self.tablebase.max_pieces:
+            return None
+        entry = self.tablebase.probe(board, color)
+        if entry is None:
+            return None
+        result, distance = entry
+        if result == Tablebase.DRAW:
+            return 0
+        score = self.TABLEBASE_WIN - (distance or 0)
+        return score if result == Tablebase.WIN else -score
+
+    def order_moves(self, moves, ply, first=None):
+        """Sort moves so the ones most likely to cause a cutoff come first.
+
+        The order is: the move from the previous iteration, captures (longest
+        first), the two killer moves for this ply, then the rest by their
+        history heuristic score.
+
+        Args:
+            moves (list): The moves to sort.
+            ply (int): The distance from the root.
+            first (tuple, optional): A move to try before all others.
+
+        Returns:
+            list: The moves, best candidates first.
+        """
+        killers = self.killers[ply]
+
+        def priority(move):
+            if move == first:
+                return 3000000
+            if move[2]:
+                return 2000000 + len(move[2])
+            if move == killers[0]:
+                return 1000001
+            if move == killers[1]:
+                return 1000000
+            return self.history.get(move[:2], 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def store_cutoff(self, move, depth, ply):
+        """Remember a quiet move that caused a beta cutoff.
+
+        Args:
+            move (tuple): The move that refuted the opponent's play.
+            depth (int): The remaining depth at which it did so.
+            ply (int): The distance from the root.
+        """
+        if move[2]:
+            return
+        killers = self.killers[ply]
+        if move != killers[0]:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[move[:2]] = self.history.get(move[:2], 0) + depth * depth
+
+    def check_time(self):
+        """Stop the search once the deadline has passed.
+
+        Raises:
+            SearchTimeout: If the time budget is used up or the search was stopped.
+        """
+        if self.stopped or time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+    def quiescence(self, board, color, alpha, beta, ply):
+        """Play out pending captures, so the static score is never taken mid-exchange.
+
+        Captures are compulsory, so when the side to move has one it must be
+        searched; only a quiet position is scored statically.
+
+        Args:
+            board (Board): The position to search.
+            color (tuple): The side to move.
+            alpha (int): The score the side to move is already guaranteed.
+            beta (int): The score the opponent is already guaranteed.
+            ply (int): The distance from the root.
+
+        Returns:
+            int: The score of the position for the side to move.
+        """
+        self.nodes += 1
+        self.check_time()
+        self.pv_length[ply] = ply
+
+        moves = self.find_moves(board, color)
+        if not moves:
+            return -self.WIN + ply
+        known = self.probe(board, color)
+        if known is not None:
+            return known
+        if not moves[0][2] or ply >= self.MAX_PLY - 1:
+            return self.evaluate(board, color)
+
+        best = -self.WIN - 1
+        for move in self.order_moves(moves, ply):
+            token = board.make_move(move)
+            score = -self.quiescence(board, self.opponent(color), -beta, -alpha, ply + 1)
+            board.unmake_move(token)
+            if score >= beta:
+                return score
+            best = max(best, score)
+            alpha = max(alpha, score)
+        return best
+
+    def negamax(self, board, color, depth, alpha, beta, ply):
+        """Search a position with alpha-beta pruning.
+
+        Args:
+            board (Board): The position to search.
+            color (tuple): The side to move.
+            depth (int): The remaining depth in plies.
+            alpha (int): The score the side to move is already guaranteed.
+            beta (int): The score the opponent is already guaranteed.
+            ply (int): The distance from the root.
+
+        Returns:
+            int: The score of the position for the side to move.
+        """
+        if depth <= 0:
+            return self.quiescence(board, color, alpha, beta, ply)
+
+        self.nodes += 1
+        self.check_time()
+        self.pv_length[ply] = ply
+
+        # The endgame tables know the exact result; the root still needs a move, so it searches on
+        if ply > 0:
+            known = self.probe(board, color)
+            if known is not None:
+                return known
+
+        # A deep enough earlier result for this position can answer without searching
+        key = board.zobrist.position_key(board, color)
+        entry = self.tt.probe(key)
+        hint = None
+        if entry is not None:
+            stored_depth, bound, score, hint = entry
+            score = self.score_from_table(score, ply)
+            if stored_depth >= depth and ply > 0:
+                if bound == TranspositionTable.EXACT \
+                        or bound == TranspositionTable.LOWER and score >= beta \
+                        or bound == TranspositionTable.UPPER and score <= alpha:
+                    return score
+
+        moves = self.find_moves(board, color)
+        # A side that cannot move has lost; losing later is better than sooner
+        if not moves:
+            return -self.WIN + ply
+
+        # Try the table's best move first, else the previous iteration's line
+        first = None
+        if hint is not None:
+            first = next((move for move in moves if move[:2] == hint), None)
+        if first is None and ply < len(self.previous_pv):
+            first = self.previous_pv[ply]
+        original_alpha = alpha
+        best = -self.WIN - 1
+        best_move = None
+        for move in self.order_moves(moves, ply, first):
+            token = board.make_move(move)
+            score = -self.negamax(board, self.opponent(color), depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move(token)
+            if score > best:
+                best = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+                # Extend the principal variation with the child's line
+                self.pv_table[ply][ply] = move
+                for i in range(ply + 1, self.pv_length[ply + 1]):
+                    self.pv_table[ply][i] = self.pv_table[ply + 1][i]
+                self.pv_length[ply] = max(self.pv_length[ply + 1], ply + 1)
+            if alpha >= beta:
+                self.store_cutoff(move, depth, ply)
+                break
+
+        if best >= beta:
+            bound = TranspositionTable.LOWER
+        elif best > original_alpha:
+            bound = TranspositionTable.EXACT
+        else:
+            bound = TranspositionTable.UPPER
+        self.tt.store(key, depth, bound, self.score_to_table(best, ply), best_move)
+        return best
+
+    def score_to_table(self, score, ply):
+        """Convert a win or loss score from "plies from the root" to "plies from here".
+
+        A stored position can be reached again at a different ply, so the table
+        keeps the distance to the end of the game from the position itself.
+
+        Args:
+            score (int): The score as returned by the search.
+            ply (int): The distance from the root.
+
+        Returns:
+            int: The score to store.
+        """
+        if score >= self.WIN - self.MAX_PLY:
+            return score + ply
+        if score <= -self.WIN + self.MAX_PLY:
+            return score - ply
+        return score
+
+    def score_from_table(self, score, ply):
+        """Convert a stored score back to "plies from the root".
+
+        Args:
+            score (int): The score read from the table.
+            ply (int): The distance from the root.
+
+        Returns:
+            int: The score as the search uses it.
+        """
+        if score >= self.WIN - self.MAX_PLY:
+            return score - ply
+        if score <= -self.WIN + self.MAX_PLY:
+            return score + ply
+        return score
+
+    def search(self, board, color, time_limit=None, max_depth=None, on_iteration=None):
+        """Find the best move with iterative deepening under a time budget.
+
+        Each iteration searches one ply deeper than the last, trying the
+        previous principal variation first. When the budget runs out the
+        unfinished iteration is thrown away and the last completed one is
+        returned.
+
+        The search makes and unmakes moves on a private copy of the board, so
+        a search cut short by the deadline never leaves the caller's board
+        half-played.
+
+        Args:
+            board (Board): The position to search; it is never modified.
+            color (tuple): The side to move.
+            time_limit (float, optional): Overrides the engine's budget for this move.
+            max_depth (int, optional): Overrides the engine's maximum depth.
+            on_iteration (callable, optional): Called with the SearchResult of every
+                completed iteration, to report progress.
+
+        Returns:
+            SearchResult: The best move with its score, principal variation and
+                node statistics, or None if the side to move has no moves.
+        """
+        started = time.perf_counter()
+        # A book move is played at once, before any of the search's setup
+        if self.book is not None:
+            move = self.book.choose(board, color)
+            if move is not None:
+                self.stopped = False
+                return SearchResult(move, 0, 0, [move], 0, time.perf_counter() - started)
+        self.deadline = started + (self.time_limit if time_limit is None else time_limit)
+        max_depth = min(self.max_depth if max_depth is None else max_depth, self.MAX_PLY - 1)
+        self.nodes = 0
+        self.killers = [[None, None] for _ in range(self.MAX_PLY + 1)]
+        self.history = {}
+        self.pv_table = [[None] * (self.MAX_PLY + 1) for _ in range(self.MAX_PLY + 1)]
+        self.pv_length = [0] * (self.MAX_PLY + 1)
+        self.previous_pv = []
+        self.tt.new_search()
+
+        try:
+            moves = self.find_moves(board, color)
+            if not moves:
+                return None
+            board = copy.deepcopy(board)
+            result = SearchResult(self.order_moves(moves, 0)[0], 0, 0, [], 0, 0.0)
+            # With a single legal move there is nothing to think about
+            if len(moves) == 1:
+                result.pv = [result.move]
+                return result
+            # In a tabled endgame the best move can be looked up instead
+            if self.probe(board, color) is not None:
+                found = self.tablebase.best_move(board, color)
+                if found is not None:
+                    move, outcome, distance = found
+                    score = 0 if outcome == Tablebase.DRAW else self.TABLEBASE_WIN - (distance or 0)
+                    score = -score if outcome == Tablebase.LOSS else score
+                    return SearchResult(move, score, 0, [move], 0, time.perf_counter() - started)
+
+            for depth in range(1, max_depth + 1):
+                try:
+                    score = self.negamax(board, color, depth, -self.WIN - 1, self.WIN + 1, 0)
+                except SearchTimeout:
+                    break
+                pv = self.pv_table[0][:self.pv_length[0]]
+                result = SearchResult(pv[0], score, depth, pv, self.nodes, time.perf_counter() - started)
+                self.previous_pv = pv
+                if on_iteration is not None:
+                    on_iteration(result)
+                # A forced win or loss will not change with more depth
+                if abs(score) >= self.WIN - self.MAX_PLY:
+                    break
+
+            result.nodes = self.nodes
+            result.elapsed = time.perf_counter() - started
+            return result
+        finally:
+            self.stopped = False
@@ -1,20 +1,30 @@
 from checkers.constants import Constants
 from checkers.board import Board
-import pygame
+from checkers.records import GameRecord
+from checkers.state import GameState
+from checkers.timeline import Timeline
 
 
 class Game:
-    def __init__(self, window):
+    def __init__(self, window, board_class=Board):
         """
         Initializes Game
 
-        window (Window): The game window where the game is rendered.
+        window (Window): The game window where the game is rendered, or None to play
+            headless, without pygame, e.g. on a server.
+        board_class (type): The board engine to play on, Board or BitBoard.
         """
         self.c = Constants()
+        self.board_class = board_class
         self.turn = None
         self.valid_moves = None
         self.initialize()
         self.window = window
+        self.renderer = None
+        if window is not None:
+            # Only a game on screen needs pygame, so it is imported here rather than for every game
+            from checkers.render import Renderer
+            self.renderer = Renderer(window)
 
 
     def initialize(self):
@@ -23,23 +33,123 @@ class Game:
         self.turn = self.c.GREY
         self.valid_moves = {}
         self.selected = None
-        self.board = Board()
+        self.board = self.board_class()
+        # Counts, mobility and repetitions, kept up to date move by move; moves are
+        # taken back through the timeline, so the state keeps no undo history
+        self.state = GameState(self.board, self.turn, keep_history=False)
+        # Every move played, with the variations tried after taking moves back
+        self.timeline = Timeline(self.board, self.turn)
+
+    @property
+    def moves(self):
+        """Get the moves that led to the current position.
+
+        The timeline keeps them as they are played, so nothing is replayed.
+
+        Returns:
+            list: The ``(start, end, captured)`` moves, from the start of the game.
+        """
+        return self.timeline.moves()
+
+    def goto(self, ply):
+        """Show the position at another ply of the game.
+
+        The board and the game state are rebuilt from the timeline, and the next
+        move played from there starts a variation unless it repeats the game.
+
+        Args:
+            ply (int): The ply; 0 is the start of the game.
+        """
+        self.timeline.jump(ply)
+        self.board, self.state = self.timeline.restore(keep_history=False)
+        self.turn = self.state.turn
+        self.selected = None
+        self.valid_moves = {}
+        if self.renderer is not None:
+            self.renderer.invalidate()
+
+    def undo(self):
+        """Take back the last move.
+
+        Returns:
+            bool: False if there was no move to take back.
+        """
+        if self.timeline.ply == 0:
+            return False
+        self.goto(self.timeline.ply - 1)
+        return True
+
+    def redo(self):
+        """Play the move that was taken back last again.
+
+        Returns:
+            bool: False if there was no move to play again.
+        """
+        if self.timeline.ply >= self.timeline.length:
+            return False
+        self.goto(self.timeline.ply + 1)
+        return True
 
     def update(self):
         """Update the game state. This should be called every frame.
         """
-        # Draw the game board and all of the pieces on it
-        self.board.draw_board(self.window)
-        # Update the Pygame display with the new game state
-        pygame.display.update()
+        if self.renderer is None:
+            return
+        import pygame
+        # Redraw the squares that changed since the last frame
+        rects = self.renderer.draw_board(self.board)
+        # Update only those parts of the Pygame display, if any
+        if rects:
+            pygame.display.update(rects)
         
 
+    def record(self, result='*', **tags):
+        """Describe the game played so far, so it can be saved.
+
+        Args:
+            result (str, optional): The PDN result token. Defaults to ``'*'``, unfinished.
+            **tags: PDN tags to add, such as Event or Date.
+
+        Returns:
+            GameRecord: The moves played so far.
+        """
+        return GameRecord(self.moves, result, tags, rows=self.board.rows, cols=self.board.cols)
+
+    def busy(self):
+        """Check whether something on screen is changing without any input.
+
+        The main loop only runs at its full frame rate while this is True.
+
+        Returns:
+            bool: True while an animation plays or the computer is thinking.
+        """
+        return False
+
     def winner(self):
             """Determine the winner of the game.
 
+            A player who has no legal move on their turn loses. The game state
+            works this out as each move is played, so asking costs nothing.
+
             Returns:
                 str: The color of the winning player, or None if there is no winner.
             """
-            return self.board.winner()
+            return self.state.winner
+
+    def draw(self):
+        """Determine whether the game is drawn.
+
+        Returns:
+            str: ``'repetition'`` or ``'no progress'``, or None if it is not drawn.
+        """
+        return self.state.draw
+
+    def over(self):
+        """Check whether the game has ended, won or drawn.
+
+        Returns:
+            bool: True once no more moves are to be played.
+        """
+        return self.state.over
 
 
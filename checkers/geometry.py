@@ -0,0 +1,88 @@
+class Geometry:
+    """The diagonal neighbours of every playable square, worked out once per board size.
+
+    For each dark square and each diagonal direction the table holds the
+    neighbouring square (where a piece steps to, or the piece it jumps over)
+    and the square behind it (where a jump lands). Move generation then only
+    has to look squares up instead of checking the edges of the board.
+    """
+
+    # Row and column offsets of the four diagonals; the first two lead towards row 0
+    UP = ((-1, -1), (-1, 1))
+    DOWN = ((1, -1), (1, 1))
+    # One geometry per board size, shared by every board of that size
+    sizes = {}
+
+    def __init__(self, rows, cols):
+        """Build the tables for a board size.
+
+        Args:
+            rows (int): The number of rows on the board.
+            cols (int): The number of columns on the board.
+        """
+        self.rows = rows
+        self.cols = cols
+        # Pieces stand on the squares whose row and column add up to an odd number
+        self.squares = tuple((r, c) for r in range(rows) for c in range((r + 1) % 2, cols, 2))
+        # Each square's place in that order, which is its bit in a packed position
+        self.index = {square: i for i, square in enumerate(self.squares)}
+        # Bytes needed for one bit per square
+        self.mask_bytes = (len(self.squares) + 7) // 8
+        # For every square, (step, land) pairs for the directions that stay on the board;
+        # land is None when a jump in that direction would leave the board
+        self.up = {square: self.steps(square, self.UP) for square in self.squares}
+        self.down = {square: self.steps(square, self.DOWN) for square in self.squares}
+        self.both = {square: self.up[square] + self.down[square] for square in self.squares}
+
+    @classmethod
+    def for_size(cls, rows, cols):
+        """Get the shared geometry for a board size, building it the first time.
+
+        Args:
+            rows (int): The number of rows on the board.
+            cols (int): The number of columns on the board.
+
+        Returns:
+            Geometry: The tables for that size.
+        """
+        if (rows, cols) not in cls.sizes:
+            cls.sizes[(rows, cols)] = cls(rows, cols)
+        return cls.sizes[(rows, cols)]
+
+    def on_board(self, r, c):
+        """Check whether a square lies on the board.
+
+        Args:
+            r (int): The row of the square.
+            c (int): The column of the square.
+
+        Returns:
+            bool: True if the square is on the board.
+        """
+        return 0 <= r < self.rows and 0 <= c < self.cols
+
+    def steps(self, square, offsets):
+        """Work out the neighbour and jump landing of a square in some directions.
+
+        Args:
+            square (tuple): The (row, col) square to start from.
+            offsets (tuple): The (row, col) offsets of the directions to follow.
+
+        Returns:
+            tuple: A ``(step, land)`` pair per direction whose neighbour is on the board.
+        """
+        r, c = square
+        found = []
+        for dr, dc in offsets:
+            if self.on_board(r + dr, c + dc):
+                land = (r + 2 * dr, c + 2 * dc) if self.on_board(r + 2 * dr, c + 2 * dc) else None
+                found.append(((r + dr, c + dc), land))
+        return tuple(found)
+
+    def start_rows(self):
+        """Get how many rows each side fills at the start of a game.
+
+        Returns:
+            int: The number of rows, leaving two empty rows in the middle.
+        """
+        return (self.rows - 2) // 2
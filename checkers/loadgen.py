@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+
+class Client:
+    """One connection to a GameServer, shared by many games.
+
+    A reader task sorts the server's messages: replies to tagged requests
+    settle their futures and everything else goes to its game's queue.
+    """
+
+    def __init__(self, reader, writer):
+        """Initialize a client on an open connection.
+
+        Args:
+            reader (StreamReader): The connection's incoming side.
+            writer (StreamWriter): Its outgoing side.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.waiting = {}
+        self.games = {}
+        self.next_tag = 0
+        self.task = asyncio.get_running_loop().create_task(self.read())
+
+    @classmethod
+    async def connect(cls, host, port):
+        """Open a connection to a server.
+
+        Args:
+            host (str): The server's address.
+            port (int): Its port.
+
+        Returns:
+            Client: The client.
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def read(self):
+        """Hand out the server's messages until the connection closes.
+        """
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            future = self.waiting.pop(message.get('tag'), None)
+            if future is not None:
+                future.set_result(message)
+            elif message.get('game') in self.games:
+                self.games[message['game']].put_nowait(message)
+        for future in self.waiting.values():
+            future.set_exception(ConnectionError("the server closed the connection"))
+
+    async def request(self, **request):
+        """Send a request and wait for its reply.
+
+        Args:
+            **request: The request's fields, op included.
+
+        Returns:
+            dict: The reply.
+        """
+        self.next_tag += 1
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[self.next_tag] = future
+        self.send(dict(request, tag=self.next_tag))
+        return await future
+
+    def send(self, request):
+        """Send a request without waiting for anything.
+
+        Args:
+            request (dict): The request.
+        """
+        self.writer.write(json.dumps(request, separators=(',', ':')).encode() + b'\n')
+
+    async def new_game(self, computer=None):
+        """Start a game.
+
+        Args:
+            computer (str, optional): The color the server plays, if any.
+
+        Returns:
+            tuple: The game's ``state`` message and the queue its later messages arrive on.
+
+        Raises:
+            RuntimeError: If the server refused the game.
+        """
+        state = await self.request(op='new', computer=computer)
+        if state['type'] != 'state':
+            raise RuntimeError(state.get('message'))
+        self.games[state['game']] = queue = asyncio.Queue()
+        return state, queue
+
+    async def close(self):
+        """Close the connection.
+        """
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.task.cancel()
+
+
+async def play_random(client, rng, latencies, computer=None):
+    """Play one game with random legal moves, timing the server's answers.
+
+    Args:
+        client (Client): The connection to play on.
+        rng (random.Random): Picks the moves.
+        latencies (list): Gets the seconds from sending each move to its delta.
+        computer (str, optional): The color the server plays; the client plays
+            both sides when None.
+
+    Returns:
+        int: The number of plies the game lasted.
+    """
+    state, queue = await client.new_game(computer)
+    game, turn, legal, ply = state['game'], state['turn'], state['legal'], 0
+    while legal:
+        if turn != computer:
+            client.send({'op': 'move', 'game': game, 'move': rng.choice(legal)})
+            sent = time.perf_counter()
+        message = await queue.get()
+        if message['type'] == 'error':
+            raise RuntimeError(message['message'])
+        if message['type'] == 'delta':
+            if message['by'] != computer:
+                latencies.append(time.perf_counter() - sent)
+            turn, legal, ply = message['turn'], message['legal'], message['ply']
+    client.send({'op': 'close', 'game': game})
+    del client.games[game]
+    return ply
+
+
+def percentile(values, share):
+    """Get a percentile of some numbers.
+
+    Args:
+        values (list): The numbers, sorted.
+        share (float): The percentile as a fraction, e.g. 0.99.
+
+    Returns:
+        float: The value, or 0 when there are none.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+async def run(host, port, games=1000, concurrency=1000, connections=10, computer=None, seed=0):
+    """Put a server under load: many games at once, spread over a few connections.
+
+    Args:
+        host (str): The server's address.
+        port (int): Its port.
+        games (int, optional): How many games to play in all. Defaults to 1000.
+        concurrency (int, optional): How many games are open at once. Defaults to 1000.
+        connections (int, optional): How many connections to share them over. Defaults to 10.
+        computer (str, optional): The color the server plays in every game, or None.
+        seed (int, optional): Seeds the random moves. Defaults to 0.
+
+    Returns:
+        dict: The ``games`` and ``moves`` played, the ``seconds`` taken, the ``moves_per_second``
+            and the 50th, 95th and 99th percentile move latencies in milliseconds.
+    """
+    clients = [await Client.connect(host, port) for _ in range(connections)]
+    rng = random.Random(seed)
+    latencies = []
+    plies = []
+    started = time.perf_counter()
+    remaining = iter(range(games))
+
+    async def worker(client):
+        # Each worker keeps one game going at a time, until none are left to play
+        for _ in remaining:
+            plies.append(await play_random(client, rng, latencies, computer))
+
+    await asyncio.gather(*(worker(clients[i % connections]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    for client in clients:
+        await client.close()
+    latencies.sort()
+    return {'games': len(plies), 'moves': sum(plies), 'seconds': elapsed,
+            'moves_per_second': len(latencies) / elapsed if elapsed else 0.0,
+            'p50_ms': 1000 * percentile(latencies, 0.5), 'p95_ms': 1000 * percentile(latencies, 0.95),
+            'p99_ms': 1000 * percentile(latencies, 0.99)}
+
+
+def main(argv=None):
+    """Load a running game server from the command line.
+
+    Args:
+        argv (list, optional): The arguments; defaults to sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Play many random games against a checkers server at once.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=1000, help="games open at once (default: 1000)")
+    parser.add_argument('--connections', type=int, default=10)
+    parser.add_argument('--computer', choices=['grey', 'white'], help="let the server play this side")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args.host, args.port, args.games, args.concurrency, args.connections, args.computer,
+                             args.seed))
+    print(f"{report['games']} games, {report['moves']} plies in {report['seconds']:.1f} s: "
+          f"{report['moves_per_second']:.0f} moves/s, latency p50 {report['p50_ms']:.1f} ms, "
+          f"p95 {report['p95_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,621 @@
+import copy
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from checkers.constants import Constants
+from checkers.engine import Engine, SearchResult
+
+
+class Node:
+    """One position in the search tree.
+
+    Nodes hold no board: the position is replayed from the root along the
+    moves on the path, which keeps a node down to a few slots.
+    """
+
+    __slots__ = ('move', 'parent', 'children', 'visits', 'wins', 'prior')
+
+    def __init__(self, move=None, parent=None, prior=1.0):
+        """Initialize an unexpanded node.
+
+        Args:
+            move (tuple, optional): The move that leads here from the parent.
+            parent (Node, optional): The node one ply closer to the root.
+            prior (float, optional): The policy's share for the move, used by PUCT.
+        """
+        self.move = move
+        self.parent = parent
+        # None until the node is expanded; an expanded node without children is a lost position
+        self.children = None
+        self.visits = 0
+        # Rewards collected for the side that played ``move``, from 0 (loss) to 1 (win) per visit
+        self.wins = 0.0
+        self.prior = prior
+
+    def size(self):
+        """Count the nodes of the subtree rooted here.
+
+        Returns:
+            int: The number of nodes, this one included.
+        """
+        count, stack = 0, [self]
+        while stack:
+            node = stack.pop()
+            count += 1
+            if node.children:
+                stack.extend(node.children)
+        return count
+
+
+# Per-process players for the worker pool, kept between tasks so their trees carry over
+_workers = {}
+
+
+def _worker_player(config):
+    """Get this worker process's own single-process player for a configuration.
+
+    Args:
+        config (dict): Keyword arguments for MCTS.
+
+    Returns:
+        MCTS: The player, created on first use.
+    """
+    key = tuple(sorted(config.items()))
+    if key not in _workers:
+        settings = dict(config, workers=1, seed=None if config.get('seed') is None else config['seed'] + os.getpid())
+        _workers[key] = MCTS(**settings)
+    return _workers[key]
+
+
+def root_worker(config, board_class, packed, rows, cols, color, deadline, max_nodes):
+    """Grow one worker's own tree for a position until a wall-clock deadline.
+
+    Args:
+        config (dict): Keyword arguments for MCTS.
+        board_class (type): The board engine to play on.
+        packed (bytes): The position, as made by ``Board.pack()``.
+        rows (int): The number of rows.
+        cols (int): The number of columns.
+        color (tuple): The side to move.
+        deadline (float): When to stop, as a ``time.time()`` value shared by all workers.
+        max_nodes (int): The tree size at which to stop early.
+
+    Returns:
+        tuple: The worker's process id, ``{move: (visits, wins)}`` for the root's
+            children, the number of playouts run and the tree size.
+    """
+    player = _worker_player(config)
+    board = board_class.unpack(packed, rows, cols)
+    root = player.prepare(board, color)
+    playouts = player.grow(board, color, deadline - time.time(), max_nodes)
+    return os.getpid(), {child.move: (child.visits, child.wins) for child in root.children or ()}, playouts, player.size
+
+
+def rollout_worker(config, board_class, packed, rows, cols, color):
+    """Run one leaf's rollouts in a worker process.
+
+    Args:
+        config (dict): Keyword arguments for MCTS.
+        board_class (type): The board engine to play on.
+        packed (bytes): The leaf position, as made by ``Board.pack()``.
+        rows (int): The number of rows.
+        cols (int): The number of columns.
+        color (tuple): The side to move at the leaf.
+
+    Returns:
+        float: The reward for the side to move, from 0 to 1.
+    """
+    return _worker_player(config).rollout(board_class.unpack(packed, rows, cols), color)
+
+
+class MCTS:
+    """A Monte Carlo tree search player.
+
+    Every iteration walks down the tree by the selection rule, expands the
+    leaf it reaches and backs up the reward of a rollout from it. Two rules
+    are available: ``'uct'`` (UCB1 with uniform priors) and ``'puct'``, which
+    weights the exploration term by a softmax over the static evaluation of
+    each child.
+
+    The search has the same interface as Engine.search, so the two can be
+    swapped in games, tournaments and background searches.
+    """
+
+    # The score, in the engine's units, that is worth a 73% expected reward (1 / (1 + e^-1))
+    SCALE = 200
+
+    def __init__(self, time_limit=0.1, max_nodes=200000, policy='uct', exploration=None, rollout_plies=40,
+                 leaf_rollouts=1, workers=1, parallel='root', reuse=True, seed=None):
+        """Initialize a computer opponent.
+
+        Args:
+            time_limit (float, optional): The wall-clock budget per move, in seconds.
+                Defaults to 0.1.
+            max_nodes (int, optional): The tree size at which the search stops, reused
+                nodes included. Defaults to 200000.
+            policy (str, optional): The selection rule, ``'uct'`` or ``'puct'``.
+            exploration (float, optional): The weight of the exploration term. Defaults
+                to 1.4 for UCT and 1.0 for PUCT.
+            rollout_plies (int, optional): How many random plies a rollout plays before
+                the position is scored statically instead. Defaults to 40.
+            leaf_rollouts (int, optional): How many rollouts to run per leaf. Above 1,
+                they are played to the end of the game all at once by a BatchSimulator.
+            workers (int, optional): The number of processes to search with; 0 means
+                one per core. Defaults to 1, searching in this process only.
+            parallel (str, optional): With several workers, ``'root'`` gives each its
+                own tree and adds up the root statistics; ``'leaf'`` keeps one tree and
+                sends a batch of leaves to the workers for their rollouts.
+            reuse (bool, optional): Keep the subtree of the position reached between
+                searches. Defaults to True.
+            seed (int, optional): Seeds the rollouts, so a single-process search can be
+                repeated.
+
+        Raises:
+            ValueError: If the policy or the kind of parallelism is unknown.
+        """
+        if policy not in ('uct', 'puct'):
+            raise ValueError(f"unknown policy {policy!r}")
+        if parallel not in ('root', 'leaf'):
+            raise ValueError(f"unknown kind of parallelism {parallel!r}")
+        self.c = Constants()
+        self.time_limit = time_limit
+        self.max_nodes = max_nodes
+        self.policy = policy
+        self.exploration = exploration if exploration is not None else 1.4 if policy == 'uct' else 1.0
+        self.rollout_plies = rollout_plies
+        self.leaf_rollouts = leaf_rollouts
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel = parallel
+        self.reuse = reuse
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # The static evaluation, shared with the alpha-beta engine; it never searches,
+        # so it gets a table of a few slots rather than the engine's default 16 MB
+        self.judge = Engine(tt_megabytes=0.001)
+        self.simulator = None
+        self.pool = None
+        # The tree, and a copy of the root position to find the next root in
+        self.root = None
+        self.root_board = None
+        self.root_color = None
+        self.size = 0
+        # Playouts run by the current search
+        self.playouts = 0
+        self.stopped = False
+
+    def config(self):
+        """Get the settings that worker processes need to build the same player.
+
+        Returns:
+            dict: Keyword arguments for MCTS.
+        """
+        return {'policy': self.policy, 'exploration': self.exploration, 'rollout_plies': self.rollout_plies,
+                'leaf_rollouts': self.leaf_rollouts, 'reuse': self.reuse, 'seed': self.seed,
+                'max_nodes': self.max_nodes}
+
+    def stop(self):
+        """Ask the running search to finish as soon as possible.
+        """
+        self.stopped = True
+
+    def close(self):
+        """Shut down the worker processes, if any were started.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def opponent(self, color):
+        """Get the color of the other side.
+
+        Args:
+            color (tuple): A side's color.
+
+        Returns:
+            tuple: The color of its opponent.
+        """
+        return self.c.WHITE if color == self.c.GREY else self.c.GREY
+
+    def evaluate(self, board, color):
+        """Score a position statically, the same way as Engine.evaluate.
+
+        Args:
+            board (Board): The position to score.
+            color (tuple): The side to score it for.
+
+        Returns:
+            int: The score, positive when ``color`` is ahead.
+        """
+        return self.judge.evaluate(board, color)
+
+    def squash(self, score):
+        """Turn a static score into an expected reward.
+
+        Args:
+            score (int): The score for a side, in the engine's units.
+
+        Returns:
+            float: The expected reward for that side, from 0 to 1.
+        """
+        return 1 / (1 + math.exp(-max(-50.0, min(50.0, score / self.SCALE))))
+
+    def prepare(self, board, color):
+        """Make the tree's root the given position, reusing the old tree where possible.
+
+        The old root, its children and its grandchildren are checked, which
+        covers searching the same position again (after pondering) and the
+        position after our move and the opponent's reply.
+
+        Args:
+            board (Board): The position to search.
+            color (tuple): The side to move.
+
+        Returns:
+            Node: The root.
+        """
+        key = board.zobrist.position_key(board, color)
+        found = None
+        if self.reuse and self.root is not None and self.root_board is not None:
+            old = self.root_board
+            if old.zobrist.position_key(old, self.root_color) == key:
+                found = self.root
+            for child in self.root.children or ():
+                if found is not None:
+                    break
+                token = old.make_move(child.move)
+                for grandchild in child.children or ():
+                    reply = old.make_move(grandchild.move)
+                    same = old.zobrist.position_key(old, self.root_color) == key
+                    old.unmake_move(reply)
+                    if same:
+                        found = grandchild
+                        break
+                if found is None and old.zobrist.position_key(old, self.opponent(self.root_color)) == key:
+                    found = child
+                old.unmake_move(token)
+        if found is not None:
+            # Cut the new root loose so the rest of the old tree can be freed
+            found.parent = None
+            found.move = None
+            self.root = found
+            self.size = found.size()
+        else:
+            self.root = Node()
+            self.size = 1
+        self.root_board = copy.deepcopy(board)
+        self.root_color = color
+        return self.root
+
+    def expand(self, node, board, color):
+        """Give a leaf its children.
+
+        Args:
+            node (Node): The leaf, not yet expanded.
+            board (Board): Its position.
+            color (tuple): The side to move there.
+        """
+        moves = board.legal_moves(color)
+        if self.policy == 'puct' and len(moves) > 1:
+            # A softmax over the evaluation of the positions the moves lead to
+            scores = []
+            for move in moves:
+                token = board.make_move(move)
+                scores.append(self.evaluate(board, color) / self.SCALE)
+                board.unmake_move(token)
+            top = max(scores)
+            weights = [math.exp(score - top) for score in scores]
+            total = sum(weights)
+            priors = [weight / total for weight in weights]
+        else:
+            priors = [1 / len(moves)] * len(moves) if moves else []
+        node.children = [Node(move, node, prior) for move, prior in zip(moves, priors)]
+        # Visit the children in a random order when their scores tie
+        self.rng.shuffle(node.children)
+        self.size += len(moves)
+
+    def select(self, node):
+        """Choose the child to descend to.
+
+        Args:
+            node (Node): An expanded node with children.
+
+        Returns:
+            Node: The child with the best selection score for the side to move.
+        """
+        log_visits = math.log(node.visits + 1)
+        root_visits = math.sqrt(node.visits + 1)
+        best, best_score = None, -math.inf
+        for child in node.children:
+            if self.policy == 'uct':
+                if not child.visits:
+                    return child
+                score = child.wins / child.visits + self.exploration * math.sqrt(log_visits / child.visits)
+            else:
+                value = child.wins / child.visits if child.visits else 0.5
+                score = value + self.exploration * child.prior * root_visits / (1 + child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def descend(self, board, color):
+        """Walk from the root to a leaf, playing the moves on the board.
+
+        Every node on the way counts the visit at once, with no reward yet, so
+        when several leaves are chosen before any is scored the later walks are
+        steered away from the earlier ones (a "virtual loss").
+
+        Args:
+            board (Board): The root position; the moves are played on it.
+            color (tuple): The side to move at the root.
+
+        Returns:
+            tuple: The leaf, the side to move there and the undo tokens of the moves.
+        """
+        node = self.root
+        node.visits += 1
+        tokens = []
+        while node.children:
+            node = self.select(node)
+            node.visits += 1
+            tokens.append(board.make_move(node.move))
+            color = self.opponent(color)
+        if node.children is None and self.size < self.max_nodes:
+            self.expand(node, board, color)
+        return node, color, tokens
+
+    def rollout(self, board, color):
+        """Estimate a position by playing random moves from it.
+
+        Args:
+            board (Board): The position; it is left as it was.
+            color (tuple): The side to move.
+
+        Returns:
+            float: The reward for the side to move, from 0 to 1.
+        """
+        if self.leaf_rollouts > 1:
+            if self.simulator is None:
+                from checkers.simulator import BatchSimulator
+                self.simulator = BatchSimulator(board.rows, board.cols, self.rng.getrandbits(32))
+            result = self.simulator.playouts(board, color, self.leaf_rollouts)
+            return result['grey_score'] if color == self.c.GREY else 1 - result['grey_score']
+
+        tokens = []
+        turn = color
+        reward = None
+        for _ in range(self.rollout_plies):
+            moves = board.legal_moves(turn)
+            if not moves:
+                reward = 0.0 if turn == color else 1.0
+                break
+            tokens.append(board.make_move(self.rng.choice(moves)))
+            turn = self.opponent(turn)
+        if reward is None:
+            reward = self.squash(self.evaluate(board, color))
+        for token in reversed(tokens):
+            board.unmake_move(token)
+        return reward
+
+    def leaf_value(self, node, board, color):
+        """Get the reward of a leaf, running a rollout unless the game is over there.
+
+        Args:
+            node (Node): The leaf.
+            board (Board): Its position.
+            color (tuple): The side to move there.
+
+        Returns:
+            float: The reward for the side to move, from 0 to 1.
+        """
+        if node.children == []:
+            return 0.0
+        return self.rollout(board, color)
+
+    @staticmethod
+    def backup(node, reward):
+        """Add a leaf's reward to every node on the path back to the root.
+
+        The visits were already counted on the way down.
+
+        Args:
+            node (Node): The leaf.
+            reward (float): The reward for the side to move at the leaf.
+        """
+        # The move into the leaf was made by the other side
+        reward = 1 - reward
+        while node is not None:
+            node.wins += reward
+            reward = 1 - reward
+            node = node.parent
+
+    def grow(self, board, color, time_limit, max_nodes=None, on_progress=None):
+        """Run iterations in this process until the time or the node budget runs out.
+
+        Args:
+            board (Board): The root position; it is left as it was.
+            color (tuple): The side to move.
+            time_limit (float): The budget, in seconds.
+            max_nodes (int, optional): Overrides the tree size at which to stop.
+            on_progress (callable, optional): Called every quarter of a second, to report progress.
+
+        Returns:
+            int: The number of playouts run.
+        """
+        deadline = time.perf_counter() + time_limit
+        max_nodes = self.max_nodes if max_nodes is None else max_nodes
+        report = time.perf_counter() + 0.25
+        leaf_batch = self.workers if self.parallel == 'leaf' and self.workers > 1 else 0
+        before = self.playouts
+        while not self.stopped and self.size < max_nodes:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if on_progress is not None and now >= report:
+                on_progress()
+                report = now + 0.25
+            if leaf_batch:
+                self.grow_leaves(board, color, leaf_batch)
+                continue
+            node, turn, tokens = self.descend(board, color)
+            self.backup(node, self.leaf_value(node, board, turn))
+            for token in reversed(tokens):
+                board.unmake_move(token)
+            self.playouts += 1
+        return self.playouts - before
+
+    def grow_leaves(self, board, color, count):
+        """Choose several leaves and run their rollouts on the worker processes.
+
+        Args:
+            board (Board): The root position; it is left as it was.
+            color (tuple): The side to move.
+            count (int): How many leaves to choose.
+
+        """
+        pool = self.start_pool()
+        config = self.config()
+        pending = []
+        for _ in range(count):
+            node, turn, tokens = self.descend(board, color)
+            if node.children == []:
+                self.backup(node, 0.0)
+            else:
+                pending.append((node, pool.submit(rollout_worker, config, type(board), board.pack(),
+                                                     board.rows, board.cols, turn)))
+            for token in reversed(tokens):
+                board.unmake_move(token)
+        for node, future in pending:
+            self.backup(node, future.result())
+        self.playouts += count
+
+    def grow_roots(self, board, color, time_limit, on_progress=None):
+        """Let every worker grow its own tree and add up their root statistics.
+
+        The workers run in rounds of at most a quarter of a second, so the
+        search can be stopped and report progress. Each worker keeps its tree
+        from round to round, so only its latest statistics count. Once every
+        worker's tree has reached max_nodes, more rounds would add nothing,
+        and the search ends early.
+
+        Args:
+            board (Board): The root position.
+            color (tuple): The side to move.
+            time_limit (float): The budget, in seconds.
+            on_progress (callable, optional): Called after every round.
+        """
+        pool = self.start_pool()
+        config = self.config()
+        end = time.time() + time_limit
+        latest = {}
+        while not self.stopped:
+            deadline = min(end, time.time() + 0.25)
+            futures = [pool.submit(root_worker, config, type(board), board.pack(), board.rows, board.cols, color,
+                                   deadline, self.max_nodes)
+                       for _ in range(self.workers)]
+            full = True
+            for future in futures:
+                pid, stats, count, size = future.result()
+                latest[pid] = stats
+                self.playouts += count
+                full = full and size >= self.max_nodes
+            # Merge the workers' statistics into this process's root
+            totals = {}
+            for stats in latest.values():
+                for move, (visits, wins) in stats.items():
+                    before = totals.get(move, (0, 0.0))
+                    totals[move] = (before[0] + visits, before[1] + wins)
+            self.root.children = [Node(move, self.root) for move in totals]
+            for child in self.root.children:
+                child.visits, child.wins = totals[child.move]
+            self.root.visits = sum(child.visits for child in self.root.children)
+            if on_progress is not None:
+                on_progress()
+            if time.time() >= end or not self.root.children or full:
+                break
+
+    def start_pool(self):
+        """Start the worker processes, the first time they are needed.
+
+        Returns:
+            ProcessPoolExecutor: The pool.
+        """
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self.pool
+
+    def principal_variation(self):
+        """Follow the most visited children from the root.
+
+        Returns:
+            list: The moves of the line the search expects.
+        """
+        pv = []
+        node = self.root
+        while node.children:
+            node = max(node.children, key=lambda child: child.visits)
+            if not node.visits:
+                break
+            pv.append(node.move)
+        return pv
+
+    def result(self, started):
+        """Describe the current state of the search.
+
+        Args:
+            started (float): When the search started, as a ``time.perf_counter()`` value.
+
+        Returns:
+            SearchResult: The most visited move, its expected reward as a score in
+                the engine's units, and the line the search expects.
+        """
+        pv = self.principal_variation()
+        best = max(self.root.children, key=lambda child: child.visits)
+        value = best.wins / best.visits if best.visits else 0.5
+        value = min(max(value, 1e-6), 1 - 1e-6)
+        score = round(self.SCALE * math.log(value / (1 - value)))
+        return SearchResult(best.move, score, len(pv), pv, self.playouts, time.perf_counter() - started)
+
+    def search(self, board, color, time_limit=None, max_depth=None, on_iteration=None):
+        """Find the most promising move within the budget.
+
+        Args:
+            board (Board): The position to search; it is never modified.
+            color (tuple): The side to move.
+            time_limit (float, optional): Overrides the player's budget for this move.
+            max_depth (int, optional): Ignored; there for compatibility with Engine.search.
+            on_iteration (callable, optional): Called with a SearchResult every quarter
+                of a second, to report progress.
+
+        Returns:
+            SearchResult: The most visited move, with the number of playouts as its
+                node count, or None if the side to move has no moves.
+        """
+        started = time.perf_counter()
+        time_limit = self.time_limit if time_limit is None else time_limit
+        try:
+            moves = board.legal_moves(color)
+            if not moves:
+                return None
+            if len(moves) == 1:
+                return SearchResult(moves[0], 0, 0, [moves[0]], 0, 0.0)
+
+            self.prepare(board, color)
+            self.playouts = 0
+            work = copy.deepcopy(board)
+
+            def progress():
+                if on_iteration is not None and self.root.children:
+                    on_iteration(self.result(started))
+
+            if self.workers > 1 and self.parallel == 'root':
+                self.grow_roots(work, color, time_limit, progress)
+            else:
+                self.grow(work, color, time_limit, on_progress=progress)
+            if not self.root.children:
+                # The budget ran out before the root could even be expanded
+                self.expand(self.root, work, color)
+            return self.result(started)
+        finally:
+            self.stopped = False
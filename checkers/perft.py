@@ -0,0 +1,218 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from checkers.constants import Constants
+from checkers.angry_piece import AngryPiece
+from checkers.board import Board
+from checkers.bitboard import BitBoard
+
+
+class Perft:
+    """Counts the leaf nodes of the game tree to check and time move generation.
+
+    Positions are written as diagrams: the rows from top (row 0) to bottom
+    joined by ``/``, with ``.`` for an empty square, ``g``/``w`` for grey and
+    white men and ``G``/``W`` for kings. Only the dark squares may hold a piece.
+    """
+
+    # Board engines that can be benchmarked, by command-line name
+    BACKENDS = {'board': Board, 'bitboard': BitBoard}
+    # Stored positions: diagram, side to move and the known leaf counts per depth.
+    # The start position's counts are the published ones for 8x8 checkers; the
+    # others were produced by both board engines and agree between them.
+    POSITIONS = {
+        'start': (
+            '.w.w.w.w/w.w.w.w./.w.w.w.w/......../......../g.g.g.g./.g.g.g.g/g.g.g.g.', 'g',
+            {1: 7, 2: 49, 3: 302, 4: 1469, 5: 7361, 6: 36768, 7: 179740, 8: 845931,
+             9: 3963680, 10: 18391564}),
+        'midgame': (
+            '.w.w.w.w/w......./.w...w../......../.....w.g/g.g...g./.g.g...g/....g.g.', 'g',
+            {1: 1, 2: 2, 3: 16, 4: 114, 5: 847, 6: 5092, 7: 34388, 8: 193375, 9: 1213313,
+             10: 6411031}),
+        'kings': (
+            '......../......../.g...G.g/......g./......../......../.w.g..../W.......', 'g',
+            {1: 8, 2: 8, 3: 68, 4: 124, 5: 985, 6: 3146, 7: 23158, 8: 101160, 9: 744780,
+             10: 3549225}),
+        'promotion': (
+            '......../g.w...../.....w../..w...../......../..w...W./.g....../g.......', 'g',
+            {1: 1, 2: 6, 3: 24, 4: 128, 5: 652, 6: 2896, 7: 14546, 8: 72644, 9: 416549,
+             10: 1778147}),
+    }
+
+    def __init__(self, board_class=Board):
+        """Initialize a perft runner.
+
+        Args:
+            board_class (type, optional): The board engine to count with. Defaults to Board.
+        """
+        self.c = Constants()
+        self.board_class = board_class
+
+    def setup(self, diagram, side):
+        """Build a board from a position diagram.
+
+        Args:
+            diagram (str): The position, as described in the class docstring.
+            side (str): ``'g'`` if grey is to move, ``'w'`` if white is.
+
+        Returns:
+            tuple: The board and the color of the side to move.
+
+        Raises:
+            ValueError: If the diagram does not fit the board or puts a piece on a light square.
+        """
+        board = self.board_class()
+        rows = diagram.split('/')
+        if len(rows) != board.rows or any(len(row) != board.cols for row in rows):
+            raise ValueError(f"the diagram does not describe a {board.rows}x{board.cols} board")
+        board.clear()
+        for r, row in enumerate(rows):
+            for c, square in enumerate(row):
+                if square == '.':
+                    continue
+                if square.lower() not in 'gw' or (r + c) % 2 == 0:
+                    raise ValueError(f"bad square {square!r} at row {r}, column {c}")
+                piece = AngryPiece(r, c, self.c.GREY if square.lower() == 'g' else self.c.WHITE)
+                piece.king = square.isupper()
+                board.add_piece(piece)
+        return board, self.c.GREY if side == 'g' else self.c.WHITE
+
+    def count(self, board, color, depth):
+        """Count the positions reached after exactly ``depth`` plies.
+
+        At the last ply the moves are only counted, not played.
+
+        Args:
+            board (Board): The position to start from; it is left as it was.
+            color (tuple): The side to move.
+            depth (int): The number of plies to play out.
+
+        Returns:
+            int: The number of leaf nodes.
+        """
+        if depth <= 0:
+            return 1
+        moves = board.legal_moves(color)
+        if depth == 1:
+            return len(moves)
+        opponent = self.c.WHITE if color == self.c.GREY else self.c.GREY
+        nodes = 0
+        for move in moves:
+            token = board.make_move(move)
+            nodes += self.count(board, opponent, depth - 1)
+            board.unmake_move(token)
+        return nodes
+
+    def run(self, names, depth):
+        """Count and time every depth from 1 up to ``depth`` for some stored positions.
+
+        Args:
+            names (list): The names of the positions in POSITIONS.
+            depth (int): The deepest count to run.
+
+        Returns:
+            list: One dict per position and depth with the node count, the
+                reference count (None if unknown), whether they agree, the time
+                taken and the nodes per second.
+        """
+        results = []
+        for name in names:
+            diagram, side, expected = self.POSITIONS[name]
+            board, color = self.setup(diagram, side)
+            for d in range(1, depth + 1):
+                started = time.perf_counter()
+                nodes = self.count(board, color, d)
+                seconds = time.perf_counter() - started
+                results.append({
+                    'position': name,
+                    'depth': d,
+                    'nodes': nodes,
+                    'expected': expected.get(d),
+                    'ok': expected.get(d) in (None, nodes),
+                    'seconds': round(seconds, 6),
+                    'nps': round(nodes / seconds) if seconds > 0 else 0,
+                })
+        return results
+
+    @staticmethod
+    def compare(results, baseline, tolerance=0.1):
+        """Find the counts that got slower than in an earlier run.
+
+        Only the deepest count of each position is compared, since the
+        shallow ones finish too quickly to time reliably.
+
+        Args:
+            results (list): The rows returned by run.
+            baseline (list): The rows of the earlier run.
+            tolerance (float, optional): The share of the old speed that may be
+                lost before it counts as a regression. Defaults to 0.1.
+
+        Returns:
+            list: ``(position, depth, old_nps, new_nps)`` for every regression.
+        """
+        old = {(row['position'], row['depth']): row['nps'] for row in baseline}
+        deepest = {}
+        for row in results:
+            if row['depth'] >= deepest.get(row['position'], {'depth': 0})['depth']:
+                deepest[row['position']] = row
+        regressions = []
+        for row in deepest.values():
+            before = old.get((row['position'], row['depth']))
+            if before and row['nps'] < before * (1 - tolerance):
+                regressions.append((row['position'], row['depth'], before, row['nps']))
+        return regressions
+
+
+def main(argv=None):
+    """Run perft from the command line.
+
+    Args:
+        argv (list, optional): The arguments; defaults to sys.argv.
+
+    Returns:
+        int: The exit status: 1 if a count is wrong or the speed regressed, else 0.
+    """
+    parser = argparse.ArgumentParser(description="Count and time move generation.")
+    parser.add_argument('--depth', type=int, default=6, help="deepest ply to count (default: 6)")
+    parser.add_argument('--backend', choices=sorted(Perft.BACKENDS), default='board')
+    parser.add_argument('--position', action='append', choices=sorted(Perft.POSITIONS),
+                        help="a stored position to count; repeat for several (default: all)")
+    parser.add_argument('--output', help="save the results to this JSON file")
+    parser.add_argument('--baseline', help="compare the speed with the results in this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="share of the baseline speed that may be lost (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    perft = Perft(Perft.BACKENDS[args.backend])
+    results = perft.run(args.position or list(Perft.POSITIONS), args.depth)
+    print(f"{'position':<10} {'depth':>5} {'nodes':>12} {'expected':>12} {'seconds':>10} {'nodes/s':>10}")
+    for row in results:
+        expected = '' if row['expected'] is None else row['expected']
+        flag = '' if row['ok'] else '  MISMATCH'
+        print(f"{row['position']:<10} {row['depth']:>5} {row['nodes']:>12} {expected:>12} "
+              f"{row['seconds']:>10.3f} {row['nps']:>10}{flag}")
+
+    status = 0 if all(row['ok'] for row in results) else 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        for name, depth, before, after in Perft.compare(results, baseline, args.tolerance):
+            print(f"regression: {name} depth {depth} went from {before} to {after} nodes/s")
+            status = 1
+    if args.output:
+        report = {
+            'backend': args.backend,
+            'depth': args.depth,
+            'python': platform.python_version(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+import bisect
+import functools
+import json
+import time
+from array import array
+from checkers.board import Board
+from checkers.bitboard import BitBoard
+from checkers.checkers import Checkers
+from checkers.engine import Engine
+from checkers.mcts import MCTS
+
+
+class Histogram:
+    """Timings of one kind, kept two ways.
+
+    Bucket counts, a total and a count grow for the life of the program, the
+    way Prometheus histograms do. The last ``window`` samples are also kept
+    in a ring, for percentiles of how things stand right now.
+
+    Samples may come from several threads; at worst a sample is lost.
+    """
+
+    # Bucket upper bounds in seconds, from 10 µs to 2.5 s
+    SECONDS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+               2.5)
+
+    def __init__(self, bounds=SECONDS, window=1024):
+        """Initialize an empty histogram.
+
+        Args:
+            bounds (tuple, optional): The buckets' upper bounds, ascending. Defaults to SECONDS.
+            window (int, optional): How many recent samples to keep. Defaults to 1024.
+        """
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.window = window
+        self.recent = array('d', bytes(8 * window))
+
+    def add(self, value):
+        """Add a sample.
+
+        Args:
+            value (float): The sample.
+        """
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.recent[self.count % self.window] = value
+        self.count += 1
+        self.total += value
+
+    def summary(self):
+        """Describe the recent samples.
+
+        Returns:
+            dict: The ``count`` and ``sum`` of every sample, and the ``mean``, ``p50``,
+                ``p95``, ``p99`` and ``max`` of the recent ones.
+        """
+        recent = sorted(self.recent[:min(self.count, self.window)])
+        found = {'count': self.count, 'sum': self.total}
+        if not recent:
+            return found
+        found['mean'] = sum(recent) / len(recent)
+        for name, share in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            found[name] = recent[min(len(recent) - 1, int(share * len(recent)))]
+        found['max'] = recent[-1]
+        return found
+
+
+class Profiler:
+    """Optional timers around the game's hot paths.
+
+    Nothing is measured, and nothing costs anything, until enable is called:
+    it swaps the measured methods on their classes for timed wrappers, and
+    disable puts the originals back. It measures:
+
+    - ``frame_seconds``: a whole frame, Checkers.update.
+    - ``render_seconds``: redrawing the board, Renderer.draw_board.
+    - ``event_seconds``: handling a click, Checkers.choose.
+    - ``click_latency_seconds``: from a click being handled to the end of the
+      frame that shows it.
+    - ``movegen_seconds``: legal_moves and possible_moves on both boards,
+      labelled by board and function; the count is the number of calls.
+    - ``engine_nps``: the speed of every search, for both engines.
+    """
+
+    # Bucket upper bounds for search speeds, in nodes per second
+    NPS = (1e3, 2.5e3, 5e3, 1e4, 2.5e4, 5e4, 1e5, 2.5e5, 5e5, 1e6)
+    # How often the overlay's text is brought up to date, in seconds
+    OVERLAY_REFRESH = 0.25
+
+    def __init__(self, window=1024):
+        """Initialize a profiler; it measures nothing until enabled.
+
+        Args:
+            window (int, optional): The recent samples every histogram keeps. Defaults to 1024.
+        """
+        self.window = window
+        # {(name, labels): Histogram}, where labels is a tuple of (label, value) pairs
+        self.metrics = {}
+        # (class, attribute, original) for every method swapped out
+        self.patched = []
+        self.overlay = False
+        self.overlay_lines = []
+        self.overlay_rect = None
+        self.overlay_time = 0.0
+        # When the click waiting to be shown was handled
+        self.clicked = None
+        # How deep in Checkers.choose the game is; it calls itself after a failed move
+        self.choosing = 0
+
+    @property
+    def enabled(self):
+        """Check whether the timers are in place.
+
+        Returns:
+            bool: True between enable and disable.
+        """
+        return bool(self.patched)
+
+    def histogram(self, name, bounds=Histogram.SECONDS, **labels):
+        """Get a metric's histogram, creating it on first use.
+
+        Args:
+            name (str): The metric's name.
+            bounds (tuple, optional): The bucket bounds for a new histogram.
+            **labels: The metric's labels, such as ``function='legal_moves'``.
+
+        Returns:
+            Histogram: The histogram.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        if key not in self.metrics:
+            self.metrics[key] = Histogram(bounds, self.window)
+        return self.metrics[key]
+
+    def patch(self, owner, name, wrap):
+        """Swap a method for a wrapped one, remembering the original.
+
+        Args:
+            owner (type): The class the method is defined on.
+            name (str): The method's name.
+            wrap (callable): Takes the original function and returns its replacement.
+        """
+        original = owner.__dict__[name]
+        self.patched.append((owner, name, original))
+        setattr(owner, name, functools.wraps(original)(wrap(original)))
+
+    def timed(self, histogram):
+        """Make a wrapper factory that times every call into a histogram.
+
+        Args:
+            histogram (Histogram): Where the timings go.
+
+        Returns:
+            callable: A wrapper factory for patch.
+        """
+        def wrap(original):
+            def timed_call(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    histogram.add(time.perf_counter() - started)
+            return timed_call
+        return wrap
+
+    def enable(self, render=True, overlay=False):
+        """Put the timers in place.
+
+        Args:
+            render (bool, optional): Time the renderer too, which imports pygame.
+                Defaults to True.
+            overlay (bool, optional): Draw the latest figures in the window's corner.
+                Defaults to False.
+        """
+        if self.enabled:
+            return
+        for board_class in (Board, BitBoard):
+            for name in ('legal_moves', 'possible_moves'):
+                self.patch(board_class, name, self.timed(self.histogram('movegen_seconds', board=board_class.__name__,
+                                                                        function=name)))
+        for engine_class in (Engine, MCTS):
+            self.patch(engine_class, 'search', self.measure_search(engine_class.__name__))
+
+        frames = self.histogram('frame_seconds')
+        latency = self.histogram('click_latency_seconds')
+        self.patch(Checkers, 'choose', self.time_click(self.histogram('event_seconds')))
+
+        def wrap_update(original):
+            def update(game):
+                started = time.perf_counter()
+                original(game)
+                finished = time.perf_counter()
+                frames.add(finished - started)
+                # The frame that follows a click is the one that shows it
+                if self.clicked is not None:
+                    latency.add(finished - self.clicked)
+                    self.clicked = None
+            return update
+        self.patch(Checkers, 'update', wrap_update)
+
+        if render:
+            # The renderer brings pygame with it, so it is only imported when it is timed
+            from checkers.render import Renderer
+            self.overlay = overlay
+            self.patch(Renderer, 'draw_board', self.wrap_draw_board)
+
+    def disable(self):
+        """Put every original method back; the figures gathered so far are kept.
+        """
+        for owner, name, original in reversed(self.patched):
+            setattr(owner, name, original)
+        self.patched = []
+        self.overlay_rect = None
+
+    def measure_search(self, engine):
+        """Make a wrapper factory that records the speed of every search.
+
+        Args:
+            engine (str): The engine's name, for the metric's label.
+
+        Returns:
+            callable: A wrapper factory for patch.
+        """
+        speeds = self.histogram('engine_nps', self.NPS, engine=engine)
+
+        def wrap(original):
+            def search(*args, **kwargs):
+                result = original(*args, **kwargs)
+                # Book and tablebase moves visit no nodes and say nothing about speed
+                if result is not None and result.nodes:
+                    speeds.add(result.nps)
+                return result
+            return search
+        return wrap
+
+    def time_click(self, histogram):
+        """Make a wrapper factory that times every click and remembers when it was handled.
+
+        Checkers.choose calls itself to select another piece after a failed
+        move, so only the outermost call is timed: one sample per click.
+
+        Args:
+            histogram (Histogram): Where the timings go.
+
+        Returns:
+            callable: A wrapper factory for patch.
+        """
+        def wrap(original):
+            def choose(game, r, c):
+                if self.choosing:
+                    return original(game, r, c)
+                started = time.perf_counter()
+                if self.clicked is None:
+                    self.clicked = started
+                self.choosing += 1
+                try:
+                    return original(game, r, c)
+                finally:
+                    self.choosing -= 1
+                    histogram.add(time.perf_counter() - started)
+            return choose
+        return wrap
+
+    def wrap_draw_board(self, original):
+        """Time the renderer and draw the overlay on top of what it drew.
+
+        Args:
+            original (callable): Renderer.draw_board.
+
+        Returns:
+            callable: Its replacement.
+        """
+        histogram = self.histogram('render_seconds')
+
+        def draw_board(renderer, board):
+            # The overlay is drawn over the board, so the squares beneath it are redrawn every frame
+            if self.overlay and self.overlay_rect is not None:
+                renderer.invalidate(renderer.squares_under(self.overlay_rect))
+            started = time.perf_counter()
+            rects = original(renderer, board)
+            histogram.add(time.perf_counter() - started)
+            if self.overlay:
+                rects.append(self.draw_overlay(renderer.window))
+            return rects
+        return draw_board
+
+    def draw_overlay(self, surface):
+        """Draw the latest figures in the top left corner of a surface.
+
+        Args:
+            surface (Surface): The window.
+
+        Returns:
+            Rect: The area drawn on.
+        """
+        from checkers.render import render_text
+        now = time.perf_counter()
+        if now - self.overlay_time >= self.OVERLAY_REFRESH or not self.overlay_lines:
+            self.overlay_time = now
+            self.overlay_lines = [render_text(line, (255, 255, 0), size=18) for line in self.overlay_text()]
+        width = max(line.get_width() for line in self.overlay_lines) + 8
+        height = sum(line.get_height() for line in self.overlay_lines) + 8
+        self.overlay_rect = surface.fill((0, 0, 0), (0, 0, width, height))
+        y = 4
+        for line in self.overlay_lines:
+            surface.blit(line, (4, y))
+            y += line.get_height()
+        return self.overlay_rect
+
+    def overlay_text(self):
+        """Put the latest figures into a few short lines.
+
+        Returns:
+            list: The lines.
+        """
+        def ms(name, figure):
+            return 1000 * self.histogram(name).summary().get(figure, 0.0)
+
+        movegen = [h for (name, _), h in self.metrics.items() if name == 'movegen_seconds']
+        calls = sum(h.count for h in movegen)
+        spent = sum(h.total for h in movegen)
+        speeds = [h.summary().get('p50', 0.0) for (name, _), h in self.metrics.items()
+                  if name == 'engine_nps' and h.count]
+        return [f"frame p50 {ms('frame_seconds', 'p50'):.2f} ms  p95 {ms('frame_seconds', 'p95'):.2f} ms",
+                f"render p95 {ms('render_seconds', 'p95'):.2f} ms",
+                f"click to frame p95 {ms('click_latency_seconds', 'p95'):.1f} ms",
+                f"movegen {calls} calls, {1e6 * spent / calls if calls else 0.0:.1f} us each",
+                f"engine {max(speeds, default=0.0) / 1000:.1f} knps"]
+
+    def to_json(self):
+        """Describe every metric as JSON.
+
+        Returns:
+            str: A list of ``{"name", "labels", ...summary}`` objects.
+        """
+        return json.dumps([dict(name=name, labels=dict(labels), **histogram.summary())
+                           for (name, labels), histogram in sorted(self.metrics.items())], indent=2)
+
+    def to_prometheus(self):
+        """Describe every metric in the Prometheus text format.
+
+        Returns:
+            str: One histogram per metric, with cumulative buckets, a sum and a count.
+        """
+        lines = []
+        typed = set()
+        for (name, labels), histogram in sorted(self.metrics.items()):
+            metric = f'checkers_{name}'
+            if metric not in typed:
+                lines.append(f'# TYPE {metric} histogram')
+                typed.add(metric)
+            base = ','.join(f'{label}="{value}"' for label, value in labels)
+            running = 0
+            for bound, count in zip(list(histogram.bounds) + ['+Inf'], histogram.buckets):
+                running += count
+                lines.append(f'{metric}_bucket{{{base + "," if base else ""}le="{bound}"}} {running}')
+            suffix = f'{{{base}}}' if base else ''
+            lines.append(f'{metric}_sum{suffix} {histogram.total}')
+            lines.append(f'{metric}_count{suffix} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Save every metric to a file.
+
+        Args:
+            path (str): The file; a ``.json`` file gets JSON, anything else Prometheus text.
+        """
+        with open(path, 'w') as f:
+            f.write(self.to_json() if path.endswith('.json') else self.to_prometheus())
@@ -0,0 +1,540 @@
+import argparse
+import math
+import os
+import queue
+import subprocess
+import sys
+import threading
+from checkers.bitboard import BitBoard
+from checkers.background import BackgroundSearch
+from checkers.engine import SearchResult
+from checkers.records import Notation
+from checkers.tournament import make_player, parse_engine
+
+
+# The folder holding the checkers package, where engine processes are started from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class EngineServer(BackgroundSearch):
+    """Runs an engine behind a line-based text protocol, one command per line.
+
+    This is what an engine process runs. It reads commands on stdin and
+    answers on stdout; moves are in PDN text and positions in PDN FEN:
+
+    - ``isready``: answered with ``readyok`` once everything is loaded.
+    - ``newgame``: forget what the engine learned about earlier games.
+    - ``position startpos`` or ``position fen <FEN>``, optionally followed by
+      ``moves <move> ...``: set the position to search.
+    - ``go``, ``go movetime <ms>`` or ``go infinite``: search the position on a
+      worker thread. Every completed iteration is reported as ``info depth
+      <n> score <s> nodes <n> time <ms> nps <n> pv <move> ...``, and the
+      search ends with ``bestmove <move>``, or ``bestmove none`` without moves.
+    - ``stop``: end the search now; its ``bestmove`` still follows.
+    - ``quit``: stop searching and exit.
+    """
+
+    def __init__(self, engine, output=None):
+        """Initialize a protocol server.
+
+        Args:
+            engine (Engine): The engine to search with.
+            output (file, optional): Where answers go. Defaults to stdout.
+        """
+        super().__init__(engine)
+        self.output = output or sys.stdout
+        self.notation = Notation()
+        self.board, self.turn = BitBoard(), self.notation.c.GREY
+        # Answers come from the command loop and from the search thread
+        self.lock = threading.Lock()
+
+    def say(self, line):
+        """Send one line of output.
+
+        Args:
+            line (str): The line, without its newline.
+        """
+        with self.lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def run(self, board, color, time_limit):
+        """Search on the worker thread, reporting the result as it goes and at the end.
+
+        Args:
+            board (Board): The worker's own copy of the position.
+            color (tuple): The side to move.
+            time_limit (float): The budget for the search, or None for the engine's own.
+        """
+        super().run(board, color, time_limit)
+        if self.outcome is None:
+            self.say('bestmove none')
+            return
+        self.report(self.outcome)
+        self.say(f'bestmove {self.notation.move_text(self.outcome.move)}')
+
+    def report(self, result):
+        """Keep a completed iteration and send it as an ``info`` line.
+
+        Args:
+            result (SearchResult): The best move and line found so far.
+        """
+        super().report(result)
+        pv = ' '.join(self.notation.move_text(move) for move in result.pv)
+        self.say(f'info depth {result.depth} score {result.score} nodes {result.nodes} '
+                 f'time {int(result.elapsed * 1000)} nps {int(result.nps)} pv {pv}')
+
+    def set_position(self, words):
+        """Carry out a ``position`` command.
+
+        Args:
+            words (list): The command's words after ``position``.
+
+        Raises:
+            ValueError: If the position or one of the moves cannot be read.
+        """
+        moves = words.index('moves') if 'moves' in words else len(words)
+        if words[:1] == ['fen']:
+            board, turn = self.notation.from_fen(' '.join(words[1:moves]))
+        elif words[:1] == ['startpos']:
+            board, turn = BitBoard(), self.notation.c.GREY
+        else:
+            raise ValueError("expected startpos or fen")
+        for text in words[moves + 1:]:
+            board.make_move(self.notation.parse_move(text, board.legal_moves(turn)))
+            turn = self.engine.opponent(turn)
+        self.board, self.turn = board, turn
+
+    def go(self, words):
+        """Carry out a ``go`` command.
+
+        Args:
+            words (list): The command's words after ``go``.
+        """
+        if 'infinite' in words:
+            self.start(self.board, self.turn, ponder=True)
+        elif 'movetime' in words:
+            self.start(self.board, self.turn, int(words[words.index('movetime') + 1]) / 1000)
+        else:
+            self.start(self.board, self.turn)
+
+    def serve(self, lines):
+        """Answer commands until ``quit`` or the end of the input.
+
+        Args:
+            lines (iterable): The incoming command lines.
+        """
+        for line in lines:
+            words = line.split()
+            if not words:
+                continue
+            command, words = words[0], words[1:]
+            try:
+                if command == 'isready':
+                    self.say('readyok')
+                elif command == 'newgame':
+                    self.cancel()
+                    self.engine.tt.clear()
+                elif command == 'position':
+                    self.cancel()
+                    self.set_position(words)
+                elif command == 'go':
+                    self.go(words)
+                elif command == 'stop':
+                    self.cancel()
+                elif command == 'quit':
+                    break
+                else:
+                    self.say(f'error unknown command {command}')
+            except (ValueError, IndexError) as error:
+                self.say(f'error {error}')
+        self.cancel()
+
+
+class EngineClient:
+    """Drives an engine running in its own process.
+
+    A crash or a runaway search in the engine only takes its process down;
+    the next search starts a fresh one. The client can stand in for a
+    BackgroundSearch: it starts, follows and collects searches without ever
+    blocking the caller, so Checkers plays through it unchanged.
+    """
+
+    def __init__(self, engine=None, timeout=5.0):
+        """Start an engine process.
+
+        Args:
+            engine (dict, optional): The engine's configuration, as taken by make_player;
+                a ``book`` or ``tablebase`` path is loaded once, when the process starts.
+            timeout (float, optional): How long to wait, in seconds, for the process to
+                answer ``isready`` or ``stop`` before it is restarted. Defaults to 5.
+        """
+        self.config = dict(engine or {})
+        self.timeout = timeout
+        self.notation = Notation()
+        # The book lives in the engine process; the game has nothing to look up itself
+        self.book = None
+        self.process = None
+        self.lines = None
+        # A search was started and its result has not been collected yet
+        self.started = False
+        # The process has not answered the last ``go`` with ``bestmove`` yet
+        self.searching = False
+        self.pondering = False
+        self.progress = None
+        self.outcome = None
+        self.board, self.color = None, None
+        self.launch()
+
+    def launch(self):
+        """Start the engine process and the thread that reads its answers.
+        """
+        config = ','.join(f'{name}={value}' for name, value in self.config.items())
+        self.process = subprocess.Popen([sys.executable, '-m', 'checkers.protocol', '--engine', config],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1,
+                                        cwd=ROOT)
+        self.lines = queue.Queue()
+        threading.Thread(target=self.pump, args=(self.process.stdout, self.lines), daemon=True).start()
+
+    @staticmethod
+    def pump(stream, lines):
+        """Pass a process's output lines on to a queue; runs on its own thread.
+
+        Args:
+            stream (file): The process's stdout.
+            lines (Queue): Gets each line as a list of words, then None when the process ends.
+        """
+        for line in stream:
+            lines.put(line.split())
+        stream.close()
+        lines.put(None)
+
+    def alive(self):
+        """Check whether the engine process is running.
+
+        Returns:
+            bool: True until it exits or crashes.
+        """
+        return self.process is not None and self.process.poll() is None
+
+    def send(self, command):
+        """Send one command to the engine process.
+
+        Args:
+            command (str): The command line, without its newline.
+        """
+        try:
+            self.process.stdin.write(command + '\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            # The reading thread sees the process end and reports it
+            pass
+
+    def close(self):
+        """Ask the engine process to quit, killing it if it does not.
+        """
+        if self.process is None:
+            return
+        self.send('quit')
+        try:
+            self.process.wait(self.timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdin.close()
+        self.process = None
+        self.searching = False
+
+    def restart(self):
+        """Replace the engine process with a fresh one.
+        """
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process.stdin.close()
+            self.process = None
+        self.searching = False
+        self.launch()
+
+    def handle(self, words):
+        """Take in one line from the engine process.
+
+        Args:
+            words (list): The line's words, or None if the process ended.
+
+        Returns:
+            str: The line's first word, or None if the process ended.
+        """
+        if words is None:
+            # Whatever it was searching is lost with it
+            self.searching = False
+            self.outcome = None
+            return None
+        if words[0] == 'info' and 'pv' in words:
+            self.progress = self.parse_info(words)
+        elif words[0] == 'bestmove':
+            self.searching = False
+            self.outcome = self.progress if words[1:] != ['none'] else None
+        return words[0]
+
+    def parse_info(self, words):
+        """Read a search result from an ``info`` line.
+
+        Args:
+            words (list): The line's words.
+
+        Returns:
+            SearchResult: The result, with its line of moves read on the searched position.
+        """
+        fields = {words[i]: words[i + 1] for i in range(1, words.index('pv') - 1, 2)}
+        board = BitBoard.unpack(self.board.pack(), self.board.rows, self.board.cols)
+        turn = self.color
+        pv = []
+        for text in words[words.index('pv') + 1:]:
+            pv.append(self.notation.parse_move(text, board.legal_moves(turn)))
+            board.make_move(pv[-1])
+            turn = self.notation.c.WHITE if turn == self.notation.c.GREY else self.notation.c.GREY
+        return SearchResult(pv[0], int(fields['score']), int(fields['depth']), pv, int(fields['nodes']),
+                            int(fields['time']) / 1000)
+
+    def poll(self):
+        """Take in every line the engine process has sent so far, without waiting.
+        """
+        while True:
+            try:
+                words = self.lines.get_nowait()
+            except queue.Empty:
+                return
+            self.handle(words)
+
+    def wait_for(self, answer, timeout=None):
+        """Take in lines from the engine process until a given answer arrives.
+
+        Args:
+            answer (str): The first word of the awaited line.
+            timeout (float, optional): How long to wait, in seconds; None waits for ever.
+
+        Returns:
+            bool: True if the answer came, False if the process ended first.
+
+        Raises:
+            TimeoutError: If the answer did not come in time.
+        """
+        while True:
+            try:
+                first = self.handle(self.lines.get(timeout=timeout))
+            except queue.Empty:
+                raise TimeoutError(f"the engine did not answer {answer!r} in time")
+            if first is None:
+                return False
+            if first == answer:
+                return True
+
+    def ready(self):
+        """Wait until the engine process has loaded everything and is idle.
+
+        A process that died or does not answer in time is restarted first.
+        """
+        self.cancel()
+        if not self.alive():
+            self.restart()
+        self.send('isready')
+        try:
+            if self.wait_for('readyok', self.timeout):
+                return
+        except TimeoutError:
+            pass
+        self.restart()
+        self.send('isready')
+        self.wait_for('readyok', self.timeout)
+
+    def start(self, board, color, time_limit=None, ponder=False):
+        """Start searching a position, stopping any search already running.
+
+        Args:
+            board (Board): The position to search; it is sent, not shared.
+            color (tuple): The side to move.
+            time_limit (float, optional): Overrides the engine's budget per move.
+            ponder (bool, optional): Search without a time limit until cancelled.
+                Defaults to False.
+        """
+        self.cancel()
+        if not self.alive():
+            self.restart()
+        self.board = BitBoard.unpack(board.pack(), board.rows, board.cols)
+        self.color = color
+        self.send(f'position fen {self.notation.to_fen(board, color)}')
+        if ponder:
+            self.send('go infinite')
+        elif time_limit is not None and not math.isinf(time_limit):
+            self.send(f'go movetime {max(1, int(time_limit * 1000))}')
+        else:
+            self.send('go')
+        self.started = self.searching = True
+        self.pondering = ponder
+        self.progress = None
+        self.outcome = None
+
+    def ponder(self, board, color):
+        """Think on the opponent's time, filling the engine process's table.
+
+        Args:
+            board (Board): The position, with the opponent to move.
+            color (tuple): The opponent's color.
+        """
+        self.start(board, color, ponder=True)
+
+    def running(self):
+        """Check whether a search is under way.
+
+        Returns:
+            bool: True until the engine process answers with its best move.
+        """
+        self.poll()
+        return self.searching
+
+    def idle(self):
+        """Check whether nothing was started since the last result was collected or cancelled.
+
+        Returns:
+            bool: True if a new search can be started without losing anything.
+        """
+        return not self.started
+
+    def done(self):
+        """Check whether a move search has finished and its result can be collected.
+
+        Returns:
+            bool: True once result() will not block.
+        """
+        return self.started and not self.pondering and not self.running()
+
+    def result(self):
+        """Collect the result of the finished search, waiting for it if needed.
+
+        Returns:
+            SearchResult: The best move found, or None if the side had no moves
+                or the engine process died.
+        """
+        if self.started and self.searching:
+            self.wait_for('bestmove')
+        self.started = False
+        return self.outcome
+
+    def search(self, board, color, time_limit=None):
+        """Search a position and wait for the result.
+
+        Args:
+            board (Board): The position to search.
+            color (tuple): The side to move.
+            time_limit (float, optional): Overrides the engine's budget.
+
+        Returns:
+            SearchResult: The best move found, or None.
+        """
+        self.start(board, color, time_limit)
+        return self.result()
+
+    def cancel(self):
+        """Stop the running search, if any, and throw its result away.
+
+        An engine process that does not stop in time is restarted.
+        """
+        if self.searching:
+            self.send('stop')
+            try:
+                self.wait_for('bestmove', self.timeout)
+            except TimeoutError:
+                self.restart()
+        self.started = False
+        self.pondering = False
+        self.progress = None
+        self.outcome = None
+
+
+class EnginePool:
+    """Keeps warm engine processes and lends them out one search at a time.
+
+    Every process is started, and its tables and book loaded, when the pool
+    is made, so no search pays for starting one. A process returned dead
+    is replaced before it is lent out again.
+    """
+
+    def __init__(self, size=2, engine=None, timeout=5.0):
+        """Start the pool's engine processes and wait until they are ready.
+
+        Args:
+            size (int, optional): The number of processes. Defaults to 2.
+            engine (dict, optional): Their configuration, as taken by EngineClient.
+            timeout (float, optional): Passed on to every EngineClient.
+        """
+        self.clients = [EngineClient(engine, timeout) for _ in range(size)]
+        self.free = queue.Queue()
+        # The processes load in parallel; only then is each one waited for
+        for client in self.clients:
+            client.ready()
+            self.free.put(client)
+
+    def acquire(self, timeout=None):
+        """Borrow an idle engine process.
+
+        Args:
+            timeout (float, optional): How long to wait for one, in seconds; None waits for ever.
+
+        Returns:
+            EngineClient: The engine, to give back with release.
+
+        Raises:
+            queue.Empty: If none became free in time.
+        """
+        return self.free.get(timeout=timeout)
+
+    def release(self, client):
+        """Give a borrowed engine back, restarting it if it died.
+
+        Args:
+            client (EngineClient): The engine.
+        """
+        client.cancel()
+        if not client.alive():
+            client.ready()
+        self.free.put(client)
+
+    def search(self, board, color, time_limit=None):
+        """Search a position on whichever engine is free first.
+
+        Args:
+            board (Board): The position to search.
+            color (tuple): The side to move.
+            time_limit (float, optional): Overrides the engines' budget.
+
+        Returns:
+            SearchResult: The best move found, or None.
+        """
+        client = self.acquire()
+        try:
+            return client.search(board, color, time_limit)
+        finally:
+            self.release(client)
+
+    def close(self):
+        """Shut every engine process down.
+        """
+        for client in self.clients:
+            client.close()
+
+
+def main(argv=None):
+    """Run an engine process speaking the line protocol on stdin and stdout.
+
+    Args:
+        argv (list, optional): The arguments; defaults to sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Run the engine behind a line-based protocol on stdin/stdout.")
+    parser.add_argument('--engine', type=parse_engine, default={}, help="e.g. time_limit=0.1,book=book.bin")
+    args = parser.parse_args(argv)
+    EngineServer(make_player(args.engine)).serve(sys.stdin)
+
+
+if __name__ == "__main__":
+    main()
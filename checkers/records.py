@@ -0,0 +1,445 @@
+import re
+import struct
+from checkers.constants import Constants
+from checkers.angry_piece import AngryPiece
+from checkers.bitboard import BitBoard
+from checkers.book import encode_move, decode_move
+
+
+class Notation:
+    """Converts between squares and the numbers game records use.
+
+    PDN numbers the dark squares from 1, starting in the corner of the side
+    that moves first (Black in PDN, grey here) and reading each row from
+    that side's point of view. On 8x8 grey's back row holds 1-4 and white's
+    holds 29-32, so grey starts on 1-12 and white on 21-32.
+    """
+
+    def __init__(self, rows=None, cols=None):
+        """Initialize the numbering for a board size.
+
+        Args:
+            rows (int, optional): The number of rows. Defaults to Constants.ROWS.
+            cols (int, optional): The number of columns. Defaults to Constants.COLS.
+        """
+        self.c = Constants()
+        self.rows = rows or self.c.ROWS
+        self.cols = cols or self.c.COLS
+        half = self.cols // 2
+        self.numbers = {}
+        for r in range(self.rows):
+            for c in range((r + 1) % 2, self.cols, 2):
+                self.numbers[(r, c)] = half * (self.rows - 1 - r) + (self.cols - 1 - c) // 2 + 1
+        self.squares = {number: square for square, number in self.numbers.items()}
+
+    def path(self, move):
+        """List the squares a move touches down: where it starts, every landing and where it ends.
+
+        Args:
+            move (tuple): The ``(start, end, captured)`` move.
+
+        Returns:
+            list: The (row, col) squares, in order.
+        """
+        start, end, captured = move
+        squares = [start]
+        for r, c in captured:
+            # Every jump lands as far beyond the captured piece as it started before it
+            pr, pc = squares[-1]
+            squares.append((2 * r - pr, 2 * c - pc))
+        if not captured:
+            squares.append(end)
+        return squares
+
+    def move_text(self, move):
+        """Write a move the PDN way, e.g. ``11-15`` or ``9x18x27``.
+
+        Args:
+            move (tuple): The ``(start, end, captured)`` move.
+
+        Returns:
+            str: The move text.
+        """
+        separator = 'x' if move[2] else '-'
+        return separator.join(str(self.numbers[square]) for square in self.path(move))
+
+    def parse_move(self, text, moves):
+        """Find the legal move a piece of move text stands for.
+
+        A capture may give every landing square or only the first and last.
+
+        Args:
+            text (str): The move text.
+            moves (list): The legal moves of the position.
+
+        Returns:
+            tuple: The move.
+
+        Raises:
+            ValueError: If the text matches no legal move, or more than one.
+        """
+        numbers = [int(part) for part in re.split('[-x:]', text)]
+        squares = [self.squares.get(number) for number in numbers]
+        matches = []
+        for move in moves:
+            path = self.path(move)
+            if path[0] == squares[0] and path[-1] == squares[-1] and (len(squares) == 2 or path == squares):
+                matches.append(move)
+        if len(matches) != 1:
+            raise ValueError(f"{text!r} is {'ambiguous' if matches else 'not a legal move'} here")
+        return matches[0]
+
+    def to_fen(self, board, color):
+        """Describe a position as a PDN FEN string, e.g. ``B:W21,22,K30:B1,2,K9``.
+
+        Args:
+            board (Board): The position; any board engine works.
+            color (tuple): The side to move.
+
+        Returns:
+            str: The FEN.
+        """
+        sides = []
+        for letter, side in (('W', self.c.WHITE), ('B', self.c.GREY)):
+            pieces = sorted(board.get_all_pieces(side), key=lambda piece: self.numbers[(piece.row, piece.col)])
+            sides.append(letter + ','.join(('K' if piece.king else '') + str(self.numbers[(piece.row, piece.col)])
+                                           for piece in pieces))
+        return ':'.join(['B' if color == self.c.GREY else 'W'] + sides)
+
+    def from_fen(self, fen, board_class=BitBoard):
+        """Set a position up from a PDN FEN string.
+
+        Ranges such as ``1-12`` are accepted as well as single squares.
+
+        Args:
+            fen (str): The FEN.
+            board_class (type, optional): The board engine to build. Defaults to BitBoard.
+
+        Returns:
+            tuple: The board and the side to move.
+
+        Raises:
+            ValueError: If the FEN cannot be read.
+        """
+        fields = fen.strip().strip('"').rstrip('.').split(':')
+        if len(fields) != 3 or fields[0].upper() not in ('B', 'W'):
+            raise ValueError(f"bad FEN {fen!r}")
+        board = board_class(self.rows, self.cols)
+        board.clear()
+        for field in fields[1:]:
+            color = self.c.GREY if field[:1].upper() == 'B' else self.c.WHITE
+            for item in filter(None, field[1:].split(',')):
+                king = item.upper().startswith('K')
+                first, _, last = item.lstrip('Kk').partition('-')
+                for number in range(int(first), int(last or first) + 1):
+                    if number not in self.squares:
+                        raise ValueError(f"no square {number} in {fen!r}")
+                    piece = AngryPiece(*self.squares[number], color)
+                    piece.king = king
+                    board.add_piece(piece)
+        return board, self.c.GREY if fields[0].upper() == 'B' else self.c.WHITE
+
+
+class GameRecord:
+    """One game: its tags, where it started, its moves and its result.
+
+    Results use PDN's tokens, from Black's (grey's) side first: ``1-0``,
+    ``0-1``, ``1/2-1/2`` or ``*`` for a game that did not finish.
+    """
+
+    def __init__(self, moves=(), result='*', tags=None, fen=None, rows=None, cols=None):
+        """Initialize a game record.
+
+        Args:
+            moves (list, optional): The ``(start, end, captured)`` moves played.
+            result (str, optional): The result token. Defaults to ``'*'``.
+            tags (dict, optional): Other PDN tags, such as Event or Date.
+            fen (str, optional): The starting position, if it was not the usual one.
+            rows (int, optional): The number of rows. Defaults to Constants.ROWS.
+            cols (int, optional): The number of columns. Defaults to Constants.COLS.
+        """
+        self.c = Constants()
+        self.moves = list(moves)
+        self.result = result
+        self.tags = dict(tags or {})
+        self.fen = fen
+        self.notation = Notation(rows, cols)
+
+    def start(self, board_class=BitBoard):
+        """Set up the game's starting position.
+
+        Args:
+            board_class (type, optional): The board engine to build. Defaults to BitBoard.
+
+        Returns:
+            tuple: The board and the side to move.
+        """
+        if self.fen:
+            return self.notation.from_fen(self.fen, board_class)
+        return board_class(self.notation.rows, self.notation.cols), self.c.GREY
+
+    def positions(self, board_class=BitBoard):
+        """Replay the game, giving back every position on the way.
+
+        The same board is played on throughout, so copy a position to keep it.
+
+        Args:
+            board_class (type, optional): The board engine to play on. Defaults to BitBoard.
+
+        Yields:
+            tuple: The board and the side to move, first before any move and then
+                after every move.
+        """
+        board, turn = self.start(board_class)
+        yield board, turn
+        for move in self.moves:
+            board.make_move(move)
+            turn = self.c.WHITE if turn == self.c.GREY else self.c.GREY
+            yield board, turn
+
+    def winner(self):
+        """Get the winner from the result.
+
+        Returns:
+            tuple: The winning color, or None for a draw or an unfinished game.
+        """
+        return {'1-0': self.c.GREY, '0-1': self.c.WHITE}.get(self.result)
+
+    def to_pdn(self):
+        """Write the game as PDN.
+
+        Returns:
+            str: The tag section, a blank line and the move text, ending with the result.
+        """
+        tags = dict(self.tags)
+        tags.setdefault('GameType', '21')
+        tags['Result'] = self.result
+        if self.fen:
+            tags['FEN'] = self.fen
+        lines = [f'[{name} "{value}"]' for name, value in tags.items()]
+        board, turn = self.start()
+        words = []
+        number = 1
+        for i, move in enumerate(self.moves):
+            if turn == self.c.GREY:
+                words.append(f"{number}.")
+            elif i == 0:
+                words.append(f"{number}...")
+            if move not in board.legal_moves(turn):
+                raise ValueError(f"illegal move {move} at ply {i + 1}")
+            words.append(self.notation.move_text(move))
+            board.make_move(move)
+            if turn == self.c.WHITE:
+                number += 1
+            turn = self.c.WHITE if turn == self.c.GREY else self.c.GREY
+        words.append(self.result)
+        # Keep the move text to readable lines
+        text, line = [], ''
+        for word in words:
+            if line and len(line) + 1 + len(word) > 79:
+                text.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        text.append(line)
+        return '\n'.join(lines + [''] + text) + '\n'
+
+
+# Tokens of PDN move text: a tag pair, a comment, a variation bracket, a result, a move
+PDN_TOKENS = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]|\{[^}]*\}|[()]|'
+                        r'(?<!\d)(1-0|0-1|2-0|0-2|1/2-1/2|1-1|\*)(?![\d/])|(\d+(?:[-x:]\d+)+)')
+
+
+def read_pdn(lines, rows=None, cols=None):
+    """Read PDN games one at a time, so archives of any size can be streamed.
+
+    Only the main line is kept: comments and variations are skipped, as are
+    move numbers and annotation symbols.
+
+    Args:
+        lines (iterable): The text, line by line; an open file works.
+        rows (int, optional): The number of rows. Defaults to Constants.ROWS.
+        cols (int, optional): The number of columns. Defaults to Constants.COLS.
+
+    Yields:
+        GameRecord: Every game, as soon as its result token has been read.
+
+    Raises:
+        ValueError: If a move is not legal where it was played.
+    """
+    notation = Notation(rows, cols)
+    c = notation.c
+    tags, moves = {}, []
+    board = turn = None
+    depth = 0
+    pending = ''
+    for line in lines:
+        # A comment may run over several lines
+        pending += line
+        if pending.count('{') > pending.count('}'):
+            continue
+        text, pending = pending, ''
+        for match in PDN_TOKENS.finditer(text):
+            token = match.group(0)
+            if token == '(':
+                depth += 1
+            elif token == ')':
+                depth = max(0, depth - 1)
+            elif depth or token.startswith('{'):
+                continue
+            elif match.group(1):
+                if moves:
+                    raise ValueError(f"tag [{match.group(1)}] in the middle of a game")
+                tags[match.group(1)] = match.group(2)
+            elif match.group(4):
+                if board is None:
+                    record = GameRecord(fen=tags.get('FEN'), rows=rows, cols=cols)
+                    board, turn = record.start()
+                move = notation.parse_move(match.group(4), board.legal_moves(turn))
+                board.make_move(move)
+                moves.append(move)
+                turn = c.WHITE if turn == c.GREY else c.GREY
+            elif match.group(3):
+                # Some files score a win as 2-0, counting two points for it
+                result = {'2-0': '1-0', '0-2': '0-1', '1-1': '1/2-1/2'}.get(token, token)
+                fen = tags.pop('FEN', None)
+                tags.pop('Result', None)
+                yield GameRecord(moves, result, tags, fen, rows, cols)
+                tags, moves = {}, []
+                board = turn = None
+
+
+def write_pdn(games, stream):
+    """Write games as PDN, one after another.
+
+    Args:
+        games (iterable): GameRecords; a generator works, so nothing is held in memory.
+        stream (file): A text file open for writing.
+
+    Returns:
+        int: The number of games written.
+    """
+    count = 0
+    for game in games:
+        if count:
+            stream.write('\n')
+        stream.write(game.to_pdn())
+        count += 1
+    return count
+
+
+class MoveLog:
+    """A compact binary archive of games.
+
+    After an 8-byte file header every game is a 4-byte header (result, a flag
+    for a custom start and the number of moves), the packed starting position
+    when the flag is set, then two bytes per move: the start and end square
+    indices (six bits each) and the move's place among the jumps between the
+    same squares (four bits). Moves are replayed to decode them, so only
+    legal games can be stored.
+    """
+
+    MAGIC = b'CKML'
+    VERSION = 1
+    # Magic, version, rows, columns and a spare byte
+    HEADER = struct.Struct('<4sBBBx')
+    # Result, start flag and move count
+    GAME = struct.Struct('<BBH')
+    RESULTS = ('*', '1-0', '0-1', '1/2-1/2')
+
+    def __init__(self, stream, rows=None, cols=None):
+        """Open a log for reading or writing.
+
+        Args:
+            stream (file): A binary file, open for reading or for writing.
+            rows (int, optional): The number of rows, when writing. Defaults to Constants.ROWS.
+            cols (int, optional): The number of columns, when writing. Defaults to Constants.COLS.
+        """
+        self.c = Constants()
+        self.stream = stream
+        self.rows = rows or self.c.ROWS
+        self.cols = cols or self.c.COLS
+        self.started = False
+
+    def write_header(self):
+        """Write the file header, once, before the first game.
+        """
+        if not self.started:
+            self.stream.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.rows, self.cols))
+            self.started = True
+
+    def write(self, game):
+        """Append one game.
+
+        Args:
+            game (GameRecord): The game.
+
+        Raises:
+            ValueError: If a move is illegal or the game does not fit the format.
+        """
+        self.write_header()
+        board, turn = game.start()
+        geometry = board.geometry
+        if len(game.moves) > 0xFFFF or len(geometry.squares) > 64:
+            raise ValueError("the game does not fit in a move log")
+        data = bytearray(self.GAME.pack(self.RESULTS.index(game.result), bool(game.fen) | (turn == self.c.WHITE) << 1,
+                                        len(game.moves)))
+        if game.fen:
+            data += board.pack()
+        for move in game.moves:
+            legal = board.legal_moves(turn)
+            if move not in legal:
+                raise ValueError(f"illegal move {move}")
+            squares, alternative = encode_move(geometry, move, legal)
+            # The move's place among jumps between the same squares gets four bits
+            if alternative > 15:
+                raise ValueError(f"move {move} has too many alternatives to fit in a move log")
+            data += struct.pack('<H', (squares >> 8) << 10 | (squares & 0xFF) << 4 | alternative)
+            board.make_move(move)
+            turn = self.c.WHITE if turn == self.c.GREY else self.c.GREY
+        self.stream.write(data)
+
+    def __iter__(self):
+        """Read the games one at a time, holding only the current one in memory.
+
+        Yields:
+            GameRecord: Every game in the log.
+
+        Raises:
+            ValueError: If the stream is not a move log, or a move in it is not legal
+                where it is played.
+        """
+        header = self.stream.read(self.HEADER.size)
+        magic, version, self.rows, self.cols = self.HEADER.unpack(header)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError("not a move log")
+        notation = Notation(self.rows, self.cols)
+        number = 0
+        while True:
+            data = self.stream.read(self.GAME.size)
+            if len(data) < self.GAME.size:
+                return
+            result, flags, count = self.GAME.unpack(data)
+            number += 1
+            turn = self.c.WHITE if flags & 2 else self.c.GREY
+            if flags & 1:
+                board = BitBoard.unpack(self.stream.read(3 * BitBoard(self.rows, self.cols).geometry.mask_bytes),
+                                        self.rows, self.cols)
+                fen = notation.to_fen(board, turn)
+            else:
+                board, fen = BitBoard(self.rows, self.cols), None
+            moves = []
+            for ply, (value,) in enumerate(struct.iter_unpack('<H', self.stream.read(2 * count))):
+                try:
+                    move = decode_move(board.geometry, (value >> 10) << 8 | (value >> 4) & 0x3F, value & 0xF,
+                                       board.legal_moves(turn))
+                except IndexError:
+                    # A square index past the end of the board
+                    move = None
+                if move is None:
+                    raise ValueError(f"game {number}: the move at ply {ply + 1} is not legal; the log is damaged "
+                                     f"or was written for another board")
+                board.make_move(move)
+                moves.append(move)
+                turn = self.c.WHITE if turn == self.c.GREY else self.c.GREY
+            yield GameRecord(moves, self.RESULTS[result], fen=fen, rows=self.rows, cols=self.cols)
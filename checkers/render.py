@@ -0,0 +1,249 @@
+import functools
+import os
+import pygame
+from checkers.constants import Constants
+
+
+# The crown image lives at the top of the repository, next to main.py
+CROWN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'crown_image.png')
+
+# Text surfaces kept around for reuse; there are only a few dozen trash talk phrases per color
+TEXT_CACHE_SIZE = 128
+
+
+# Everything below is cached for the whole process and shared by every Renderer,
+# so drawing a frame or making a move does not load, look up or draw anything twice
+
+@functools.lru_cache(maxsize=None)
+def load_crown():
+    """Load and scale the king's crown image, decoding the file only once.
+
+    Returns:
+        Surface: The crown image scaled to fit on a piece.
+    """
+    return pygame.transform.scale(pygame.image.load(CROWN_PATH), (44, 25))
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(name, size):
+    """Look up a system font, searching the installed fonts only once per name and size.
+
+    Args:
+        name (str): The font's name.
+        size (int): The font's size.
+
+    Returns:
+        Font: The font.
+    """
+    return pygame.font.SysFont(name, size)
+
+
+@functools.lru_cache(maxsize=None)
+def piece_sprite(color, king, size):
+    """Draw a piece once onto its own transparent surface.
+
+    Args:
+        color (tuple): The piece's color.
+        king (bool): Whether the piece wears a crown.
+        size (int): The size of a square in pixels.
+
+    Returns:
+        Surface: A square sprite with the piece centered on it.
+    """
+    sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+    # The piece is a circle slightly smaller than its square
+    pygame.draw.circle(sprite, color, (size // 2, size // 2), size // 2 - 5)
+    # Kings get the crown drawn centered on top of them
+    if king:
+        crown = load_crown()
+        sprite.blit(crown, (size // 2 - crown.get_width() // 2, size // 2 - crown.get_height() // 2))
+    # Match the display's pixel format, once there is a display, so blitting needs no conversion
+    if pygame.display.get_surface() is not None:
+        sprite = sprite.convert_alpha()
+    return sprite
+
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text, color, name="comicsans", size=30):
+    """Render a line of text, reusing the surface when the same text comes up again.
+
+    Args:
+        text (str): The text to render.
+        color (tuple): The color of the text.
+        name (str, optional): The font's name. Defaults to "comicsans".
+        size (int, optional): The font's size. Defaults to 30.
+
+    Returns:
+        Surface: The rendered text; callers must not draw on it, as it is shared.
+    """
+    return load_font(name, size).render(text, 1, color)
+
+
+class Renderer:
+    def __init__(self, window):
+        """Initialize a renderer that draws boards on a Pygame surface.
+
+        Only the squares that changed since the last frame are redrawn: the
+        renderer remembers which piece it last drew on every square and
+        copies the empty squares from a background drawn once.
+
+        Args:
+            window (Surface): The Pygame surface to draw on.
+        """
+        self.c = Constants()
+        self.window = window
+        # The empty board, drawn the first time it is needed
+        self.background = None
+        # The (color, king) last drawn on each occupied square, or None before the first frame
+        self.shown = None
+        self.shown_hash = None
+        # Squares to redraw on the next frame even if their piece did not change
+        self.dirty = set()
+        # The trash talk on screen, as (text surface, rect), and whether it still has to be drawn
+        self.overlay = None
+        self.overlay_fresh = False
+
+    def center(self, r, c):
+        """Get the pixel coordinates of the center of a square.
+
+        Args:
+            r (int): The row of the square.
+            c (int): The column of the square.
+
+        Returns:
+            tuple: The (x, y) pixel coordinates of the square's center.
+        """
+        return self.c.SQUARE * c + self.c.SQUARE // 2, self.c.SQUARE * r + self.c.SQUARE // 2
+
+    def square_rect(self, r, c):
+        """Get the area of the window a square covers.
+
+        Args:
+            r (int): The row of the square.
+            c (int): The column of the square.
+
+        Returns:
+            Rect: The square's rectangle in pixels.
+        """
+        return pygame.Rect(c * self.c.SQUARE, r * self.c.SQUARE, self.c.SQUARE, self.c.SQUARE)
+
+    def squares_under(self, rect):
+        """Get the squares that a rectangle overlaps.
+
+        Args:
+            rect (Rect): An area of the window.
+
+        Returns:
+            set: The (row, col) squares it touches.
+        """
+        rows = range(max(rect.top // self.c.SQUARE, 0), min((rect.bottom - 1) // self.c.SQUARE, self.c.ROWS - 1) + 1)
+        cols = range(max(rect.left // self.c.SQUARE, 0), min((rect.right - 1) // self.c.SQUARE, self.c.COLS - 1) + 1)
+        return {(r, c) for r in rows for c in cols}
+
+    def draw_squares(self, surface=None):
+        """Draw the squares of the game board.
+
+        Args:
+            surface (Surface, optional): Where to draw them. Defaults to the window.
+        """
+        surface = surface or self.window
+        # Fill the surface with the color BLACK
+        surface.fill(self.c.BLACK)
+
+        # Draw every other square of each row in GREY
+        for r in range(self.c.ROWS):
+            for c in range(r % 2, self.c.COLS, 2):
+                pygame.draw.rect(surface, self.c.GREY, (r * self.c.SQUARE, c * self.c.SQUARE,
+                                                        self.c.SQUARE, self.c.SQUARE))
+
+    def load_background(self):
+        """Get the empty board, drawing it the first time.
+
+        Returns:
+            Surface: The board without any pieces, in the window's pixel format.
+        """
+        if self.background is None:
+            self.background = pygame.Surface(self.window.get_size(), 0, self.window)
+            self.draw_squares(self.background)
+        return self.background
+
+    def invalidate(self, squares=None):
+        """Ask for squares to be redrawn on the next frame.
+
+        Args:
+            squares (iterable, optional): The (row, col) squares to redraw. Without
+                them the whole window is repainted and the trash talk is cleared.
+        """
+        if squares is None:
+            self.shown = None
+            self.overlay = None
+        else:
+            self.dirty.update(squares)
+
+    def draw_piece(self, piece):
+        """Draw a single piece.
+
+        Args:
+            piece (Piece): The piece to draw.
+        """
+        self.window.blit(piece_sprite(piece.color, piece.king, self.c.SQUARE),
+                         self.square_rect(piece.row, piece.col))
+
+    def draw_board(self, board):
+        """Bring the window up to date with the board.
+
+        Args:
+            board (Board): The board to draw; any board engine works.
+
+        Returns:
+            list: The rectangles of the window that changed, to pass to
+                ``pygame.display.update``; empty when nothing did.
+        """
+        if self.shown is not None and board.hash == self.shown_hash and not self.dirty and not self.overlay_fresh:
+            return []
+        pieces = {(piece.row, piece.col): piece for piece in board.get_all_pieces()}
+        state = {square: (piece.color, piece.king) for square, piece in pieces.items()}
+
+        if self.shown is None:
+            # First frame: paint everything
+            self.window.blit(self.load_background(), (0, 0))
+            for piece in pieces.values():
+                self.draw_piece(piece)
+            rects = [self.window.get_rect()]
+        else:
+            changed = self.dirty | {square for square in state.keys() | self.shown.keys()
+                                    if state.get(square) != self.shown.get(square)}
+            rects = []
+            for r, c in changed:
+                rect = self.square_rect(r, c)
+                self.window.blit(self.load_background(), rect, rect)
+                if (r, c) in pieces:
+                    self.draw_piece(pieces[(r, c)])
+                rects.append(rect)
+
+        # Keep the trash talk on top of any square redrawn beneath it
+        if self.overlay is not None:
+            text, rect = self.overlay
+            if self.overlay_fresh or rect.collidelist(rects) != -1:
+                rects.append(self.window.blit(text, rect))
+        self.overlay_fresh = False
+        self.shown = state
+        self.shown_hash = board.hash
+        self.dirty = set()
+        return rects
+
+    def draw_trash_talk(self, piece):
+        """Display the message a piece shouted after its last move.
+
+        The message stays on the board until the next one replaces it.
+
+        Args:
+            piece (AngryPiece): The piece that just moved.
+        """
+        # Clear the previous message first
+        if self.overlay is not None:
+            self.invalidate(self.squares_under(self.overlay[1]))
+        text = render_text(piece.trash_talk, piece.color)
+        x, y = self.center(piece.row, piece.col)
+        self.overlay = text, text.get_rect(center=(x, y))
+        self.overlay_fresh = True
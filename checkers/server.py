@@ -0,0 +1,467 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from checkers.constants import Constants
+from checkers.bitboard import BitBoard
+from checkers.checkers import Checkers
+from checkers.records import Notation
+from checkers.tournament import make_player, parse_engine
+
+
+# Each engine process keeps one player per configuration, so its table stays warm between moves
+_engines = {}
+
+
+def engine_move(config, packed, rows, cols, color):
+    """Search a position in an engine process.
+
+    This runs in the server's executor, so it only takes and returns plain values.
+
+    Args:
+        config (dict): The player's configuration, as taken by make_player.
+        packed (bytes): The position, as made by ``Board.pack()``.
+        rows (int): The number of rows.
+        cols (int): The number of columns.
+        color (tuple): The side to move.
+
+    Returns:
+        tuple: The ``(start, end, captured)`` move to play.
+    """
+    key = tuple(sorted(config.items()))
+    if key not in _engines:
+        _engines[key] = make_player(config)
+    return _engines[key].search(BitBoard.unpack(packed, rows, cols), color).move
+
+
+class Session:
+    """One game hosted by the server.
+
+    The game is a headless Checkers on a BitBoard, so a fresh session costs
+    about 5 KB: the board, its move cache and the game state. Moves played
+    only add a couple of bytes per ply to the game's timeline, and the
+    server's ply limit ends the game before that adds up.
+    """
+
+    __slots__ = ('id', 'game', 'computer', 'writer', 'thinking', 'touched', 'result')
+
+    def __init__(self, id, writer, computer=None):
+        """Initialize a new game.
+
+        Args:
+            id (int): The game's number on the server.
+            writer (StreamWriter): The connection that plays it, where its updates go.
+            computer (tuple, optional): The color the server plays, or None for two
+                players on the connection. Defaults to None.
+        """
+        self.id = id
+        self.game = Checkers(None, BitBoard)
+        self.computer = computer
+        self.writer = writer
+        # Whether the engine is working out the server's move
+        self.thinking = False
+        self.touched = time.monotonic()
+        self.result = None
+
+    def play(self, move):
+        """Play a move, checking it the way the board checks a player's click.
+
+        Args:
+            move (tuple): The ``(start, end, captured)`` move.
+
+        Returns:
+            bool: Whether the moving piece was crowned.
+
+        Raises:
+            ValueError: If the move is not legal.
+        """
+        game = self.game
+        start, end, captured = move
+        if not game.can_be_selected(*start) or end not in game.valid_moves:
+            raise ValueError("illegal move")
+        king = game.selected.king
+        game.computer_move(move)
+        return not king and game.board.find_piece(*end).king
+
+
+class GameServer:
+    """Hosts many games at once for clients on the network.
+
+    Clients speak newline-delimited JSON over TCP, one object per line. A
+    request names an ``op``: ``new`` starts a game (optionally with the
+    server playing one side), ``move`` plays a move in PDN text, ``state``
+    sends the whole position again, ``close`` ends a game and ``stats``
+    reports on the server. A request's ``tag``, if any, is echoed in its
+    reply.
+
+    After the opening ``state``, a game only sends ``delta`` messages: the
+    move played, the squares it emptied, whose turn it is and their legal
+    moves, so a client can follow along without parsing whole positions.
+    An ``end`` message gives the result.
+
+    Moves by the server are searched in a process pool, so the event loop
+    goes on serving every other game meanwhile.
+    """
+
+    # The longest request line accepted, in bytes
+    LINE_LIMIT = 4096
+
+    def __init__(self, host='127.0.0.1', port=8765, max_sessions=10000, max_plies=200, idle_timeout=300.0,
+                 engine=None, workers=None):
+        """Initialize a server; nothing listens until start is called.
+
+        Args:
+            host (str, optional): The address to listen on. Defaults to ``'127.0.0.1'``.
+            port (int, optional): The port, or 0 for any free one. Defaults to 8765.
+            max_sessions (int, optional): How many games may be open at once. Defaults to 10000.
+            max_plies (int, optional): Games are drawn after this many plies, which also
+                caps a session's memory. Defaults to 200.
+            idle_timeout (float, optional): Games without a request for this many
+                seconds are closed. Defaults to 300.
+            engine (dict, optional): The configuration of the server's player, as taken
+                by make_player. Defaults to a 50 ms search with a 4 MB table.
+            workers (int, optional): The number of engine processes. Defaults to the
+                number of cores.
+        """
+        self.c = Constants()
+        self.colors = {'grey': self.c.GREY, 'white': self.c.WHITE}
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.max_plies = max_plies
+        self.idle_timeout = idle_timeout
+        self.engine = engine if engine is not None else {'time_limit': 0.05, 'tt_megabytes': 4}
+        self.workers = workers or os.cpu_count() or 1
+        self.notation = Notation()
+        self.sessions = {}
+        self.next_id = 1
+        # The task serving each open connection, by its writer
+        self.clients = {}
+        # The tasks working out the server's moves; the loop only keeps weak references to them
+        self.searches = set()
+        self.moves = 0
+        self.server = None
+        self.executor = None
+        self.reaper = None
+
+    async def start(self):
+        """Start listening, the engine processes and the reaper of idle games.
+
+        Returns:
+            int: The port listened on, which is the one picked when port was 0.
+        """
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.server = await asyncio.start_server(self.serve, self.host, self.port, limit=self.LINE_LIMIT)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.reaper = asyncio.get_running_loop().create_task(self.reap())
+        return self.port
+
+    async def close(self):
+        """Stop listening, close every game and shut the engine processes down.
+        """
+        if self.reaper is not None:
+            self.reaper.cancel()
+        # Searches still running would play their moves to connections about to close
+        for task in self.searches:
+            task.cancel()
+        await asyncio.gather(*self.searches, return_exceptions=True)
+        if self.server is not None:
+            self.server.close()
+            for writer in self.clients:
+                writer.close()
+            # Let every connection's task see its connection close and clean up after it
+            await asyncio.gather(*self.clients.values(), return_exceptions=True)
+            await self.server.wait_closed()
+        self.sessions.clear()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def serve_forever(self):
+        """Start the server and run it until it is cancelled.
+        """
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def reap(self):
+        """Close the games nobody has touched for idle_timeout seconds, every so often.
+        """
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 60.0))
+            cutoff = time.monotonic() - self.idle_timeout
+            for session in [s for s in self.sessions.values() if s.touched < cutoff and not s.thinking]:
+                del self.sessions[session.id]
+
+    async def serve(self, reader, writer):
+        """Answer one connection's requests until it closes.
+
+        Args:
+            reader (StreamReader): The connection's incoming side.
+            writer (StreamWriter): Its outgoing side.
+        """
+        self.clients[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # A line over the limit, or the client went away
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request must be a JSON object")
+                except ValueError as error:
+                    await self.send(writer, {'type': 'error', 'message': str(error)})
+                    continue
+                await self.handle(request, writer)
+        finally:
+            self.clients.pop(writer, None)
+            # A client's games end with its connection
+            for id in [id for id, session in self.sessions.items() if session.writer is writer]:
+                del self.sessions[id]
+            writer.close()
+
+    async def send(self, writer, message):
+        """Send one message, waiting while the client is slow to read.
+
+        Waiting on the transport's buffer keeps a slow client from making the
+        server queue up its messages without limit.
+
+        Args:
+            writer (StreamWriter): The connection.
+            message (dict): The message.
+        """
+        if writer.is_closing():
+            return
+        writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def handle(self, request, writer):
+        """Carry out one request.
+
+        Args:
+            request (dict): The request.
+            writer (StreamWriter): The connection it came from, where replies go.
+        """
+        op = request.get('op')
+        reply = {'tag': request['tag']} if 'tag' in request else {}
+        if op == 'stats':
+            await self.send(writer, dict(reply, type='stats', sessions=len(self.sessions),
+                                         connections=len(self.clients), moves=self.moves))
+            return
+        if op == 'new':
+            computer = request.get('computer')
+            if computer is not None and (not isinstance(computer, str) or computer not in self.colors):
+                await self.send(writer, dict(reply, type='error', message=f"no color {computer!r}"))
+                return
+            if len(self.sessions) >= self.max_sessions:
+                await self.send(writer, dict(reply, type='error', message="the server is full"))
+                return
+            session = Session(self.next_id, writer, self.colors.get(computer))
+            self.sessions[session.id] = session
+            self.next_id += 1
+            await self.send(writer, dict(reply, **self.state(session)))
+            self.think(session)
+            return
+
+        # Only numbers name games; anything else from the client must not reach the lookup
+        game = request.get('game')
+        session = self.sessions.get(game) if isinstance(game, int) else None
+        if session is None or session.writer is not writer:
+            await self.send(writer, dict(reply, type='error', game=request.get('game'), message="no such game"))
+            return
+        session.touched = time.monotonic()
+        if op == 'state':
+            await self.send(writer, dict(reply, **self.state(session)))
+        elif op == 'close':
+            del self.sessions[session.id]
+            await self.send(writer, dict(reply, type='closed', game=session.id))
+        elif op == 'move':
+            game = session.game
+            try:
+                if session.result is not None:
+                    raise ValueError("the game is over")
+                if game.turn == session.computer or session.thinking:
+                    raise ValueError("it is not your turn")
+                move = self.notation.parse_move(str(request.get('move')), game.board.legal_moves(game.turn))
+                await self.apply(session, move, reply)
+            except ValueError as error:
+                await self.send(writer, dict(reply, type='error', game=session.id, message=str(error)))
+                return
+            self.think(session)
+        else:
+            await self.send(writer, dict(reply, type='error', game=session.id, message=f"unknown op {op!r}"))
+
+    def color_name(self, color):
+        """Get the name clients know a color by.
+
+        Args:
+            color (tuple): The color.
+
+        Returns:
+            str: ``'grey'`` or ``'white'``.
+        """
+        return 'grey' if color == self.c.GREY else 'white'
+
+    def legal(self, session):
+        """List the moves of the side to move.
+
+        Args:
+            session (Session): The game.
+
+        Returns:
+            list: The moves in PDN text, or none once the game is over.
+        """
+        if session.result is not None:
+            return []
+        game = session.game
+        return [self.notation.move_text(move) for move in game.board.legal_moves(game.turn)]
+
+    def state(self, session):
+        """Describe a game in full.
+
+        Args:
+            session (Session): The game.
+
+        Returns:
+            dict: A ``state`` message.
+        """
+        game = session.game
+        return {'type': 'state', 'game': session.id, 'fen': self.notation.to_fen(game.board, game.turn),
+                'turn': self.color_name(game.turn), 'ply': game.timeline.ply, 'legal': self.legal(session),
+                'result': session.result}
+
+    async def apply(self, session, move, reply=None):
+        """Play a move in a game and send the client what changed.
+
+        Args:
+            session (Session): The game.
+            move (tuple): The ``(start, end, captured)`` move, checked again as it is played.
+            reply (dict, optional): Fields to add to the delta, such as the request's tag.
+
+        Raises:
+            ValueError: If the move is not legal.
+        """
+        game = session.game
+        mover = game.turn
+        crowned = session.play(move)
+        self.moves += 1
+        # Decide whether the game is over before listing moves for the next side
+        reason = None
+        if game.winner() is not None:
+            session.result, reason = '1-0' if game.winner() == self.c.GREY else '0-1', 'no moves'
+        elif game.draw() is not None:
+            session.result, reason = '1/2-1/2', game.draw()
+        elif game.timeline.ply >= self.max_plies:
+            session.result, reason = '1/2-1/2', 'move limit'
+        delta = dict(reply or {}, type='delta', game=session.id, ply=game.timeline.ply,
+                     by=self.color_name(mover), move=self.notation.move_text(move),
+                     captured=[self.notation.numbers[square] for square in move[2]], crowned=crowned,
+                     turn=self.color_name(game.turn), legal=self.legal(session))
+        await self.send(session.writer, delta)
+        if reason is not None:
+            await self.send(session.writer, {'type': 'end', 'game': session.id, 'result': session.result,
+                                             'reason': reason})
+
+    def think(self, session):
+        """Start the server's move in a game, if it is the server's turn.
+
+        Args:
+            session (Session): The game.
+        """
+        if session.result is None and session.game.turn == session.computer and not session.thinking:
+            session.thinking = True
+            task = asyncio.get_running_loop().create_task(self.computer_move(session))
+            self.searches.add(task)
+            task.add_done_callback(self.searches.discard)
+
+    async def computer_move(self, session):
+        """Search the server's move in an engine process, then play it.
+
+        An engine process that dies breaks the whole pool, so the pool is
+        started again and the search tried once more. A search that still
+        fails ends the game, and the client is told why.
+
+        Args:
+            session (Session): The game.
+        """
+        game = session.game
+        board = game.board
+        args = (engine_move, self.engine, board.pack(), board.rows, board.cols, game.turn)
+        loop = asyncio.get_running_loop()
+        move, failure = None, None
+        try:
+            executor = self.executor
+            try:
+                move = await loop.run_in_executor(executor, *args)
+            except BrokenProcessPool:
+                self.restart_executor(executor)
+                move = await loop.run_in_executor(self.executor, *args)
+        except Exception as error:
+            failure = f"the engine failed: {error!r}"
+        finally:
+            session.thinking = False
+        # The client may have closed the game while the engine thought
+        if self.sessions.get(session.id) is not session:
+            return
+        if failure is not None:
+            session.result = '*'
+            await self.send(session.writer, {'type': 'error', 'game': session.id, 'message': failure})
+            await self.send(session.writer, {'type': 'end', 'game': session.id, 'result': session.result,
+                                             'reason': 'engine failure'})
+            return
+        await self.apply(session, move)
+
+    def restart_executor(self, broken):
+        """Replace a broken pool of engine processes with a new one.
+
+        Every game searching in the broken pool sees it fail; the first to
+        get here starts the new pool and the others just use it.
+
+        Args:
+            broken (ProcessPoolExecutor): The pool that failed.
+        """
+        if self.executor is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+
+def main(argv=None):
+    """Run a game server from the command line.
+
+    Args:
+        argv (list, optional): The arguments; defaults to sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Host checkers games over TCP, one JSON object per line.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-sessions', type=int, default=10000)
+    parser.add_argument('--max-plies', type=int, default=200)
+    parser.add_argument('--idle-timeout', type=float, default=300.0, help="seconds before an idle game is closed")
+    parser.add_argument('--engine', type=parse_engine, default=None, help="e.g. time_limit=0.05,tt_megabytes=4")
+    parser.add_argument('--workers', type=int, help="engine processes (default: one per core)")
+    args = parser.parse_args(argv)
+
+    server = GameServer(args.host, args.port, args.max_sessions, args.max_plies, args.idle_timeout, args.engine,
+                        args.workers)
+    print(f"serving on {args.host}:{args.port}", flush=True)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
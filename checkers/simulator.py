@@ -0,0 +1,261 @@
+import numpy as np
+from checkers.constants import Constants
+from checkers.bitboard import BitBoard
+
+
+ZERO = np.uint64(0)
+ONE = np.uint64(1)
+ALL = ~ZERO
+
+class BatchSimulator:
+    """Plays thousands of random games at once, all held in NumPy arrays.
+
+    Every game is three uint64 bitmasks (grey, white, kings) in the same
+    ghost-bit layout as BitBoard, plus the side to move. Each step generates
+    the options of every unfinished game with whole-array shifts, picks one
+    at random per game and applies it, captures and crowning included.
+
+    A capture sequence is played one jump per step: after a jump, the piece
+    that made it must jump again if it can, so multi-jumps are sampled one
+    jump at a time rather than as whole sequences. Captures are compulsory
+    and a man's move ends when it is crowned, as on the boards.
+    """
+
+    def __init__(self, rows=None, cols=None, seed=None):
+        """Initialize a simulator for one board size.
+
+        Args:
+            rows (int, optional): The number of rows. Defaults to Constants.ROWS.
+            cols (int, optional): The number of columns. Defaults to Constants.COLS.
+            seed (int, optional): Seeds the random moves, so runs can be repeated.
+
+        Raises:
+            ValueError: If the board's layout does not fit in 64 bits.
+        """
+        self.c = Constants()
+        layout = BitBoard(rows, cols)
+        self.rows, self.cols = layout.rows, layout.cols
+        if layout.valid.bit_length() > 64:
+            raise ValueError(f"a {self.rows}x{self.cols} board does not fit in 64-bit masks")
+        self.valid = np.uint64(layout.valid)
+        self.top = np.uint64(layout.top)
+        self.bottom = np.uint64(layout.bottom)
+        # The four diagonals as shift amounts; the first two lead up, towards row 0
+        self.shifts = np.array(layout.up + layout.down, dtype=np.int64)
+        self.distances = np.abs(self.shifts).astype(np.uint64)
+        self.rng = np.random.default_rng(seed)
+
+    @staticmethod
+    def lowest_bits(masks, n):
+        """Keep only the n-th lowest set bit of every mask.
+
+        Args:
+            masks (ndarray): uint64 bitmasks.
+            n (ndarray): Which set bit to keep in each mask, counting from 0.
+
+        Returns:
+            ndarray: Single-bit masks.
+        """
+        position = np.zeros(len(masks), dtype=np.uint64)
+        # Binary search for the highest position with at most n set bits below it
+        for step in (32, 16, 8, 4, 2, 1):
+            candidate = position + np.uint64(step)
+            below = np.bitwise_count(masks & ((ONE << candidate) - ONE))
+            position = np.where(below <= n, candidate, position)
+        return ONE << position
+
+    def jumps(self, up, down, opponent, empty):
+        """Find the pieces that can capture along each diagonal.
+
+        Args:
+            up (ndarray): The pieces of the side to move that may move up, in every game.
+            down (ndarray): The pieces of the side to move that may move down.
+            opponent (ndarray): The pieces of the other side.
+            empty (ndarray): The empty squares.
+
+        Returns:
+            list: For each diagonal, the pieces that can jump along it.
+        """
+        return [(up if amount < 0 else down) & self.back(opponent, amount) & self.back(empty, 2 * amount)
+                for amount in self.shifts]
+
+    @staticmethod
+    def movers(own, kings, side):
+        """Split a side's pieces by the directions they may move in.
+
+        Args:
+            own (ndarray): The pieces of the side to move, in every game.
+            kings (ndarray): The kings of both sides.
+            side (ndarray): All bits set where grey is to move, none where white is.
+
+        Returns:
+            tuple: The pieces that may move up and those that may move down;
+                men only move forwards, up for grey and down for white.
+        """
+        return own & (kings | side), own & (kings | ~side)
+
+    @staticmethod
+    def back(bits, amount):
+        """Shift bitmasks against a diagonal, onto the squares that lead to them.
+
+        Args:
+            bits (ndarray): uint64 bitmasks.
+            amount (int): The diagonal's shift; negative leads up, towards row 0.
+
+        Returns:
+            ndarray: The squares ``amount`` bits behind the given ones.
+        """
+        return bits << np.uint64(-amount) if amount < 0 else bits >> np.uint64(amount)
+
+    def options(self, grey, white, kings, side, jumper):
+        """Work out where every game's side to move can go.
+
+        Args:
+            grey (ndarray): The grey pieces of every game.
+            white (ndarray): The white pieces of every game.
+            kings (ndarray): The kings of every game.
+            side (ndarray): All bits set where grey is to move, none where white is.
+            jumper (ndarray): The piece that must keep jumping, or 0.
+
+        Returns:
+            tuple: ``(moves, capturing)``: for each diagonal, the pieces that can
+                move along it, and whether the moves are captures.
+        """
+        occupied = grey | white
+        empty = self.valid & ~occupied
+        own = (grey & side) | (white & ~side)
+        opponent = occupied & ~own
+        # In the middle of a multi-jump only the jumping piece may move
+        jumping = jumper != 0
+        if jumping.any():
+            own = np.where(jumping, jumper, own)
+        up, down = self.movers(own, kings, side)
+        jumps = self.jumps(up, down, opponent, empty)
+        capturing = (jumps[0] | jumps[1] | jumps[2] | jumps[3]) != 0
+        # Captures are compulsory, so steps only count where no piece can jump;
+        # a piece in the middle of a multi-jump can always jump again
+        quiet = np.where(capturing, ZERO, ALL)
+        moves = [jump | ((up if amount < 0 else down) & self.back(empty, amount) & quiet)
+                 for jump, amount in zip(jumps, self.shifts)]
+        return moves, capturing
+
+    def play(self, grey, white, kings, side, moves, capturing):
+        """Play one randomly chosen option in every game.
+
+        Args:
+            grey (ndarray): The grey pieces of every game.
+            white (ndarray): The white pieces of every game.
+            kings (ndarray): The kings of every game.
+            side (ndarray): All bits set where grey is to move, none where white is.
+            moves (list): The options, as returned by options; every game needs one.
+            capturing (ndarray): Whether the options are captures.
+
+        Returns:
+            tuple: The new grey, white and king masks and side to move, the piece
+                that must keep jumping (or 0), and whether each game's turn ended.
+        """
+        counts = [np.bitwise_count(m) for m in moves]
+        # Options before each diagonal's own, counting the diagonals in order
+        below1 = counts[0].astype(np.int64)
+        below2 = below1 + counts[1]
+        below3 = below2 + counts[2]
+        # Pick one option per game, uniformly: first the diagonal, then the piece
+        pick = (self.rng.random(len(grey)) * (below3 + counts[3])).astype(np.int64)
+        second, third, fourth = pick >= below1, pick >= below2, pick >= below3
+        chosen = np.where(fourth, moves[3], np.where(third, moves[2], np.where(second, moves[1], moves[0])))
+        skipped = np.where(fourth, below3, np.where(third, below2, np.where(second, below1, 0)))
+        start = self.lowest_bits(chosen, pick - skipped)
+
+        # Apply it: the piece steps one square along the diagonal, or two when it jumps
+        up = ~third
+        distance = np.where(fourth, self.distances[3], np.where(third, self.distances[2],
+                            np.where(second, self.distances[1], self.distances[0])))
+        near = np.where(up, start >> distance, start << distance)
+        far = np.where(up, near >> distance, near << distance)
+        end = np.where(capturing, far, near)
+        over = np.where(capturing, near, ZERO)
+
+        own = ((grey & side) | (white & ~side)) ^ (start | end)
+        opponent = ((grey & ~side) | (white & side)) & ~over
+        was_king = (kings & start) != 0
+        crowned = ~was_king & ((end & ((self.top & side) | (self.bottom & ~side))) != 0)
+        kings = (kings & ~(start | over)) | np.where(was_king | crowned, end, ZERO)
+        grey = (own & side) | (opponent & ~side)
+        white = (own & ~side) | (opponent & side)
+
+        # After a jump the same piece goes on jumping if it can, unless it was just crowned
+        jumper = np.where(capturing & ~crowned, end, ZERO)
+        going_on = np.flatnonzero(jumper)
+        if len(going_on):
+            empty = self.valid & ~(grey[going_on] | white[going_on])
+            up, down = self.movers(jumper[going_on], kings[going_on], side[going_on])
+            jumps = self.jumps(up, down, opponent[going_on], empty)
+            jumper[going_on] = np.where((jumps[0] | jumps[1] | jumps[2] | jumps[3]) != 0, jumper[going_on], ZERO)
+        turn_over = jumper == 0
+        side = side ^ np.where(turn_over, ALL, ZERO)
+        return grey, white, kings, side, jumper, turn_over
+
+    def encode(self, board):
+        """Get a board's position as the simulator's bitmasks.
+
+        Args:
+            board (Board): The position; any board engine of this size works.
+
+        Returns:
+            tuple: The grey, white and king bitmasks.
+        """
+        bitboard = BitBoard.unpack(board.pack(), self.rows, self.cols)
+        return bitboard.grey, bitboard.white, bitboard.kings
+
+    def playouts(self, board, color, games=10000, max_plies=300):
+        """Play random games from a position and count how they end.
+
+        Args:
+            board (Board): The position to start from; it is not modified.
+            color (tuple): The side to move.
+            games (int, optional): How many games to play. Defaults to 10000.
+            max_plies (int, optional): Games still going after this many plies are
+                counted as draws. Defaults to 300.
+
+        Returns:
+            dict: The number of ``grey`` wins, ``white`` wins and ``draws``, the
+                share of points grey scored (``grey_score``) and the average
+                length of the games in plies (``plies``).
+        """
+        g, w, k = self.encode(board)
+        grey = np.full(games, g, dtype=np.uint64)
+        white = np.full(games, w, dtype=np.uint64)
+        kings = np.full(games, k, dtype=np.uint64)
+        # All bits set while grey is to move, so choosing a side's pieces is a single AND
+        side = np.full(games, ALL if color == self.c.GREY else ZERO)
+        jumper = np.zeros(games, dtype=np.uint64)
+        plies = np.zeros(games, dtype=np.int64)
+        wins = {'grey': 0, 'white': 0, 'draws': 0}
+        total_plies = 0
+
+        while len(grey):
+            moves, capturing = self.options(grey, white, kings, side, jumper)
+            available = (moves[0] | moves[1] | moves[2] | moves[3]) != 0
+
+            # A side without a move has lost; a game that ran too long is drawn
+            stuck = ~available
+            drawn = ~stuck & (plies >= max_plies)
+            finished = stuck | drawn
+            if finished.any():
+                wins['grey'] += int(np.count_nonzero(stuck & (side == ZERO)))
+                wins['white'] += int(np.count_nonzero(stuck & (side != ZERO)))
+                wins['draws'] += int(np.count_nonzero(drawn))
+                total_plies += int(plies[finished].sum())
+                keep = ~finished
+                grey, white, kings, side, jumper, plies = (
+                    grey[keep], white[keep], kings[keep], side[keep], jumper[keep], plies[keep])
+                moves, capturing = [m[keep] for m in moves], capturing[keep]
+                if not len(grey):
+                    break
+
+            grey, white, kings, side, jumper, turn_over = self.play(grey, white, kings, side, moves, capturing)
+            plies += turn_over
+
+        wins['grey_score'] = (wins['grey'] + 0.5 * wins['draws']) / games if games else 0.5
+        wins['plies'] = total_plies / games if games else 0.0
+        return wins
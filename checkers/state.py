@@ -0,0 +1,162 @@
+from checkers.constants import Constants
+
+
+class GameState:
+    """Keeps track of how a game stands, updated move by move.
+
+    After every move it knows the number of legal moves of each side, how
+    many plies have passed without a capture or a man moving, and how often
+    each position has occurred, so whether the game is won or drawn is read
+    off in constant time instead of by looking the board over again.
+
+    Captures and moves of men can never be undone, so no position before
+    one can come back; the repetition counts are dropped at every such move,
+    which keeps them as small as the current run of king moves.
+    """
+
+    def __init__(self, board, turn=None, no_progress_limit=80, repetition_limit=3, keep_history=True):
+        """Start tracking a game from a position.
+
+        Args:
+            board (Board): The game's board; any board engine works.
+            turn (tuple, optional): The side to move. Defaults to grey.
+            no_progress_limit (int, optional): The game is drawn after this many plies
+                without a capture or a man moving. Defaults to 80.
+            repetition_limit (int, optional): The game is drawn when a position occurs
+                this many times. Defaults to 3.
+            keep_history (bool, optional): Keep what undo needs after every move. A game
+                that goes back by other means, such as a Timeline, turns it off so no
+                history piles up. Defaults to True.
+        """
+        self.c = Constants()
+        self.board = board
+        self.turn = turn or self.c.GREY
+        self.no_progress_limit = no_progress_limit
+        self.repetition_limit = repetition_limit
+        # Plies since the last capture or move of a man
+        self.quiet = 0
+        # {position key: occurrences} since the last capture or move of a man
+        self.repetitions = {}
+        # The number of legal moves of each side
+        self.mobility = {}
+        self.winner = None
+        # Why the game was drawn, ``'repetition'`` or ``'no progress'``, or None
+        self.draw = None
+        # What undo needs to restore, one entry per move, or None when undo is not wanted
+        self.history = [] if keep_history else None
+        self.settle()
+
+    @property
+    def over(self):
+        """Check whether the game has ended, won or drawn.
+
+        Returns:
+            bool: True once there is a winner or a draw.
+        """
+        return self.winner is not None or self.draw is not None
+
+    def material(self, color):
+        """Count one side's pieces.
+
+        Args:
+            color (tuple): The side.
+
+        Returns:
+            tuple: The number of pieces and how many of them are kings.
+        """
+        if color == self.c.GREY:
+            return self.board.grey_left, self.board.grey_kings
+        return self.board.white_left, self.board.white_kings
+
+    def opponent(self, color):
+        """Get the color of the other side.
+
+        Args:
+            color (tuple): A side's color.
+
+        Returns:
+            tuple: The other side's color.
+        """
+        return self.c.WHITE if color == self.c.GREY else self.c.GREY
+
+    def irreversible(self, move):
+        """Check whether a move can never be undone by later moves.
+
+        Args:
+            move (tuple): The ``(start, end, captured)`` move, not played yet.
+
+        Returns:
+            bool: True for a capture or a move of a man.
+        """
+        return bool(move[2]) or not self.board.find_piece(*move[0]).king
+
+    def play(self, move):
+        """Play a move on the board and update the state.
+
+        Args:
+            move (tuple): The ``(start, end, captured)`` move.
+        """
+        irreversible = self.irreversible(move)
+        self.advance(irreversible, self.board.make_move(move))
+
+    def record(self, irreversible):
+        """Update the state for a move already played on the board some other way.
+
+        Args:
+            irreversible (bool): Whether the move was a capture or a move of a man,
+                as told by irreversible before it was played.
+        """
+        self.advance(irreversible, None)
+
+    def advance(self, irreversible, token):
+        """Pass the turn and bring the counters up to date after a move.
+
+        Args:
+            irreversible (bool): Whether the move was a capture or a move of a man.
+            token (tuple): The board's undo token, or None if the board was moved by the caller.
+        """
+        if self.history is not None:
+            self.history.append((token, self.quiet, self.repetitions, self.mobility, self.winner, self.draw))
+        self.turn = self.opponent(self.turn)
+        if irreversible:
+            self.quiet = 0
+            self.repetitions = {}
+        else:
+            self.quiet += 1
+        self.settle()
+
+    def settle(self):
+        """Count the current position and decide whether it ends the game.
+        """
+        board = self.board
+        key = board.zobrist.position_key(board, self.turn)
+        self.repetitions[key] = self.repetitions.get(key, 0) + 1
+        self.mobility = {self.c.GREY: len(board.legal_moves(self.c.GREY)),
+                         self.c.WHITE: len(board.legal_moves(self.c.WHITE))}
+        self.winner, self.draw = None, None
+        # A side without a legal move, pieces or not, has lost
+        if not self.mobility[self.turn]:
+            self.winner = self.opponent(self.turn)
+        elif self.repetitions[key] >= self.repetition_limit:
+            self.draw = 'repetition'
+        elif self.quiet >= self.no_progress_limit:
+            self.draw = 'no progress'
+
+    def undo(self):
+        """Take back the last move, restoring the board if play made it.
+
+        A move given to record must be taken back on the board by the caller.
+
+        Raises:
+            ValueError: If the state was started without keep_history.
+        """
+        if self.history is None:
+            raise ValueError("the game state keeps no history to undo")
+        key = self.board.zobrist.position_key(self.board, self.turn)
+        self.repetitions[key] -= 1
+        if not self.repetitions[key]:
+            del self.repetitions[key]
+        token, self.quiet, self.repetitions, self.mobility, self.winner, self.draw = self.history.pop()
+        if token is not None:
+            self.board.unmake_move(token)
+        self.turn = self.opponent(self.turn)
@@ -0,0 +1,568 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from itertools import combinations
+from math import comb
+from checkers.constants import Constants
+from checkers.bitboard import BitBoard
+from checkers.geometry import Geometry
+
+
+class Tablebase:
+    """Perfect-play results for every position with few pieces, read from disk.
+
+    The positions are split into slices by material: the number of grey
+    men, grey kings, white men and white kings. Each slice is one file
+    holding, for both sides to move, a 2-bit result per position (win, draw,
+    loss or an index no position maps to), four to a byte. An optional
+    second file holds the distance to the end of the game in plies, one
+    byte per position, capped at 255.
+
+    A position's index within its slice is combinatorial: the grey men's
+    squares are ranked among the squares a grey man can stand on, then the
+    white men's among the squares left, then the grey kings', then the
+    white kings'. Squares are numbered in the order of Geometry.squares,
+    the same as ``Board.pack()``.
+
+    Files are opened with mmap, so every process probing the same tables
+    shares a single copy in the page cache.
+    """
+
+    # Results, as stored in the files; INVALID marks indices no legal position maps to
+    DRAW, WIN, LOSS, INVALID = 0, 1, 2, 3
+    MAGIC = b'CKTB'
+    # Magic, rows, columns, the four piece counts, two spare bytes and the positions per side
+    HEADER = struct.Struct('<4sBBBBBBxxI')
+
+    def __init__(self, directory, rows=None, cols=None):
+        """Initialize a tablebase reader; slices are opened when first probed.
+
+        Args:
+            directory (str): The folder holding the files.
+            rows (int, optional): The number of rows. Defaults to Constants.ROWS.
+            cols (int, optional): The number of columns. Defaults to Constants.COLS.
+        """
+        self.c = Constants()
+        self.directory = directory
+        self.rows = rows or self.c.ROWS
+        self.cols = cols or self.c.COLS
+        self.geometry = Geometry.for_size(self.rows, self.cols)
+        self.squares = len(self.geometry.squares)
+        self.half = self.cols // 2
+        # Open slices by material, as (wdl, dtw, count); None for a slice with no file
+        self.slices = {}
+        self.max_pieces = 0
+        prefix = f"{self.rows}x{self.cols}-"
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.startswith(prefix) and name.endswith('.wdl'):
+                    material = name[len(prefix):-len('.wdl')]
+                    if len(material) == 4 and material.isdigit():
+                        self.max_pieces = max(self.max_pieces, sum(map(int, material)))
+
+    def __getstate__(self):
+        """Pickle the reader without its open files; each process maps its own.
+        """
+        state = self.__dict__.copy()
+        state['slices'] = {}
+        return state
+
+    def close(self):
+        """Unmap every open slice.
+        """
+        for entry in self.slices.values():
+            if entry is not None:
+                entry[0].close()
+                if entry[1] is not None:
+                    entry[1].close()
+        self.slices = {}
+
+    def path(self, material, extension):
+        """Get the file name of a slice.
+
+        Args:
+            material (tuple): The numbers of grey men, grey kings, white men and white kings.
+            extension (str): ``'wdl'`` or ``'dtw'``.
+
+        Returns:
+            str: The path of the file.
+        """
+        return os.path.join(self.directory, f"{self.rows}x{self.cols}-{''.join(map(str, material))}.{extension}")
+
+    def size(self, material):
+        """Count the indices of a slice, for one side to move.
+
+        Args:
+            material (tuple): The numbers of grey men, grey kings, white men and white kings.
+
+        Returns:
+            int: The number of indices.
+        """
+        gm, gk, wm, wk = material
+        n = self.squares
+        return comb(n - self.half, gm) * comb(n - gm, wm) * comb(n - gm - wm, gk) * comb(n - gm - wm - gk, wk)
+
+    @staticmethod
+    def rank(squares, occupied):
+        """Rank a set of squares among the squares not already taken.
+
+        Args:
+            squares (list): The squares of one group of pieces, in increasing order.
+            occupied (list): The squares taken by the groups placed before, in increasing order.
+
+        Returns:
+            int: The colexicographic rank of the set.
+        """
+        return sum(comb(s - bisect_left(occupied, s), i + 1) for i, s in enumerate(squares))
+
+    def index(self, material, grey_men, grey_kings, white_men, white_kings):
+        """Work out a position's index within its slice.
+
+        Args:
+            material (tuple): The numbers of grey men, grey kings, white men and white kings.
+            grey_men (list): The squares of the grey men, in increasing order; likewise for
+                ``grey_kings``, ``white_men`` and ``white_kings``.
+
+        Returns:
+            int: The index.
+        """
+        gm, gk, wm, wk = material
+        n = self.squares
+        men = sorted(grey_men + white_men)
+        placed = sorted(men + grey_kings)
+        index = sum(comb(s - self.half, i + 1) for i, s in enumerate(grey_men))
+        index = index * comb(n - gm, wm) + self.rank(white_men, grey_men)
+        index = index * comb(n - gm - wm, gk) + self.rank(grey_kings, men)
+        return index * comb(n - gm - wm - gk, wk) + self.rank(white_kings, placed)
+
+    def split(self, grey, white, kings):
+        """Sort a position's pieces into the four groups of the index.
+
+        Args:
+            grey (int): The grey pieces, one bit per square in Geometry.squares order;
+                likewise for ``white`` and ``kings``.
+
+        Returns:
+            tuple: The material and the four lists of squares.
+        """
+        groups = ([], [], [], [])
+        for i in range(self.squares):
+            bit = 1 << i
+            if grey & bit:
+                groups[1 if kings & bit else 0].append(i)
+            elif white & bit:
+                groups[3 if kings & bit else 2].append(i)
+        return tuple(len(group) for group in groups), groups
+
+    def load(self, material):
+        """Map a slice's files, the first time the slice is needed.
+
+        Args:
+            material (tuple): The numbers of grey men, grey kings, white men and white kings.
+
+        Returns:
+            tuple: ``(wdl, dtw, count)``, with ``dtw`` None when there is no distance file,
+                or None if the slice is not on disk.
+
+        Raises:
+            ValueError: If a file is not a tablebase of this board size and material.
+        """
+        if material in self.slices:
+            return self.slices[material]
+        entry = None
+        if os.path.exists(self.path(material, 'wdl')):
+            maps = []
+            for extension in ('wdl', 'dtw'):
+                path = self.path(material, extension)
+                if not os.path.exists(path):
+                    maps.append(None)
+                    continue
+                with open(path, 'rb') as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, rows, cols, *counts, count = self.HEADER.unpack_from(data)
+                if magic != self.MAGIC or (rows, cols) != (self.rows, self.cols) or tuple(counts) != material:
+                    data.close()
+                    raise ValueError(f"{path} is not a tablebase for this slice")
+                maps.append(data)
+            entry = (maps[0], maps[1], count)
+        self.slices[material] = entry
+        return entry
+
+    def probe_masks(self, grey, white, kings, grey_to_move):
+        """Look up a position given as packed bitmasks.
+
+        Args:
+            grey (int): The grey pieces, one bit per square in Geometry.squares order;
+                likewise for ``white`` and ``kings``.
+            grey_to_move (bool): Whether grey is to move.
+
+        Returns:
+            tuple: The result for the side to move (WIN, DRAW or LOSS) and the plies
+                to the end of the game (None without a distance file), or None if the
+                position is not in the tablebase.
+        """
+        own, other = (grey, white) if grey_to_move else (white, grey)
+        if not own:
+            return self.LOSS, 0
+        if not other:
+            return self.WIN, 0
+        material, groups = self.split(grey, white, kings)
+        if sum(material) > self.max_pieces:
+            return None
+        entry = self.load(material)
+        if entry is None:
+            return None
+        wdl, dtw, count = entry
+        index = self.index(material, *groups)
+        # White-to-move results follow the grey ones, each side padded to whole bytes
+        offset = 0 if grey_to_move else (count + 3) // 4
+        result = wdl[self.HEADER.size + offset + index // 4] >> (2 * (index % 4)) & 3
+        if result == self.INVALID:
+            return None
+        distance = None
+        if dtw is not None:
+            distance = dtw[self.HEADER.size + (0 if grey_to_move else count) + index]
+        return result, distance
+
+    def probe(self, board, color):
+        """Look up a board's position.
+
+        Args:
+            board (Board): The position; any board engine of this size works.
+            color (tuple): The side to move.
+
+        Returns:
+            tuple: The result for the side to move and the plies to the end of the
+                game, as returned by probe_masks, or None if it is not in the tablebase.
+        """
+        data = board.pack()
+        size = self.geometry.mask_bytes
+        grey, white, kings = (int.from_bytes(data[i:i + size], 'little') for i in range(0, 3 * size, size))
+        if bin(grey | white).count('1') > self.max_pieces:
+            return None
+        return self.probe_masks(grey, white, kings, color == self.c.GREY)
+
+    def best_move(self, board, color):
+        """Pick the move that keeps the best result: the fastest win, else a draw, else the slowest loss.
+
+        Args:
+            board (Board): The position; it is left as it was.
+            color (tuple): The side to move.
+
+        Returns:
+            tuple: The move, the result for the side to move and the plies to the end
+                of the game, or None if the position or one of its successors is
+                not in the tablebase, or there is no move.
+        """
+        opponent = self.c.WHITE if color == self.c.GREY else self.c.GREY
+        best, best_key = None, None
+        for move in board.legal_moves(color):
+            token = board.make_move(move)
+            entry = self.probe(board, opponent)
+            board.unmake_move(token)
+            if entry is None:
+                return None
+            result, distance = entry
+            distance = distance or 0
+            # Our result is the opposite of the opponent's; wins are ranked shortest first, losses longest
+            if result == self.LOSS:
+                key, ours = (2, -distance), (self.WIN, distance + 1)
+            elif result == self.DRAW:
+                key, ours = (1, 0), (self.DRAW, 0)
+            else:
+                key, ours = (0, distance), (self.LOSS, distance + 1)
+            if best_key is None or key > best_key:
+                best, best_key = (move,) + ours, key
+        return best
+
+
+class TablebaseGenerator:
+    """Builds tablebases by retrograde analysis.
+
+    Slices are solved from the fewest pieces up, and among slices with the
+    same number of pieces from the fewest men up, so every capture and every
+    crowning leads into a slice that is already solved. Within a slice the
+    moves are generated once, both sides to move together; then the results
+    spread backwards from the positions already decided, closest to the end
+    of the game first, so every distance is exact. Positions never decided
+    are draws.
+    """
+
+    def __init__(self, pieces=3, rows=None, cols=None):
+        """Initialize a generator.
+
+        Args:
+            pieces (int, optional): The most pieces, both sides together, to solve. Defaults to 3.
+            rows (int, optional): The number of rows. Defaults to Constants.ROWS.
+            cols (int, optional): The number of columns. Defaults to Constants.COLS.
+        """
+        self.c = Constants()
+        self.pieces = pieces
+        self.mover = BitBoard(rows, cols)
+        self.mover.clear()
+        self.table = Tablebase('', self.mover.rows, self.mover.cols)
+        squares = self.mover.geometry.squares
+        # Each square's bit on the BitBoard used for move generation, and back
+        self.bits = [self.mover.bit_of[square] for square in squares]
+        self.square_index = {bit: i for i, bit in enumerate(self.bits)}
+        # Solved slices by material: the results and distances of both sides to move
+        self.solved = {}
+
+    def materials(self):
+        """List the slices to solve, in an order where every slice's successors come first.
+
+        Returns:
+            list: ``(grey men, grey kings, white men, white kings)`` tuples.
+        """
+        found = []
+        for total in range(2, self.pieces + 1):
+            for gm in range(total + 1):
+                for gk in range(total + 1 - gm):
+                    for wm in range(total + 1 - gm - gk):
+                        wk = total - gm - gk - wm
+                        if gm + gk and wm + wk:
+                            found.append((gm, gk, wm, wk))
+        return sorted(found, key=lambda material: (sum(material), material[0] + material[2]))
+
+    def positions(self, material):
+        """List every legal placement of a slice's pieces.
+
+        Yields:
+            tuple: The four lists of squares, grey men, grey kings, white men and white kings.
+        """
+        gm, gk, wm, wk = material
+        n = self.table.squares
+        half = self.table.half
+        # Men never stand on the row where they would be crowned
+        for grey_men in combinations(range(half, n), gm):
+            for white_men in combinations([s for s in range(n - half) if s not in grey_men], wm):
+                men = set(grey_men) | set(white_men)
+                free = [s for s in range(n) if s not in men]
+                for grey_kings in combinations(free, gk):
+                    rest = [s for s in free if s not in grey_kings]
+                    for white_kings in combinations(rest, wk):
+                        yield list(grey_men), list(grey_kings), list(white_men), list(white_kings)
+
+    def lookup(self, grey, white, kings, grey_to_move):
+        """Get the solved result of a position in an earlier slice.
+
+        Args:
+            grey (int): The grey pieces as BitBoard bits; likewise for ``white`` and ``kings``.
+            grey_to_move (bool): Whether grey is to move.
+
+        Returns:
+            tuple: The result for the side to move and the plies to the end of the game.
+        """
+        if not (grey if grey_to_move else white):
+            return Tablebase.LOSS, 0
+        groups = self.groups(grey, white, kings)
+        material = tuple(len(group) for group in groups)
+        results, distances, count = self.solved[material]
+        index = self.table.index(material, *groups) + (0 if grey_to_move else count)
+        return results[index], distances[index]
+
+    def solve(self, material):
+        """Solve one slice.
+
+        Args:
+            material (tuple): The numbers of grey men, grey kings, white men and white kings.
+
+        Returns:
+            tuple: The results and distances of every index, grey to move first, and
+                the number of indices per side.
+        """
+        count = self.table.size(material)
+        results = bytearray([Tablebase.INVALID]) * (2 * count)
+        distances = array('H', bytes(4 * count))
+        # Per position: successors in this slice still undecided, the longest distance of a
+        # successor won by the opponent, and whether some successor is a draw or a loss for them
+        pending = array('l', bytes(16 * count))
+        longest = array('H', bytes(4 * count))
+        escapes = bytearray(2 * count)
+        edges = []
+        buckets = [[]]
+
+        def push(position, distance):
+            while len(buckets) <= distance:
+                buckets.append([])
+            buckets[distance].append(position)
+
+        mover = self.mover
+        colors = (self.c.GREY, self.c.WHITE)
+        wins = {}
+        for groups in self.positions(material):
+            index = self.table.index(material, *groups)
+            grey = sum(self.bits[s] for s in groups[0] + groups[1])
+            white = sum(self.bits[s] for s in groups[2] + groups[3])
+            kings = sum(self.bits[s] for s in groups[1] + groups[3])
+            mover.grey, mover.white, mover.kings = grey, white, kings
+            for side in (0, 1):
+                position = side * count + index
+                results[position] = Tablebase.DRAW
+                grey_to_move = side == 0
+                crown = mover.top if grey_to_move else mover.bottom
+                fastest = None
+                moved = False
+                for start, end, captured in mover.generate_moves(colors[side]):
+                    moved = True
+                    own, other = (grey, white) if grey_to_move else (white, grey)
+                    own ^= start | end
+                    was_king = kings & start
+                    new_kings = kings ^ (start | end) if was_king else kings
+                    crowned = end & crown and not was_king
+                    if crowned:
+                        new_kings |= end
+                    for bit in captured:
+                        other &= ~bit
+                        new_kings &= ~bit
+                    new_grey, new_white = (own, other) if grey_to_move else (other, own)
+                    if not captured and not crowned:
+                        # A quiet move that crowns nobody stays in this slice
+                        successor = (1 - side) * count + self.table.index(
+                            material, *self.groups(new_grey, new_white, new_kings))
+                        edges.append((successor, position))
+                        pending[position] += 1
+                        continue
+                    result, distance = self.lookup(new_grey, new_white, new_kings, not grey_to_move)
+                    if result == Tablebase.LOSS:
+                        fastest = distance if fastest is None else min(fastest, distance)
+                    elif result == Tablebase.WIN:
+                        longest[position] = max(longest[position], distance)
+                    else:
+                        escapes[position] = 1
+                if fastest is not None:
+                    wins[position] = fastest + 1
+                    push(position, fastest + 1)
+                elif not pending[position] and not escapes[position]:
+                    # Every move leads to a position the opponent wins, or there is no move at all
+                    results[position] = Tablebase.LOSS
+                    push(position, longest[position] + 1 if moved else 0)
+
+        # The in-slice moves, turned around: for every position, the positions that lead to it
+        edges.sort()
+        first = array('l', bytes(8 * (2 * count + 1)))
+        for successor, _ in edges:
+            first[successor + 1] += 1
+        for i in range(2 * count):
+            first[i + 1] += first[i]
+        parents = array('l', (position for _, position in edges))
+        del edges
+
+        # Decide positions in order of distance, like a breadth-first search from the ends of the game
+        done = bytearray(2 * count)
+        distance = 0
+        while distance < len(buckets):
+            for position in buckets[distance]:
+                if done[position]:
+                    continue
+                done[position] = 1
+                if results[position] != Tablebase.LOSS:
+                    results[position] = Tablebase.WIN
+                distances[position] = distance
+                lost = results[position] == Tablebase.LOSS
+                for i in range(first[position], first[position + 1]):
+                    parent = parents[i]
+                    if done[parent]:
+                        continue
+                    if lost:
+                        # The parent can move here and win
+                        if wins.get(parent, distance + 2) > distance + 1:
+                            wins[parent] = distance + 1
+                            push(parent, distance + 1)
+                    else:
+                        pending[parent] -= 1
+                        longest[parent] = max(longest[parent], distance)
+                        if not pending[parent] and not escapes[parent] and parent not in wins:
+                            results[parent] = Tablebase.LOSS
+                            push(parent, longest[parent] + 1)
+            buckets[distance] = None
+            distance += 1
+        return results, distances, count
+
+    def groups(self, grey, white, kings):
+        """Sort a position given as BitBoard bits into the four groups of the index.
+
+        Args:
+            grey (int): The grey pieces as BitBoard bits; likewise for ``white`` and ``kings``.
+
+        Returns:
+            tuple: The squares of the grey men, grey kings, white men and white kings,
+                each in increasing order.
+        """
+        groups = ([], [], [], [])
+        for bits, group in ((grey & ~kings, 0), (grey & kings, 1), (white & ~kings, 2), (white & kings, 3)):
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                groups[group].append(self.square_index[bit])
+        for group in groups:
+            group.sort()
+        return groups
+
+    def generate(self, directory, dtw=True):
+        """Solve every slice and write it to disk.
+
+        Args:
+            directory (str): The folder to write the files to; it is created if needed.
+            dtw (bool, optional): Also write the distances to the end of the game. Defaults to True.
+
+        Yields:
+            tuple: The material of every slice written and the number of positions in it.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.table.directory = directory
+        for material in self.materials():
+            self.solved[material] = results, distances, count = self.solve(material)
+            header = Tablebase.HEADER.pack(Tablebase.MAGIC, self.table.rows, self.table.cols, *material, count)
+            with open(self.table.path(material, 'wdl'), 'wb') as f:
+                f.write(header)
+                for side in (0, 1):
+                    f.write(self.pack(results[side * count:(side + 1) * count]))
+            if dtw:
+                with open(self.table.path(material, 'dtw'), 'wb') as f:
+                    f.write(header)
+                    f.write(bytes(min(distance, 255) for distance in distances))
+            yield material, count
+
+    @staticmethod
+    def pack(results):
+        """Pack results four to a byte, the first in the lowest two bits.
+
+        Args:
+            results (bytes): One result per position.
+
+        Returns:
+            bytes: The packed results, padded with INVALID to a whole byte.
+        """
+        padded = bytes(results) + bytes([Tablebase.INVALID]) * (-len(results) % 4)
+        return bytes(padded[i] | padded[i + 1] << 2 | padded[i + 2] << 4 | padded[i + 3] << 6
+                     for i in range(0, len(padded), 4))
+
+
+def main(argv=None):
+    """Generate tablebases from the command line.
+
+    Args:
+        argv (list, optional): The arguments; defaults to sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Solve every endgame with a few pieces.")
+    parser.add_argument('--pieces', type=int, default=3, help="most pieces on the board (default: 3)")
+    parser.add_argument('--output', default='tablebase', help="folder to write to (default: tablebase)")
+    parser.add_argument('--no-dtw', action='store_true', help="only write win/draw/loss results")
+    parser.add_argument('--rows', type=int)
+    parser.add_argument('--cols', type=int)
+    args = parser.parse_args(argv)
+
+    generator = TablebaseGenerator(args.pieces, args.rows, args.cols)
+    started = time.perf_counter()
+    for material, count in generator.generate(args.output, not args.no_dtw):
+        print(f"{''.join(map(str, material))}: {count} positions per side, "
+              f"{time.perf_counter() - started:.1f}s", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+from array import array
+from checkers.constants import Constants
+from checkers.bitboard import BitBoard
+from checkers.book import encode_move, decode_move
+from checkers.state import GameState
+
+
+class Line:
+    """One line of play in a timeline: a run of moves from a fork onwards.
+
+    The moves are kept two bytes each, packed as in a MoveLog, with one
+    byte per move telling whether it was a capture or a man moving, and a
+    packed position every few plies to start replays from.
+    """
+
+    __slots__ = ('parent', 'start', 'moves', 'resets', 'snapshots', 'children')
+
+    def __init__(self, parent, start):
+        """Initialize an empty line.
+
+        Args:
+            parent (Line): The line it branches off, or None for the main line.
+            start (int): The ply it branches off at; the position there is the parent's.
+        """
+        self.parent = parent
+        self.start = start
+        self.moves = array('H')
+        self.resets = bytearray()
+        # {ply: packed position} for the plies this line played a move from
+        self.snapshots = {}
+        self.children = []
+
+    @property
+    def end(self):
+        """Get the ply after the line's last move.
+
+        Returns:
+            int: The ply of the line's last position.
+        """
+        return self.start + len(self.moves)
+
+
+class Timeline:
+    """The history of a game, with undo, redo, jumps and side variations.
+
+    Every move is recorded as it is played. Going back and playing another
+    move forks a new line, so variations can be explored without losing
+    the game; playing a move that was played before follows its line again.
+
+    No board is ever copied: a position is rebuilt from the nearest packed
+    snapshot, taken every ``interval`` plies, by replaying at most that many
+    moves, so the history costs a few bytes per ply and any position of a
+    long game is back in well under a millisecond on a BitBoard. Once moves
+    is asked for, the moves of the path being followed are kept readable too.
+    """
+
+    INTERVAL = 16
+
+    def __init__(self, board, turn=None, interval=INTERVAL):
+        """Start a timeline at a position.
+
+        Args:
+            board (Board): The starting position; any board engine works, and
+                positions are rebuilt on the same kind of board.
+            turn (tuple, optional): The side to move first. Defaults to grey.
+            interval (int, optional): The plies between snapshots. Defaults to 16.
+        """
+        self.c = Constants()
+        self.board_class = type(board)
+        self.rows, self.cols = board.rows, board.cols
+        self.geometry = board.geometry
+        self.first = turn or self.c.GREY
+        self.interval = interval
+        self.root = Line(None, 0)
+        self.root.snapshots[0] = board.pack()
+        # The line being followed and the ply on it
+        self.line = self.root
+        self.ply = 0
+        # The moves of the current path as far as moves has read them, kept across
+        # undo, redo and jumps, and cut back only when the path itself changes
+        self.played = []
+
+    def chain(self):
+        """List the current line and the lines it branches off.
+
+        Returns:
+            list: The lines, the current one first and the main line last.
+        """
+        lines = []
+        line = self.line
+        while line is not None:
+            lines.append(line)
+            line = line.parent
+        return lines
+
+    def owner(self, ply, chain=None):
+        """Find the line that holds the move played from a ply of the current path.
+
+        Args:
+            ply (int): The ply.
+            chain (list, optional): The chain, if already at hand.
+
+        Returns:
+            Line: The line.
+        """
+        for line in chain or self.chain():
+            if line.start <= ply:
+                return line
+        return self.root
+
+    def turn_at(self, ply):
+        """Get the side to move at a ply.
+
+        Args:
+            ply (int): The ply.
+
+        Returns:
+            tuple: The color to move.
+        """
+        if ply % 2 == 0:
+            return self.first
+        return self.c.WHITE if self.first == self.c.GREY else self.c.GREY
+
+    @property
+    def length(self):
+        """Get the number of plies on the current path, including those undone.
+
+        Returns:
+            int: The last ply redo can reach.
+        """
+        return self.line.end
+
+    def branches(self, ply):
+        """List the lines that go on from a ply of the current path, the current one included.
+
+        Args:
+            ply (int): The ply.
+
+        Returns:
+            list: The lines with a move from that position.
+        """
+        found = []
+        line = self.owner(ply)
+        while line is not None:
+            if line.start <= ply < line.end and line not in found:
+                found.append(line)
+            found.extend(child for child in line.children
+                         if child.start == ply and child.moves and child not in found)
+            # A line that starts here shares this position with the line it branches off
+            if line.start < ply:
+                break
+            line = line.parent
+        return found
+
+    def record(self, board, move, irreversible):
+        """Record a move played from the current position.
+
+        Args:
+            board (Board): The position before the move.
+            move (tuple): The ``(start, end, captured)`` move.
+            irreversible (bool): Whether it is a capture or a man moving.
+
+        Raises:
+            ValueError: If the move cannot be packed, being one of more than 16
+                jumps between the same two squares.
+        """
+        squares, alternative = encode_move(self.geometry, move, board.legal_moves(self.turn_at(self.ply)))
+        if alternative > 15:
+            raise ValueError(f"move {move} has too many alternatives to record")
+        value = (squares >> 8) << 10 | (squares & 0xFF) << 4 | alternative
+        if self.ply < self.line.end:
+            # A move already played from here is followed rather than recorded again
+            for line in self.branches(self.ply):
+                if line.moves[self.ply - line.start] == value:
+                    if line is not self.owner(self.ply):
+                        self.switch(line)
+                    self.ply += 1
+                    return
+            fork = Line(self.owner(self.ply), self.ply)
+            fork.parent.children.append(fork)
+            self.switch(fork)
+        if self.ply % self.interval == 0:
+            self.line.snapshots[self.ply] = board.pack()
+        self.line.moves.append(value)
+        self.line.resets.append(irreversible)
+        self.ply += 1
+
+    def undo(self):
+        """Step back one ply.
+
+        Returns:
+            bool: False if already at the start.
+        """
+        if self.ply == 0:
+            return False
+        self.ply -= 1
+        return True
+
+    def redo(self):
+        """Step forward one ply along the current line.
+
+        Returns:
+            bool: False if already at its end.
+        """
+        if self.ply >= self.line.end:
+            return False
+        self.ply += 1
+        return True
+
+    def jump(self, ply):
+        """Go to any ply of the current path.
+
+        Args:
+            ply (int): The ply; it is clamped to the path.
+        """
+        self.ply = max(0, min(ply, self.line.end))
+
+    def switch(self, line):
+        """Follow another line from the current ply.
+
+        Args:
+            line (Line): One of the lines listed by branches for the current ply.
+        """
+        self.line = line
+        # The lines share the path up to here; the moves after it are the new line's
+        del self.played[self.ply:]
+
+    def decode(self, board, turn, ply, chain):
+        """Read the move played from a ply of the current path.
+
+        Args:
+            board (Board): The position at that ply.
+            turn (tuple): The side to move.
+            ply (int): The ply.
+            chain (list): The current chain.
+
+        Returns:
+            tuple: The ``(start, end, captured)`` move.
+        """
+        line = self.owner(ply, chain)
+        value = line.moves[ply - line.start]
+        return decode_move(self.geometry, (value >> 10) << 8 | (value >> 4) & 0x3F, value & 0xF,
+                           board.legal_moves(turn))
+
+    def position(self, ply, chain, board_class=None):
+        """Rebuild the bare board at a ply of the current path from the nearest snapshot.
+
+        Args:
+            ply (int): The ply.
+            chain (list): The current chain.
+            board_class (type, optional): The board engine to rebuild on. Defaults to the game's.
+
+        Returns:
+            Board: A new board.
+        """
+        start = ply - ply % self.interval
+        while self.owner(start, chain).snapshots.get(start) is None:
+            start -= self.interval
+        board = (board_class or self.board_class).unpack(self.owner(start, chain).snapshots[start],
+                                                         self.rows, self.cols)
+        for i in range(start, ply):
+            board.make_move(self.decode(board, self.turn_at(i), i, chain))
+        return board
+
+    def restore(self, ply=None, **rules):
+        """Rebuild a position of the current path, with its game state.
+
+        Only the moves since the last capture or man move matter to the game
+        state, so the state is started there and the moves before it are
+        replayed on the bare board from the nearest snapshot.
+
+        Args:
+            ply (int, optional): The ply. Defaults to the current one.
+            **rules: Passed on to GameState, such as no_progress_limit.
+
+        Returns:
+            tuple: A new board and the GameState tracking it.
+        """
+        ply = self.ply if ply is None else ply
+        chain = self.chain()
+        base = ply
+        while base > 0:
+            line = self.owner(base - 1, chain)
+            if line.resets[base - 1 - line.start]:
+                break
+            base -= 1
+        board = self.position(base, chain)
+        state = GameState(board, self.turn_at(base), **rules)
+        for i in range(base, ply):
+            state.play(self.decode(board, state.turn, i, chain))
+        return board, state
+
+    def moves(self, ply=None):
+        """List the moves of the current path.
+
+        The moves read before are kept, so only the moves played or reached
+        since the last call are decoded, from the nearest snapshot. Nothing is
+        kept for a game whose moves are never asked for.
+
+        Args:
+            ply (int, optional): Where to stop. Defaults to the current ply.
+
+        Returns:
+            list: The ``(start, end, captured)`` moves from the start.
+        """
+        ply = self.ply if ply is None else min(ply, self.line.end)
+        if len(self.played) < ply:
+            chain = self.chain()
+            # Only the moves are wanted, so the quickest board engine replays them
+            board = self.position(len(self.played), chain, BitBoard)
+            for i in range(len(self.played), ply):
+                self.played.append(self.decode(board, self.turn_at(i), i, chain))
+                board.make_move(self.played[-1])
+        return self.played[:ply]
@@ -0,0 +1,321 @@
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from checkers.constants import Constants
+from checkers.board import Board
+from checkers.bitboard import BitBoard
+from checkers.engine import Engine
+from checkers.mcts import MCTS
+from checkers.state import GameState
+
+
+# Board engines that games can be played on, by command-line name
+BACKENDS = {'board': Board, 'bitboard': BitBoard}
+# Kinds of player, chosen by the ``engine`` key of a configuration
+PLAYERS = {'alphabeta': Engine, 'mcts': MCTS}
+
+
+def make_player(config):
+    """Build a player from its configuration.
+
+    Args:
+        config (dict): Keyword arguments for the player, plus an optional ``engine``
+            key naming its kind, ``'alphabeta'`` (the default) or ``'mcts'``.
+
+    Returns:
+        Engine: The player; an MCTS searches the same way as an Engine.
+    """
+    settings = dict(config)
+    return PLAYERS[settings.pop('engine', 'alphabeta')](**settings)
+
+
+def play_game(index, engine_a, engine_b, a_is_grey, opening_seed, opening_plies=4, max_plies=200,
+              adjudicate_margin=400, adjudicate_plies=8, no_progress_plies=80, backend='board'):
+    """Play one headless game between two engine configurations.
+
+    This runs in a worker process, so it only takes and returns plain values.
+
+    Args:
+        index (int): The number of the game in the tournament.
+        engine_a (dict): The first player's configuration, as taken by make_player.
+        engine_b (dict): The second player's configuration.
+        a_is_grey (bool): Whether the first engine plays grey, which moves first.
+        opening_seed (int): Seeds the random opening moves; both games of a pair use the same one.
+        opening_plies (int, optional): How many random plies to play before the engines take over.
+        max_plies (int, optional): The game is a draw once this many plies have been played.
+        adjudicate_margin (int, optional): A lead, in the engine's score units, that wins the
+            game once it has lasted ``adjudicate_plies`` plies in a row. 0 turns this off.
+        adjudicate_plies (int, optional): How long the lead has to last.
+        no_progress_plies (int, optional): The game is a draw after this many plies without a
+            capture or a man moving. A position occurring three times is a draw as well.
+        backend (str, optional): The board engine to play on, ``'board'`` or ``'bitboard'``.
+
+    Returns:
+        dict: The game number, whether A played grey, A's score (1, 0.5 or 0),
+            the number of plies played, the reason the game ended, the CPU
+            seconds each player spent thinking and the moves played.
+    """
+    c = Constants()
+    board = BACKENDS[backend]()
+    engines = {c.GREY: make_player(engine_a), c.WHITE: make_player(engine_b)}
+    if not a_is_grey:
+        engines = {c.GREY: engines[c.WHITE], c.WHITE: engines[c.GREY]}
+    a_color = c.GREY if a_is_grey else c.WHITE
+    judge = engines[c.GREY]
+
+    # Wins, draws by repetition and the no-progress count are kept up to date move by move
+    state = GameState(board, c.GREY, no_progress_plies)
+    # Random openings keep deterministic engines from replaying the same game
+    generator = random.Random(opening_seed)
+    plies = 0
+    played = []
+    for _ in range(opening_plies):
+        if state.over:
+            break
+        played.append(generator.choice(board.legal_moves(state.turn)))
+        state.play(played[-1])
+        plies += 1
+
+    winner, reason = None, None
+    # Thinking time per side, times the processes each player searches with
+    cpu = {c.GREY: 0.0, c.WHITE: 0.0}
+    leader, lead = None, 0
+    while True:
+        turn = state.turn
+        if state.winner is not None:
+            winner, reason = state.winner, 'no moves'
+            break
+        if plies >= max_plies:
+            reason = 'move limit'
+            break
+        if state.draw is not None:
+            reason = state.draw
+            break
+        # Stop playing out a game that one side has clearly won
+        if adjudicate_margin:
+            score = judge.evaluate(board, c.GREY)
+            if score >= adjudicate_margin:
+                ahead = c.GREY
+            elif score <= -adjudicate_margin:
+                ahead = c.WHITE
+            else:
+                ahead = None
+            lead = lead + 1 if ahead == leader else 1
+            leader = ahead
+            if leader is not None and lead >= adjudicate_plies:
+                winner, reason = leader, 'adjudication'
+                break
+
+        result = engines[turn].search(board, turn)
+        cpu[turn] += result.elapsed * getattr(engines[turn], 'workers', 1)
+        played.append(result.move)
+        state.play(result.move)
+        plies += 1
+
+    for engine in engines.values():
+        if hasattr(engine, 'close'):
+            engine.close()
+    score = 0.5 if winner is None else 1.0 if winner == a_color else 0.0
+    return {'game': index, 'a_is_grey': a_is_grey, 'score': score, 'plies': plies, 'reason': reason,
+            'a_cpu': cpu[a_color], 'b_cpu': cpu[judge.opponent(a_color)], 'moves': played}
+
+
+class TournamentStats:
+    def __init__(self):
+        """Initialize empty win, draw and loss counts, from the first engine's side.
+        """
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        # CPU seconds each engine spent thinking, to compare strength per CPU-second
+        self.a_cpu = 0.0
+        self.b_cpu = 0.0
+
+    @property
+    def games(self):
+        """Get the number of games counted.
+
+        Returns:
+            int: The number of games.
+        """
+        return self.wins + self.draws + self.losses
+
+    @property
+    def score(self):
+        """Get the first engine's average score.
+
+        Returns:
+            float: Points per game, a draw counting half.
+        """
+        return (self.wins + 0.5 * self.draws) / self.games if self.games else 0.5
+
+    def add(self, score, a_cpu=0.0, b_cpu=0.0):
+        """Count one finished game.
+
+        Args:
+            score (float): The first engine's score: 1, 0.5 or 0.
+            a_cpu (float, optional): The CPU seconds the first engine spent thinking.
+            b_cpu (float, optional): The CPU seconds the second engine spent thinking.
+        """
+        self.a_cpu += a_cpu
+        self.b_cpu += b_cpu
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    @staticmethod
+    def elo_from_score(score):
+        """Convert an average score into an Elo rating difference.
+
+        Args:
+            score (float): Points per game.
+
+        Returns:
+            float: The rating difference, infinite for a clean sweep either way.
+        """
+        if score <= 0:
+            return -math.inf
+        if score >= 1:
+            return math.inf
+        return -400 * math.log10(1 / score - 1)
+
+    def elo(self, z=1.96):
+        """Estimate the rating difference between the engines.
+
+        The error bar comes from the spread of the game results around the
+        average score, carried through the Elo formula; ``z=1.96`` gives a
+        95% confidence interval.
+
+        Args:
+            z (float, optional): The number of standard errors the interval spans.
+
+        Returns:
+            tuple: The estimated difference and the half-width of its interval.
+        """
+        if not self.games:
+            return 0.0, math.inf
+        n = self.games
+        s = self.score
+        variance = (self.wins * (1 - s) ** 2 + self.draws * (0.5 - s) ** 2 + self.losses * s ** 2) / n
+        error = math.sqrt(variance / n)
+        low = self.elo_from_score(s - z * error)
+        high = self.elo_from_score(s + z * error)
+        return self.elo_from_score(s), (high - low) / 2
+
+    def __str__(self):
+        """
+        Return the record and rating estimate as one line.
+        """
+        elo, margin = self.elo()
+        return (f"+{self.wins} ={self.draws} -{self.losses}  Elo {elo:+.0f} ± {margin:.0f}  "
+                f"CPU {self.a_cpu:.1f}s/{self.b_cpu:.1f}s")
+
+
+class Tournament:
+    def __init__(self, engine_a, engine_b, games=100, workers=None, seed=0, **rules):
+        """Initialize a match between two engine configurations.
+
+        Games are played in pairs from the same random opening with the
+        colors swapped, so neither engine profits from a lucky opening.
+
+        Args:
+            engine_a (dict): The first player's configuration, as taken by make_player.
+            engine_b (dict): The second player's configuration.
+            games (int, optional): The number of games to play. Defaults to 100.
+            workers (int, optional): The number of processes. Defaults to the number of cores.
+            seed (int, optional): Seeds the openings, so a match can be replayed. Defaults to 0.
+            **rules: Passed on to play_game: opening_plies, max_plies, adjudicate_margin,
+                adjudicate_plies, no_progress_plies and backend.
+        """
+        self.engine_a = engine_a
+        self.engine_b = engine_b
+        self.games = games
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed
+        self.rules = rules
+        self.stats = TournamentStats()
+
+    def run(self):
+        """Play the match, giving back each game as soon as it finishes.
+
+        Yields:
+            dict: The result of one game, as returned by play_game, with the
+                games per second played so far added as ``rate``.
+        """
+        generator = random.Random(self.seed)
+        seeds = [generator.getrandbits(32) for _ in range((self.games + 1) // 2)]
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(play_game, i, self.engine_a, self.engine_b, i % 2 == 0, seeds[i // 2],
+                                   **self.rules)
+                       for i in range(self.games)]
+            for future in as_completed(futures):
+                result = future.result()
+                self.stats.add(result['score'], result['a_cpu'], result['b_cpu'])
+                result['rate'] = self.stats.games / (time.perf_counter() - started)
+                yield result
+
+
+def parse_engine(text):
+    """Read an engine configuration from the command line.
+
+    Args:
+        text (str): Comma-separated ``name=value`` pairs, e.g. ``"time_limit=0.05,max_depth=4"``
+            or ``"engine=mcts,policy=puct"``.
+
+    Returns:
+        dict: The player's configuration, with numbers converted.
+    """
+    config = {}
+    for pair in filter(None, text.split(',')):
+        name, value = pair.split('=', 1)
+        try:
+            config[name.strip()] = int(value)
+        except ValueError:
+            try:
+                config[name.strip()] = float(value)
+            except ValueError:
+                config[name.strip()] = value.strip()
+    return config
+
+
+def main(argv=None):
+    """Run a tournament from the command line.
+
+    Args:
+        argv (list, optional): The arguments; defaults to sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Play engine configurations against each other.")
+    parser.add_argument('--engine-a', type=parse_engine, default={}, help="e.g. time_limit=0.05,max_depth=6 or engine=mcts,workers=4")
+    parser.add_argument('--engine-b', type=parse_engine, default={})
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, help="processes to use (default: one per core)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--opening-plies', type=int, default=4)
+    parser.add_argument('--max-plies', type=int, default=200)
+    parser.add_argument('--adjudicate-margin', type=int, default=400, help="0 to play every game out")
+    parser.add_argument('--adjudicate-plies', type=int, default=8)
+    parser.add_argument('--no-progress-plies', type=int, default=80)
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='bitboard')
+    args = parser.parse_args(argv)
+
+    tournament = Tournament(args.engine_a, args.engine_b, args.games, args.workers, args.seed,
+                            opening_plies=args.opening_plies, max_plies=args.max_plies,
+                            adjudicate_margin=args.adjudicate_margin, adjudicate_plies=args.adjudicate_plies,
+                            no_progress_plies=args.no_progress_plies, backend=args.backend)
+    print(f"A: {args.engine_a}  B: {args.engine_b}  {args.games} games on {tournament.workers} workers")
+    for result in tournament.run():
+        outcome = {1.0: 'A wins', 0.5: 'draw', 0.0: 'B wins'}[result['score']]
+        print(f"game {result['game'] + 1:>4} ({'A' if result['a_is_grey'] else 'B'} grey): {outcome:<6} "
+              f"{result['reason']:<12} {result['plies']:>3} plies | {tournament.stats} | "
+              f"{result['rate']:.2f} games/s", flush=True)
+
+
+if __name__ == "__main__":
+    main()
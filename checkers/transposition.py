@@ -0,0 +1,148 @@
+from array import array
+
+
+class TranspositionTable:
+    """A fixed-size table of search results keyed by position hash.
+
+    Every field lives in its own flat ``array`` so the table never grows
+    after it is created and its memory use is known up front: one slot costs
+    ``SLOT_BYTES`` bytes, and the number of slots is whatever fits in the
+    requested number of megabytes.
+    """
+
+    # Bound types: the stored score is exact, at least (lower) or at most (upper) the true score
+    EXACT, LOWER, UPPER = 0, 1, 2
+    # Replacement policies
+    DEPTH_PREFERRED = 'depth'
+    ALWAYS_REPLACE = 'always'
+    # Array type codes of the fields: key, score, move, depth, bound and age
+    FIELDS = ('Q', 'i', 'I', 'b', 'B', 'B')
+    SLOT_BYTES = sum(array(code).itemsize for code in FIELDS)
+    # Set on a stored move so that the move (0, 0) -> (0, 0) is not mistaken for "no move"
+    HAS_MOVE = 1 << 31
+
+    def __init__(self, megabytes=16, policy=DEPTH_PREFERRED):
+        """Initialize an empty table.
+
+        Args:
+            megabytes (float, optional): The memory cap for the table. Defaults to 16.
+            policy (str, optional): ``'depth'`` keeps the deeper of two results
+                for the same slot, ``'always'`` keeps the newer. Defaults to ``'depth'``.
+
+        Raises:
+            ValueError: If the policy is unknown or the cap is too small for one slot.
+        """
+        if policy not in (self.DEPTH_PREFERRED, self.ALWAYS_REPLACE):
+            raise ValueError(f"unknown replacement policy: {policy!r}")
+        self.size = int(megabytes * 1024 * 1024) // self.SLOT_BYTES
+        if self.size < 1:
+            raise ValueError("the memory cap is too small for a single entry")
+        self.policy = policy
+        self.age = 0
+        self.clear()
+
+    @property
+    def megabytes(self):
+        """Get the memory taken by the table's slots.
+
+        Returns:
+            float: The size of the table in megabytes.
+        """
+        return self.size * self.SLOT_BYTES / (1024 * 1024)
+
+    def clear(self):
+        """Empty the table.
+        """
+        self.keys, self.scores, self.moves, self.depths, self.bounds, self.ages = (
+            array(code, bytes(array(code).itemsize * self.size)) for code in self.FIELDS)
+        self.used = 0
+
+    def new_search(self):
+        """Mark every stored entry as coming from an older search.
+
+        With the depth-preferred policy, old entries are replaced even by
+        shallower new ones, so the table does not fill up with stale results.
+        """
+        self.age = (self.age + 1) & 0xFF
+
+    @classmethod
+    def encode_move(cls, move):
+        """Pack a move's start and end squares into one int.
+
+        Args:
+            move (tuple): The ``(start, end, captured)`` move, or None.
+
+        Returns:
+            int: The packed squares; 0 stands for no move.
+        """
+        if move is None:
+            return 0
+        (r1, c1), (r2, c2) = move[0], move[1]
+        return cls.HAS_MOVE | (r1 << 24) | (c1 << 16) | (r2 << 8) | c2
+
+    @classmethod
+    def decode_move(cls, packed):
+        """Unpack the squares stored by encode_move.
+
+        Args:
+            packed (int): The packed squares.
+
+        Returns:
+            tuple: ``(start, end)`` squares, or None if no move was stored.
+        """
+        if not packed & cls.HAS_MOVE:
+            return None
+        return ((packed >> 24) & 0x7F, (packed >> 16) & 0xFF), ((packed >> 8) & 0xFF, packed & 0xFF)
+
+    def probe(self, key):
+        """Look up a position.
+
+        Args:
+            key (int): The position's 64-bit hash, including the side to move.
+
+        Returns:
+            tuple: ``(depth, bound, score, best)`` where ``best`` is the
+                ``(start, end)`` of the best move or None, or None when the
+                position is not stored.
+        """
+        i = key % self.size
+        if self.keys[i] != key:
+            return None
+        return self.depths[i], self.bounds[i], self.scores[i], self.decode_move(self.moves[i])
+
+    def store(self, key, depth, bound, score, move):
+        """Save the result of searching a position.
+
+        Args:
+            key (int): The position's 64-bit hash, including the side to move.
+            depth (int): The depth the position was searched to.
+            bound (int): EXACT, LOWER or UPPER.
+            score (int): The score found.
+            move (tuple): The best move found, or None.
+        """
+        i = key % self.size
+        stored = self.keys[i]
+        if self.policy == self.DEPTH_PREFERRED and stored != key and self.ages[i] == self.age \
+                and depth < self.depths[i]:
+            return
+        if not stored:
+            self.used += 1
+        # Keep the old best move when a shallower search of the same position found none
+        if move is None and stored == key:
+            packed = self.moves[i]
+        else:
+            packed = self.encode_move(move)
+        self.keys[i] = key
+        self.depths[i] = min(depth, 127)
+        self.bounds[i] = bound
+        self.scores[i] = score
+        self.moves[i] = packed
+        self.ages[i] = self.age
+
+    def hashfull(self):
+        """Get how full the table is.
+
+        Returns:
+            int: The share of slots in use, in permille.
+        """
+        return self.used * 1000 // self.size
@@ -0,0 +1,91 @@
+import random
+from checkers.constants import Constants
+
+
+class Zobrist:
+    """Random 64-bit keys used to hash positions incrementally.
+
+    A position's hash is the XOR of one key per occupied square, chosen by the
+    color and rank of the piece standing there, so moving, capturing or
+    crowning a piece only needs a couple of XORs. The keys come from a fixed
+    seed, which keeps hashes identical across processes and runs.
+    """
+
+    SEED = 0x5EED
+    # One set of keys per board size, shared by every board of that size
+    tables = {}
+
+    def __init__(self, rows, cols):
+        """Generate the keys for a board size.
+
+        Args:
+            rows (int): The number of rows on the board.
+            cols (int): The number of columns on the board.
+        """
+        self.c = Constants()
+        generator = random.Random(self.SEED)
+        # For each square: grey man, grey king, white man, white king
+        self.keys = {}
+        for r in range(rows):
+            for c in range(cols):
+                self.keys[(r, c)] = tuple(generator.getrandbits(64) for _ in range(4))
+        # XORed in when white is the side to move
+        self.side = generator.getrandbits(64)
+
+    @classmethod
+    def for_size(cls, rows, cols):
+        """Get the shared keys for a board size, generating them the first time.
+
+        Args:
+            rows (int): The number of rows on the board.
+            cols (int): The number of columns on the board.
+
+        Returns:
+            Zobrist: The keys for that size.
+        """
+        if (rows, cols) not in cls.tables:
+            cls.tables[(rows, cols)] = cls(rows, cols)
+        return cls.tables[(rows, cols)]
+
+    def key(self, r, c, color, king):
+        """Get the key of one piece standing on one square.
+
+        Args:
+            r (int): The row of the square.
+            c (int): The column of the square.
+            color (tuple): The color of the piece.
+            king (bool): Whether the piece is a king.
+
+        Returns:
+            int: The 64-bit key.
+        """
+        return self.keys[(r, c)][(0 if color == self.c.GREY else 2) + (1 if king else 0)]
+
+    def hash_board(self, board):
+        """Hash a board from scratch.
+
+        Boards keep their ``hash`` up to date as they change; this is the
+        reference they can be checked against.
+
+        Args:
+            board (Board): The board to hash; any board engine works.
+
+        Returns:
+            int: The position's hash, without the side to move.
+        """
+        value = 0
+        for piece in board.get_all_pieces():
+            value ^= self.key(piece.row, piece.col, piece.color, piece.king)
+        return value
+
+    def position_key(self, board, color):
+        """Get the hash of a position including the side to move.
+
+        Args:
+            board (Board): The board.
+            color (tuple): The side to move.
+
+        Returns:
+            int: The hash to look the position up by.
+        """
+        return board.hash ^ self.side if color == self.c.WHITE else board.hash
@@ -1,6 +1,8 @@
 
 from checkers.constants import Constants
 from checkers.checkers import Checkers
+from checkers.protocol import EngineClient
+from checkers.profiler import Profiler
 import pygame
 
 class Main:
@@ -10,6 +12,29 @@ class Main:
         self.c = Constants()
         self.window = pygame.display.set_mode((self.c.W, self.c.H))
         self.refresh = 60
+        # Wait for input instead of ticking at a fixed rate while nothing moves on screen
+        self.event_driven = True
+        # Longest time, in milliseconds, an idle loop sleeps before checking the game again
+        self.idle_timeout = 500
+        # The only events the loop reacts to; the rest never enter the queue
+        self.handled_events = [pygame.QUIT, pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN, pygame.WINDOWEXPOSED,
+                               pygame.VIDEOEXPOSE]
+        # Keys that take a move back and play it again
+        self.undo_keys = (pygame.K_LEFT, pygame.K_z)
+        self.redo_keys = (pygame.K_RIGHT, pygame.K_y)
+        # The color the computer plays, e.g. self.c.WHITE, or None for two human players
+        self.computer = None
+        # Whether the computer keeps thinking while the player decides
+        self.ponder = True
+        # The file of an opening book for the computer to play from, or None
+        self.book = None
+        # Whether the computer searches in its own process, so a crash or a hang in the
+        # engine cannot take the window down with it
+        self.engine_process = False
+        # A file to save timings to when the window closes, as JSON if it ends in .json and
+        # as Prometheus text otherwise, with the figures shown on screen meanwhile; None
+        # leaves the game untimed
+        self.profile = None
         
 
     pygame.display.set_caption('Checkers')
@@ -33,6 +58,29 @@ class Main:
         # Return the row and column as a tuple
         return row, col
 
+    def wait_for_events(self, time, game):
+        """
+        Collect the events for one pass of the game loop, pacing the loop as it goes.
+        While the game is busy (animating or thinking) the loop runs at the full frame rate.
+        Otherwise, in event-driven mode, it sleeps until input arrives or idle_timeout passes,
+        so an idle board uses next to no CPU.
+
+        Args:
+        time (Clock): The time object used to control the game's frame rate.
+        game (Checkers): The main game object, which manages the state of the game.
+        Returns:
+        list: The events that arrived.
+        """
+        if not self.event_driven or game.busy():
+            time.tick(self.refresh)
+            return pygame.event.get()
+        event = pygame.event.wait(self.idle_timeout)
+        # Keep the clock in step without waiting, so the first busy frame is paced correctly
+        time.tick()
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
     def game_loop(self, run, time, game):
         """
         Executes the game loop until the game is over or the player quits.
@@ -44,25 +92,38 @@ class Main:
         time (Clock): The time object used to control the game's frame rate.
         game (Checkers): The main game object, which manages the state of the game.
         """
-        
+        # Only let the events the loop handles into the queue, so nothing else wakes it up
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(self.handled_events)
+
         while run:
-        # Control the frame rate of the game
-            time.tick(self.refresh)
+            # Wait for input, or control the frame rate of the game while it is busy
+            events = self.wait_for_events(time, game)
 
             # Check if the game is over
-            if game.winner() is not None:
-                print(game.winner())
+            if game.over():
+                print(game.winner() or game.draw())
                 run = False
-            for event in pygame.event.get():
+            for event in events:
                 # Check if the player has quit the game
                 if event.type == pygame.QUIT:
                     run = False
                 # Check if the player has clicked on the game board
                 if event.type == pygame.MOUSEBUTTONDOWN:
-                    pos = pygame.mouse.get_pos()
+                    # Use where the click happened, which the mouse may have left by now
+                    pos = event.pos
                     # Convert the mouse position to row and column on the game board
                     row, col = self.get_row_col_from_mouse(pos)
                     game.choose(row, col)
+                # Step back and forth through the game's moves
+                if event.type == pygame.KEYDOWN:
+                    if event.key in self.undo_keys:
+                        game.undo()
+                    elif event.key in self.redo_keys:
+                        game.redo()
+                # Repaint the whole window when it was covered up and shown again
+                if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                    game.renderer.invalidate()
                 
             # Update the game state
             game.update()
@@ -74,10 +135,22 @@ class Main:
         run = True
         # Create a time object for controlling the game's frame rate
         time = pygame.time.Clock()
+        # Put the timers in place before the game starts, if asked to
+        profiler = Profiler() if self.profile else None
+        if profiler is not None:
+            profiler.enable(overlay=True)
         # Create a Checkers game object
-        game = Checkers(self.window)
+        engine = EngineClient() if self.engine_process else None
+        game = Checkers(self.window, computer=self.computer, engine=engine, ponder=self.ponder, book=self.book)
         # Run the game loop until the game is over or the player quits
         self.game_loop(run, time, game)
+        # Stop the computer thinking before the window goes away
+        game.close()
+        if engine is not None:
+            engine.close()
+        if profiler is not None:
+            profiler.disable()
+            profiler.write(self.profile)
 
         # Quit Pygame
         pygame.quit()
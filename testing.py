@@ -1,9 +1,35 @@
+import asyncio
+import io
+import json
+import random
+import time
 import pytest
 import pygame
 from checkers.board import Board
+from checkers.bitboard import BitBoard
 from checkers.constants import Constants
 from checkers.piece import Piece
 from checkers.checkers import Checkers
+from checkers.engine import Engine
+from checkers.batch_eval import BatchEvaluator
+from checkers.background import BackgroundSearch
+from checkers.simulator import BatchSimulator
+from checkers.mcts import MCTS, Node
+from checkers.tablebase import Tablebase, TablebaseGenerator
+from checkers.book import BookBuilder, OpeningBook
+from checkers.records import GameRecord, MoveLog, Notation, read_pdn, write_pdn
+from checkers.server import GameServer
+from checkers.loadgen import Client, run
+from checkers.protocol import EngineClient, EnginePool
+from checkers.state import GameState
+from checkers.timeline import Timeline
+from checkers.profiler import Profiler
+from checkers.angry_piece import AngryPiece
+from checkers.geometry import Geometry
+from checkers.perft import Perft
+from checkers.tournament import TournamentStats, play_game
+from checkers.transposition import TranspositionTable
+from checkers.render import Renderer, piece_sprite, render_text
 
 
 class Testing:
@@ -14,15 +40,15 @@ class Testing:
         assert b.grey_left == 12
     @pytest.mark.run
     def test_find_pos(self):
-        # Create a new Piece object with row=3, col=4, and color=(255, 0, 0)
+        # Create a new Piece object with row=4, col=4, and color=(255, 0, 0)
         piece = Piece(4, 4, (255,0,0))
 
-        # Call the find_pos method
-        piece.find_pos()
+        # Pieces no longer know their pixels; the renderer works them out when drawing
+        x, y = Renderer(pygame.Surface((600, 600))).center(piece.row, piece.col)
 
-        # Check that the Piece object has the correct x and y coordinates
-        assert piece.x == 337
-        assert piece.y == 337
+        # Check that the center of the piece's square has the correct x and y coordinates
+        assert x == 337
+        assert y == 337
     @pytest.mark.run
     def test_piece_promote_king():
         # Test that a Piece instance can be promoted to a king
@@ -40,8 +66,8 @@ class Testing:
     def test_piece_draw_piece():
     # Test that the draw_piece method correctly draws the piece on the given window
         window = pygame.Surface((80, 80))
-        piece = Piece(1, 2, (255, 0, 0), window=window)
-        piece.draw_piece(window)
+        piece = Piece(1, 2, (255, 0, 0))
+        Renderer(window).draw_piece(piece)
         # Check that a circle was drawn on the window at the correct coordinates
         # and with the correct color
         assert window.get_at((40, 40)) == (255, 0, 0, 255)
@@ -94,6 +120,441 @@ class Testing:
         assert game.checkers_move(3, 5) == False
         assert game.selected == Piece(3, 4, (255,255,255))
         assert game.board.find_piece(3, 5) == 0
+    @pytest.mark.run
+    def test_bitboard_matches_board(self):
+        # Both board engines should offer the same moves from the starting position
+        board = Board()
+        bitboard = BitBoard()
+        for r in range(8):
+            for c in range(8):
+                piece = board.find_piece(r, c)
+                if piece != 0:
+                    assert bitboard.find_piece(r, c).color == piece.color
+                    assert bitboard.possible_moves(bitboard.find_piece(r, c)).keys() == board.possible_moves(piece).keys()
+                else:
+                    assert bitboard.find_piece(r, c) == 0
+    @pytest.mark.run
+    def test_bitboard_generate_moves(self):
+        # Grey has seven opening moves, all of them quiet
+        bitboard = BitBoard()
+        moves = bitboard.generate_moves(Constants().GREY)
+        assert len(moves) == 7
+        assert all(not captured for start, end, captured in moves)
+        # Quiet moves are turned into squares once and shared by every board of the size
+        assert bitboard.legal_moves(Constants().GREY)[0] is BitBoard().legal_moves(Constants().GREY)[0]
+    @pytest.mark.run
+    def test_engine_search(self):
+        # The engine returns one of the legal moves together with its principal variation
+        engine = Engine(time_limit=0.05)
+        board = BitBoard()
+        result = engine.search(board, Constants().GREY)
+        assert result.move in engine.find_moves(board, Constants().GREY)
+        assert result.pv[0] == result.move
+        assert result.depth >= 1 and result.nodes > 0
+    @pytest.mark.run
+    def test_board_hash(self):
+        # The incremental hash follows moves and matches a hash computed from scratch
+        board = Board()
+        assert board == Board() and hash(board) == hash(BitBoard())
+        board.move(board.find_piece(5, 0), 4, 1)
+        assert board != Board()
+        assert board.hash == board.zobrist.hash_board(board)
+    @pytest.mark.run
+    def test_transposition_table(self):
+        # The depth-preferred table keeps the deeper result when two positions share a slot
+        table = TranspositionTable(megabytes=0.01)
+        table.store(7, 5, TranspositionTable.EXACT, 40, ((5, 0), (4, 1), ()))
+        table.store(7 + table.size, 2, TranspositionTable.LOWER, 10, None)
+        assert table.probe(7) == (5, TranspositionTable.EXACT, 40, ((5, 0), (4, 1)))
+        assert table.probe(7 + table.size) is None
+    @pytest.mark.run
+    def test_make_unmake_move(self):
+        # Taking back a capture restores the captured piece, the counters and the hash
+        for board in (Board(), BitBoard()):
+            board.make_move(((5, 2), (4, 3), ()))
+            board.make_move(((2, 5), (3, 4), ()))
+            before = (board.hash, board.grey_left, board.white_left)
+            token = board.make_move(((4, 3), (2, 5), ((3, 4),)))
+            assert board.find_piece(3, 4) == 0 and board.white_left == 11
+            board.unmake_move(token)
+            assert (board.hash, board.grey_left, board.white_left) == before
+            assert board.find_piece(3, 4).color == Constants().WHITE
+            assert board.find_piece(4, 3).color == Constants().GREY
+    @pytest.mark.run
+    def test_geometry(self):
+        # Corner squares have one neighbour; larger boards fill more rows
+        geometry = Geometry.for_size(8, 8)
+        assert geometry is Geometry.for_size(8, 8)
+        assert geometry.up[(7, 0)] == (((6, 1), (5, 2)),)
+        assert geometry.down[(6, 7)] == (((7, 6), None),)
+        board = Board(10, 10)
+        assert board.grey_left == board.white_left == 20
+        assert board.possible_moves(board.find_piece(6, 1)) == {(5, 0): [], (5, 2): []}
+    @pytest.mark.run
+    def test_legal_moves_forced_multi_jump(self):
+        # Once a capture is available it is the only legal move, and it runs to the end of the sequence
+        for board in (Board(), BitBoard()):
+            board.make_move(((5, 2), (4, 3), ()))
+            board.make_move(((2, 5), (3, 4), ()))
+            board.make_move(((6, 3), (5, 2), ()))
+            board.make_move(((1, 4), (2, 5), ()))
+            board.make_move(((4, 3), (3, 2), ()))
+            board.make_move(((2, 5), (3, 6), ()))
+            board.remove_piece([board.find_piece(1, 2)])
+            moves = board.legal_moves(Constants().WHITE)
+            assert sorted(moves) == [((2, 1), (4, 3), ((3, 2),)), ((2, 3), (6, 3), ((3, 2), (5, 2)))]
+            assert board.legal_moves(Constants().WHITE) is moves
+            assert board.possible_moves(board.find_piece(1, 0)) == {}
+            assert list(board.possible_moves(board.find_piece(2, 3))) == [(6, 3)]
+
+    @pytest.mark.run
+    def test_perft(self):
+        # Both board engines agree with the reference counts and leave the board as it was
+        for board_class in (Board, BitBoard):
+            perft = Perft(board_class)
+            for name, (diagram, side, expected) in Perft.POSITIONS.items():
+                board, color = perft.setup(diagram, side)
+                before = board.hash
+                assert perft.count(board, color, 4) == expected[4]
+                assert board.hash == before
+
+    @pytest.mark.run
+    def test_tournament(self):
+        # Even results give an even rating; a game always ends with a reason
+        stats = TournamentStats()
+        for score in (1, 0, 0.5, 0.5):
+            stats.add(score)
+        elo, margin = stats.elo()
+        assert (stats.wins, stats.draws, stats.losses) == (1, 2, 1)
+        assert elo == 0 and margin > 0
+        result = play_game(0, {'max_depth': 1}, {'max_depth': 1}, True, 7, max_plies=30)
+        assert result['plies'] <= 30 and result['reason'] is not None
+
+    @pytest.mark.run
+    def test_renderer_dirty_squares(self):
+        # After the first frame only the squares a move touched are redrawn
+        window = pygame.Surface((600, 600))
+        renderer = Renderer(window)
+        board = Board()
+        assert renderer.draw_board(board) == [window.get_rect()]
+        assert renderer.draw_board(board) == []
+        board.make_move(((5, 2), (4, 3), ()))
+        rects = renderer.draw_board(board)
+        assert sorted(rects) == sorted([renderer.square_rect(5, 2), renderer.square_rect(4, 3)])
+
+    @pytest.mark.run
+    def test_render_asset_cache(self):
+        # Sprites and text are built once and then handed out again
+        pygame.font.init()
+        assert piece_sprite((255, 255, 255), True, 75) is piece_sprite((255, 255, 255), True, 75)
+        assert piece_sprite((255, 255, 255), True, 75) is not piece_sprite((255, 255, 255), False, 75)
+        assert render_text("I'm gonna crush you!", (128, 128, 128)) is render_text("I'm gonna crush you!", (128, 128, 128))
+
+    @pytest.mark.run
+    def test_background_search(self):
+        # A search on the worker thread finds a legal move; a cancelled ponder stops at once
+        board = Board()
+        thinker = BackgroundSearch(Engine(time_limit=0.05))
+        thinker.start(board, Constants().GREY)
+        result = thinker.result()
+        assert result.move in board.legal_moves(Constants().GREY)
+        thinker.ponder(board, Constants().GREY)
+        assert thinker.running() and not thinker.done()
+        thinker.cancel()
+        assert thinker.idle() and not thinker.engine.stopped
+
+    @pytest.mark.run
+    def test_pack(self):
+        # A position packs into three bitmasks and unpacks into the same position on either board
+        board = Board()
+        board.make_move(((5, 2), (4, 3), ()))
+        data = board.pack()
+        assert len(data) == 12 and data == BitBoard.unpack(data).pack()
+        assert Board.unpack(data) == board
+        with pytest.raises(AttributeError):
+            Piece(0, 1, (255, 255, 255)).x = 0
+
+    @pytest.mark.run
+    def test_batch_evaluator(self):
+        # With its default weights the batch scores agree with the engine's own evaluation
+        boards = [Board(), BitBoard()]
+        boards[1].make_move(((5, 2), (4, 3), ()))
+        evaluator = BatchEvaluator()
+        scores = evaluator.evaluate(evaluator.encode(boards), [True, False])
+        engine = Engine()
+        assert list(scores) == [engine.evaluate(boards[0], Constants().GREY), engine.evaluate(boards[1], Constants().WHITE)]
+        # The start position is symmetric, so every feature comes out even
+        features = evaluator.features(evaluator.encode([Board()]))
+        assert list(features[0]) == [0, 0, 0, 0, 0]
+        assert Engine(evaluator=evaluator, max_depth=2).search(Board(), Constants().GREY).move is not None
+
+    @pytest.mark.run
+    def test_batch_simulator(self):
+        simulator = BatchSimulator(seed=0)
+        result = simulator.playouts(Board(), Constants().GREY, games=500)
+        assert result['grey'] + result['white'] + result['draws'] == 500
+        assert 0 < result['grey_score'] < 1
+        # A side left without pieces has lost every game before a move is made
+        board = Board()
+        board.clear()
+        board.add_piece(Piece(4, 3, Constants().GREY))
+        result = simulator.playouts(board, Constants().WHITE, games=50)
+        assert result['grey'] == 50 and result['plies'] == 0
+
+    @pytest.mark.run
+    def test_mcts(self):
+        c = Constants()
+        for policy in ('uct', 'puct'):
+            player = MCTS(time_limit=5, max_nodes=500, policy=policy, seed=1)
+            board = BitBoard()
+            result = player.search(board, c.GREY)
+            assert result.move in board.legal_moves(c.GREY)
+            assert player.size >= 500 and board == BitBoard()
+            # After a move and a reply the tree below the new position is kept
+            board.make_move(result.move)
+            board.make_move(board.legal_moves(c.WHITE)[0])
+            player.max_nodes = 0
+            assert player.search(board, c.GREY).move in board.legal_moves(c.GREY)
+            assert player.root.visits > 0 and player.root.parent is None
+        assert not hasattr(Node(), '__dict__') and player.judge.tt.megabytes < 0.01
+        # Root-parallel workers whose trees are full end the search long before its deadline
+        player = MCTS(time_limit=5, max_nodes=300, workers=2, parallel='root', seed=1)
+        started = time.perf_counter()
+        assert player.search(BitBoard(), c.GREY).move in BitBoard().legal_moves(c.GREY)
+        assert time.perf_counter() - started < 2
+        player.close()
+
+    @pytest.mark.run
+    def test_tablebase(self, tmp_path):
+        c = Constants()
+        written = list(TablebaseGenerator(pieces=2).generate(str(tmp_path)))
+        assert [material for material, _ in written] == [(0, 1, 0, 1), (0, 1, 1, 0), (1, 0, 0, 1), (1, 0, 1, 0)]
+        tablebase = Tablebase(str(tmp_path))
+        assert tablebase.max_pieces == 2
+        # Whoever moves first takes the other piece
+        board = BitBoard()
+        board.clear()
+        king = AngryPiece(3, 2, c.GREY)
+        king.king = True
+        board.add_piece(king)
+        board.add_piece(AngryPiece(2, 1, c.WHITE))
+        assert tablebase.probe(board, c.GREY) == (Tablebase.WIN, 1)
+        assert tablebase.probe(board, c.WHITE) == (Tablebase.WIN, 1)
+        result = Engine(tablebase=tablebase).search(board, c.GREY)
+        assert result.move == ((3, 2), (1, 0), ((2, 1),)) and result.depth == 0
+        tablebase.close()
+
+    @pytest.mark.run
+    def test_opening_book(self, tmp_path):
+        c = Constants()
+        builder = BookBuilder(plies=4)
+        builder.add_game([((5, 2), (4, 3), ()), ((2, 1), (3, 2), ())], c.GREY)
+        builder.add_game([((5, 2), (4, 3), ()), ((2, 5), (3, 4), ())], None)
+        builder.add_game([((5, 0), (4, 1), ())], c.WHITE)
+        path = str(tmp_path / 'book.bin')
+        assert builder.write(path) == 4
+        book = OpeningBook(path)
+        # Most played first, scored from the mover's side
+        assert book.probe(Board(), c.GREY) == [(((5, 2), (4, 3), ()), 2, 0.75), (((5, 0), (4, 1), ()), 1, 0.0)]
+        assert book.probe(BitBoard(), c.WHITE) == []
+        result = Engine(book=book).search(BitBoard(), c.GREY)
+        assert result.move == ((5, 2), (4, 3), ()) and result.nodes == 0
+        book.close()
+
+    @pytest.mark.run
+    def test_game_records(self):
+        c = Constants()
+        notation = Notation()
+        # Grey moves first, like Black in PDN, and starts on squares 1-12
+        assert notation.numbers[(7, 6)] == 1 and notation.numbers[(0, 1)] == 32
+        assert notation.to_fen(Board(), c.GREY) == 'B:W' + ','.join(map(str, range(21, 33))) + ':B' + \
+            ','.join(map(str, range(1, 13)))
+        board, turn = notation.from_fen('B:W21-32:B1-12')
+        assert board == BitBoard() and turn == c.GREY
+        # A game with a capture survives both formats
+        moves = [((5, 2), (4, 3), ()), ((2, 5), (3, 4), ()), ((4, 3), (2, 5), ((3, 4),))]
+        game = GameRecord(moves, '1-0', {'Event': 'test'})
+        text = io.StringIO()
+        write_pdn([game, game], text)
+        assert '1. 11-15 22-18 2. 15x22 1-0' in text.getvalue()
+        games = list(read_pdn(io.StringIO(text.getvalue())))
+        assert [(g.moves, g.result, g.tags['Event']) for g in games] == [(moves, '1-0', 'test')] * 2
+        data = io.BytesIO()
+        log = MoveLog(data)
+        log.write(game)
+        assert len(data.getvalue()) == 8 + 4 + 2 * len(moves)
+        data.seek(0)
+        assert [(g.moves, g.result) for g in MoveLog(data)] == [(moves, '1-0')]
+        # A damaged move is reported with its game and ply rather than played
+        for damage in (b'\x00\x00', b'\xff\xff'):
+            with pytest.raises(ValueError, match='game 1: the move at ply 3'):
+                list(MoveLog(io.BytesIO(data.getvalue()[:-2] + damage)))
+        assert list(game.positions())[-1][0].white_left == 11
+
+    @pytest.mark.run
+    def test_game_server(self):
+        async def session():
+            server = GameServer(port=0, workers=1, engine={'max_depth': 2, 'tt_megabytes': 1})
+            port = await server.start()
+            client = await Client.connect('127.0.0.1', port)
+            state, updates = await client.new_game(computer='white')
+            assert state['turn'] == 'grey' and '11-15' in state['legal']
+            # Moves are checked against the legal ones, and the side the server plays is off limits
+            assert (await client.request(op='move', game=state['game'], move='11-18'))['type'] == 'error'
+            delta = await client.request(op='move', game=state['game'], move='11-15')
+            assert (delta['type'], delta['turn'], delta['ply']) == ('delta', 'white', 1)
+            reply = await updates.get()
+            assert (reply['by'], reply['turn'], reply['ply']) == ('white', 'grey', 2)
+            # A dead engine process is replaced and the search tried again
+            for process in list(server.executor._processes.values()):
+                process.kill()
+            delta = await client.request(op='move', game=state['game'], move=reply['legal'][0])
+            assert delta['type'] == 'delta' and (await updates.get())['by'] == 'white'
+            # A search that fails ends the game rather than leaving it waiting on the server
+            server.engine = {'no_such_setting': 1}
+            state, updates = await client.new_game(computer='grey')
+            assert (await updates.get())['type'] == 'error'
+            assert (await updates.get())['reason'] == 'engine failure'
+            server.engine = {'max_depth': 2, 'tt_megabytes': 1}
+            # A malformed request gets an error and the connection stays up, games and all
+            assert (await client.request(op='state', game=[1]))['type'] == 'error'
+            assert (await client.request(op='new', computer={'grey': 1}))['type'] == 'error'
+            assert (await client.request(op='state', game=state['game']))['type'] == 'state'
+            await client.close()
+            report = await run('127.0.0.1', port, games=20, concurrency=10, connections=2)
+            assert report['games'] == 20 and report['moves'] > 0
+            # Closing the server cancels the searches still running
+            client = await Client.connect('127.0.0.1', port)
+            await client.new_game(computer='grey')
+            assert server.searches
+            await server.close()
+            assert not server.searches
+            await client.close()
+        asyncio.run(session())
+
+    @pytest.mark.run
+    def test_engine_process(self):
+        c = Constants()
+        client = EngineClient({'time_limit': 0.05})
+        game = Checkers(None, BitBoard, computer=c.WHITE, engine=client)
+        game.choose(5, 2)
+        game.choose(4, 3)
+        while game.turn == c.WHITE:
+            game.update()
+        assert len(game.moves) == 2
+        # A crashed engine is replaced by the next search
+        client.process.kill()
+        client.process.wait()
+        assert client.search(game.board, game.turn).move in game.board.legal_moves(game.turn)
+        client.close()
+        # Taking a move back mid-search and searching again shows the new search's progress only
+        client = EngineClient({'time_limit': 0.5})
+        game = Checkers(None, BitBoard, computer=c.WHITE, engine=client)
+        game.choose(5, 2)
+        game.choose(4, 3)
+        while game.shown_progress is None:
+            game.update()
+        assert game.undo() and game.shown_progress is None
+        game.choose(5, 2)
+        game.choose(4, 3)
+        while game.turn == c.WHITE:
+            game.update()
+        assert len(game.moves) == 2
+        client.close()
+        pool = EnginePool(2, {'max_depth': 2})
+        assert pool.search(BitBoard(), c.GREY).depth == 2 and pool.free.qsize() == 2
+        pool.close()
+
+    @pytest.mark.run
+    def test_game_state(self):
+        c = Constants()
+        notation = Notation()
+        # A blocked side loses with pieces still on the board
+        board, turn = notation.from_fen('B:W32:B28')
+        state = GameState(board, turn)
+        assert state.winner == c.WHITE and state.mobility == {c.GREY: 0, c.WHITE: 1}
+        # Two kings shuffling back and forth repeat the first position on ply 8
+        board, turn = notation.from_fen('B:WK32:BK1')
+        state = GameState(board, turn)
+        for text in ['1-5', '32-28', '5-1', '28-32'] * 2:
+            assert not state.over
+            state.play(notation.parse_move(text, board.legal_moves(state.turn)))
+        assert state.draw == 'repetition' and state.quiet == 8
+        # Counts stay exact, crowned kings included, and every move can be taken back
+        for board_class in (Board, BitBoard):
+            generator = random.Random(3)
+            board = board_class()
+            state = GameState(board)
+            while not state.over:
+                state.play(generator.choice(board.legal_moves(state.turn)))
+                pieces = board.get_all_pieces(c.GREY)
+                assert state.material(c.GREY) == (len(pieces), sum(piece.king for piece in pieces))
+            while state.history:
+                state.undo()
+            assert board == board_class() and state.quiet == 0 and len(state.repetitions) == 1
+
+    @pytest.mark.run
+    def test_timeline(self):
+        c = Constants()
+        generator = random.Random(7)
+        board = BitBoard()
+        state = GameState(board)
+        timeline = Timeline(board, interval=4)
+        positions = [board.pack()]
+        while not state.over:
+            move = generator.choice(board.legal_moves(state.turn))
+            timeline.record(board, move, state.irreversible(move))
+            state.play(move)
+            positions.append(board.pack())
+        # Any ply comes back from a snapshot and a few moves, game state included
+        for ply in range(len(positions)):
+            restored, restored_state = timeline.restore(ply)
+            assert restored.pack() == positions[ply] and restored_state.turn == timeline.turn_at(ply)
+        assert restored_state.winner == state.winner
+        # Taking moves back and playing others forks a variation; the game is kept
+        game = Checkers(None, BitBoard)
+        for square in [(5, 2), (4, 3), (2, 5), (3, 4)]:
+            game.choose(*square)
+        assert game.undo() and game.turn == c.WHITE and len(game.moves) == 1
+        game.choose(2, 1)
+        game.choose(3, 2)
+        assert game.timeline.line is not game.timeline.root and game.timeline.length == 2
+        assert game.undo() and game.undo() and not game.undo()
+        game.timeline.switch(game.timeline.root)
+        assert game.redo() and game.redo() and not game.redo()
+        assert game.moves == [((5, 2), (4, 3), ()), ((2, 5), (3, 4), ())] and game.turn == c.GREY
+        # The timeline takes moves back, so the game state keeps no history of its own
+        assert game.state.history is None and game.timeline.moves(1) == game.moves[:1]
+
+    @pytest.mark.run
+    def test_profiler(self, tmp_path):
+        c = Constants()
+        original = BitBoard.legal_moves
+        profiler = Profiler()
+        profiler.enable(overlay=True)
+        assert BitBoard.legal_moves is not original
+        game = Checkers(pygame.display.set_mode((600, 600)), BitBoard)
+        game.update()
+        # Clicking another piece fails as a move and selects it, one sample all the same
+        game.choose(5, 2)
+        game.choose(5, 4)
+        game.choose(4, 3)
+        game.update()
+        Engine(max_depth=3).search(BitBoard(), c.WHITE)
+        profiler.disable()
+        # Disabled, the game runs its own methods again
+        assert BitBoard.legal_moves is original and Checkers.update.__module__ == 'checkers.checkers'
+        assert profiler.histogram('frame_seconds').count == 2
+        assert profiler.histogram('click_latency_seconds').count == 1
+        assert profiler.histogram('event_seconds').count == 3 and profiler.choosing == 0
+        assert profiler.histogram('movegen_seconds', board='BitBoard', function='legal_moves').count > 10
+        assert profiler.histogram('engine_nps', Profiler.NPS, engine='Engine').count == 1
+        assert profiler.overlay_rect is None and len(profiler.overlay_text()) == 5
+        text = profiler.to_prometheus()
+        assert 'checkers_frame_seconds_bucket{le="+Inf"} 2' in text and 'checkers_frame_seconds_count 2' in text
+        profiler.write(str(tmp_path / 'profile.json'))
+        names = {metric['name'] for metric in json.loads((tmp_path / 'profile.json').read_text())}
+        assert {'frame_seconds', 'render_seconds', 'event_seconds', 'engine_nps'} <= names
 
 if __name__ == "__main__":
     t = Testing()